@@ -1,31 +1,48 @@
-from moviepy.editor import VideoFileClip, AudioFileClip
 import os
 import gc
-import json
-from datetime import datetime
+import threading
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from audio_io import (SAMPLE_RATE, WHISPER_AUDIO_EXTENSION, copy_audio_stream, probe_audio,
+                      write_whisper_audio)
+from instrumentation import span
+from job_ledger import JobLedger
+
+# moviepy is imported by the functions that convert, so listing work does not load it
 
 class MediaConverter:
-    def __init__(self, input_folder='media', output_folder='aac', chunk_size=1024*1024):
+    def __init__(self, input_folder='media', output_folder='aac', chunk_size=1024*1024,
+                 output_format='aac', ledger=None, stream_copy=True):
+        if output_format not in ('aac', 'whisper'):
+            raise ValueError(f"Unknown output format {output_format}, expected 'aac' or 'whisper'")
+
         self.input_folder = input_folder
         self.output_folder = output_folder
         self.chunk_size = chunk_size
-        self.tracking_file = os.path.join(input_folder, 'processed_files.json')
-        self.processed_files = self._load_processed_files()
+        # 'aac' keeps a listenable copy; 'whisper' writes 16 kHz mono float32 .npy for the transcriber
+        self.output_format = output_format
+        # Audio that is already AAC is copied into the .aac file as is instead of re-encoded
+        self.stream_copy = stream_copy
+        self.ledger = ledger or JobLedger()
+        self._stats_lock = threading.Lock()
+
+        # Optional process pool used by convert_file (set by the pipeline orchestrator)
+        self.executor = None
+        self.converted_count = 0
+        self.converted_seconds = 0.0
         
         # Supported file extensions
         self.video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv')
         self.audio_extensions = ('.mp3', '.wav', '.m4a', '.wma', '.ogg', '.flac')
 
-    def _load_processed_files(self):
-        if os.path.exists(self.tracking_file):
-            with open(self.tracking_file, 'r') as f:
-                return json.load(f)
-        return {}
+    def _ledger_params(self):
+        return {'format': self.output_format}
 
-    def _update_processed_files(self, filename):
-        self.processed_files[filename] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.tracking_file, 'w') as f:
-            json.dump(self.processed_files, f, indent=4)
+    def _find_completed(self, media_file):
+        # Returns (content hash, completed ledger entry or None)
+        content_hash = self.ledger.file_hash(os.path.join(self.input_folder, media_file))
+        return content_hash, self.ledger.lookup(content_hash, 'convert', self._ledger_params())
 
     def _is_video_file(self, filename):
         return filename.lower().endswith(self.video_extensions)
@@ -33,79 +50,240 @@ class MediaConverter:
     def _is_audio_file(self, filename):
         return filename.lower().endswith(self.audio_extensions)
 
-    def convert_media(self):
+    def list_media_files(self):
+        return [f for f in os.listdir(self.input_folder)
+                if self._is_video_file(f) or self._is_audio_file(f)]
+
+    def pending_files(self):
+        """Media files whose current content has not been converted with these settings."""
+        return [f for f in self.list_media_files() if not self._find_completed(f)[1]]
+
+    def _audio_path(self, media_file):
+        extension = WHISPER_AUDIO_EXTENSION if self.output_format == 'whisper' else '.aac'
+        return os.path.join(self.output_folder, os.path.splitext(media_file)[0] + extension)
+
+    def _conversion_job(self, media_file):
+        # Returns the (picklable) conversion function, its arguments and the output path
+        media_path = os.path.join(self.input_folder, media_file)
+        audio_path = self._audio_path(media_file)
+        if self.output_format == 'whisper':
+            from moviepy.config import get_setting
+            job_args = (media_path, audio_path, get_setting("FFMPEG_BINARY"), self.chunk_size)
+            return convert_to_whisper_audio, job_args, audio_path
+
+        job_args = (media_path, audio_path, self._is_video_file(media_file), self.chunk_size,
+                    self.stream_copy)
+        return convert_to_aac, job_args, audio_path
+
+    def _record_conversion(self, media_file, content_hash, audio_path, duration):
+        # The ledger is only ever written from this process, so out-of-order
+        # completions from pool workers are recorded one transaction each
+        self.ledger.record(content_hash, 'convert', self._ledger_params(), media_file, audio_path)
+        with self._stats_lock:
+            self.converted_count += 1
+            self.converted_seconds += duration or 0.0
+        target = "Whisper audio" if self.output_format == 'whisper' else "AAC"
+        print(f"Successfully converted {media_file} to {target}")
+
+    def convert_media(self, workers=1):
         # Create output folder if it doesn't exist
         os.makedirs(self.output_folder, exist_ok=True)
 
         # Get list of media files
-        media_files = [f for f in os.listdir(self.input_folder) 
-                      if self._is_video_file(f) or self._is_audio_file(f)]
+        media_files = self.list_media_files()
 
         if not media_files:
             print("No media files found in the input folder")
             return
 
+        start_time = time.time()
+        start_count, start_seconds = self.converted_count, self.converted_seconds
+
+        if workers > 1:
+            self._convert_parallel(media_files, workers)
+        else:
+            for media_file in media_files:
+                self.convert_file(media_file)
+
+        self._print_throughput(self.converted_count - start_count,
+                               self.converted_seconds - start_seconds,
+                               time.time() - start_time, workers)
+
+    def _convert_parallel(self, media_files, workers):
+        pending = []
         for media_file in media_files:
             # Skip if already processed
-            if media_file in self.processed_files:
-                print(f"Skipping {media_file} - already processed on {self.processed_files[media_file]}")
+            try:
+                content_hash, completed = self._find_completed(media_file)
+            except OSError as e:
+                print(f"Error reading {media_file}: {str(e)}")
                 continue
+            if completed:
+                print(f"Skipping {media_file} - already processed on {completed['completed_at']}")
+            else:
+                pending.append((media_file, content_hash))
 
-            try:
-                print(f"\nProcessing {media_file}...")
-                media_path = os.path.join(self.input_folder, media_file)
-                audio_path = os.path.join(self.output_folder, 
-                                        os.path.splitext(media_file)[0] + '.aac')
+        if not pending:
+            return
 
-                # Process media with memory optimization
-                media = None
+        print(f"\nConverting {len(pending)} files with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for media_file, content_hash in pending:
+                convert_func, job_args, audio_path = self._conversion_job(media_file)
+                futures[executor.submit(convert_func, *job_args)] = (media_file, content_hash, audio_path)
+            for future in as_completed(futures):
+                media_file, content_hash, audio_path = futures[future]
                 try:
-                    # Load media file based on type
-                    if self._is_video_file(media_file):
-                        media = VideoFileClip(media_path, audio_buffersize=self.chunk_size)
-                        audio = media.audio
-                    else:
-                        media = AudioFileClip(media_path)
-                        audio = media
-                    
-                    # Extract/convert audio with optimized settings
-                    audio.write_audiofile(
-                        audio_path,
-                        codec='aac',
-                        fps=44100,  # Standard audio sampling rate
-                        nbytes=2,   # 16-bit audio
-                        buffersize=self.chunk_size,
-                        verbose=False,
-                        logger=None
-                    )
-                    
-                    # Update tracking file
-                    self._update_processed_files(media_file)
-                    print(f"Successfully converted {media_file} to AAC")
-
+                    self._record_conversion(media_file, content_hash, audio_path, future.result())
                 except Exception as e:
                     print(f"Error processing {media_file}: {str(e)}")
-                    if os.path.exists(audio_path):
-                        os.remove(audio_path)
-                
-                finally:
-                    # Clean up resources
-                    if media is not None:
-                        media.close()
-                        del media
-                    gc.collect()  # Force garbage collection
-
-            except Exception as e:
-                print(f"Fatal error with {media_file}: {str(e)}")
-                continue
 
-def main():
+    def _print_throughput(self, converted, audio_seconds, elapsed, workers):
+        if converted == 0 or elapsed <= 0:
+            return
+        print(f"\nConverted {converted} files ({audio_seconds:.1f}s of audio) in {elapsed:.1f}s "
+              f"with {workers} worker(s): {converted / elapsed:.2f} files/sec, "
+              f"{audio_seconds / elapsed:.1f} audio-seconds/sec")
+
+    def convert_file(self, media_file):
+        # Returns the audio path on success (or if already converted), None on failure
+        # Skip if already processed (before resolving ffmpeg, so skips never import moviepy)
+        try:
+            content_hash, completed = self._find_completed(media_file)
+        except OSError as e:
+            print(f"Error reading {media_file}: {str(e)}")
+            return None
+        if completed:
+            print(f"Skipping {media_file} - already processed on {completed['completed_at']}")
+            audio_path = self._audio_path(media_file)
+            return audio_path if os.path.exists(audio_path) else None
+
+        try:
+            print(f"\nProcessing {media_file}...")
+            convert_func, job_args, audio_path = self._conversion_job(media_file)
+            os.makedirs(self.output_folder, exist_ok=True)
+
+            if self.executor is not None:
+                # Run the decode/encode on a pool process so threads don't contend for the GIL
+                duration = self.executor.submit(convert_func, *job_args).result()
+            else:
+                duration = convert_func(*job_args)
+
+            self._record_conversion(media_file, content_hash, audio_path, duration)
+            return audio_path
+
+        except Exception as e:
+            print(f"Error processing {media_file}: {str(e)}")
+            return None
+
+        finally:
+            if self.executor is None:
+                gc.collect()  # Force garbage collection
+
+# Module-level so it can be pickled into ProcessPoolExecutor workers.
+# Returns the duration of the converted audio in seconds.
+def convert_to_aac(media_path, audio_path, is_video, chunk_size, stream_copy=True):
+    if stream_copy:
+        duration = remux_aac(media_path, audio_path)
+        if duration is not None:
+            return duration
+    return transcode_to_aac(media_path, audio_path, is_video, chunk_size)
+
+# Screen recordings and most .mp4/.mov/.mkv files already carry AAC audio: copying the
+# track into an ADTS .aac file skips the decode to NumPy and the lossy re-encode, so the
+# conversion is bound by disk speed. Returns the duration, or None when the file needs transcoding.
+def remux_aac(media_path, audio_path):
+    from moviepy.config import get_setting
+
+    ffmpeg_binary = get_setting("FFMPEG_BINARY")
+    probe = probe_audio(media_path, ffmpeg_binary)
+    if not probe or probe['codec'] != 'aac':
+        return None
+
+    try:
+        with span('convert.remux', file=os.path.basename(media_path),
+                  bytes=os.path.getsize(media_path)) as remux_span:
+            copy_audio_stream(media_path, audio_path, ffmpeg_binary)
+            # Containers without a duration in their header: measure the copy instead
+            duration = probe['duration'] or (probe_audio(audio_path, ffmpeg_binary) or {}).get('duration') or 0.0
+            remux_span.set(audio_seconds=duration)
+    except (RuntimeError, OSError) as e:
+        print(f"Could not copy the AAC track of {os.path.basename(media_path)}, transcoding instead: {str(e)}")
+        return None
+    print(f"Copied the AAC track of {os.path.basename(media_path)} without re-encoding")
+    return duration
+
+def transcode_to_aac(media_path, audio_path, is_video, chunk_size):
+    from moviepy.editor import AudioFileClip, VideoFileClip
+
+    # Process media with memory optimization
+    media = None
+    try:
+        # Load media file based on type
+        with span('convert.load_media', file=os.path.basename(media_path),
+                  bytes=os.path.getsize(media_path)):
+            if is_video:
+                media = VideoFileClip(media_path, audio_buffersize=chunk_size)
+                audio = media.audio
+            else:
+                media = AudioFileClip(media_path)
+                audio = media
+
+        # Extract/convert audio with optimized settings
+        with span('convert.write_audio', file=os.path.basename(media_path),
+                  audio_seconds=audio.duration) as write_span:
+            audio.write_audiofile(
+                audio_path,
+                codec='aac',
+                fps=44100,  # Standard audio sampling rate
+                nbytes=2,   # 16-bit audio
+                buffersize=chunk_size,
+                verbose=False,
+                logger=None
+            )
+            write_span.set(bytes=os.path.getsize(audio_path))
+        return audio.duration
+
+    except Exception:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        raise
+
+    finally:
+        # Clean up resources
+        if media is not None:
+            media.close()
+
+# Writes 16 kHz mono float32 samples straight from ffmpeg, skipping the lossy AAC
+# encode and the second decode Whisper would otherwise do. Returns the duration in seconds.
+def convert_to_whisper_audio(media_path, audio_path, ffmpeg_binary, chunk_size):
+    with span('convert.decode', file=os.path.basename(media_path),
+              bytes=os.path.getsize(media_path)) as decode_span:
+        duration = write_whisper_audio(media_path, audio_path, ffmpeg_binary, chunk_size) / SAMPLE_RATE
+        decode_span.set(audio_seconds=duration)
+    return duration
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert media files to AAC")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of conversion processes (default: 1, sequential)")
+    parser.add_argument('--format', choices=['aac', 'whisper'], default='aac',
+                        help="'whisper' writes 16 kHz mono float32 .npy for transcription only")
+    parser.add_argument('--transcode', action='store_true',
+                        help="Always re-encode to 44.1 kHz AAC, even when the audio already is AAC")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
     # Initialize converter with memory-efficient settings
     chunk_size = 1024 * 1024  # 1MB chunks
-    converter = MediaConverter(chunk_size=chunk_size)
+    converter = MediaConverter(chunk_size=chunk_size, output_format=args.format,
+                               stream_copy=not args.transcode)
     
     try:
-        converter.convert_media()
+        converter.convert_media(workers=args.workers)
     except KeyboardInterrupt:
         print("\nConversion interrupted by user")
     except Exception as e:
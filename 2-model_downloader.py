@@ -1,36 +1,227 @@
+import argparse
+import hashlib
+import json
 import os
-import whisper
-from whisper import _download, _MODELS
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1024 * 1024
+# Attempts per file; each retry resumes from what is already on disk
+RETRIES = 3
+TIMEOUT_SECONDS = 60
+# Verified checksums, keyed by file name with its size and mtime, so a model that is
+# already present is confirmed without reading it again
+MANIFEST_NAME = 'checksums.json'
+# Where openai-whisper publishes its checkpoints; --mirror replaces this prefix
+DEFAULT_BASE_URL = 'https://openaipublic.azureedge.net/main/whisper/models'
+
+_manifest_lock = threading.Lock()
+
+
+def model_url(model_size, base_url=None):
+    """Download URL of a model; its second-to-last path segment is the file's SHA-256."""
+    # Only the URL table is needed, but whisper imports torch; deferred until a URL is asked for
+    from whisper import _MODELS, available_models
+
+    if model_size not in _MODELS:
+        raise ValueError(f"Model {model_size} not found. Available models: {available_models()}")
+    url = _MODELS[model_size]
+    if base_url:
+        url = url.replace(DEFAULT_BASE_URL, base_url.rstrip('/'), 1)
+    return url
+
+
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 class ModelDownloader:
-    def __init__(self, model_dir='whisper_model', model_size='small'):
+    def __init__(self, model_dir='whisper_model', model_size='small', base_url=None):
         self.model_dir = model_dir
         self.model_size = model_size
-        self.model_path = os.path.join(model_dir, f'{model_size}.pt')
+        self.url = model_url(model_size, base_url)
+        self.expected_sha256 = self.url.split('/')[-2]
+        # Named like the URL (e.g. large-v3.pt for 'large'), which is where whisper.load_model looks
+        self.model_path = os.path.join(model_dir, os.path.basename(self.url))
+        self.manifest_path = os.path.join(model_dir, MANIFEST_NAME)
         os.makedirs(model_dir, exist_ok=True)
-    
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _remember_checksum(self, sha256):
+        stat = os.stat(self.model_path)
+        # Several downloaders share one manifest; rewrite it whole under a lock
+        with _manifest_lock:
+            manifest = self._read_manifest()
+            manifest[os.path.basename(self.model_path)] = {
+                'sha256': sha256, 'size': stat.st_size, 'mtime': stat.st_mtime}
+            partial = f"{self.manifest_path}.part"
+            with open(partial, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(partial, self.manifest_path)
+
+    def verify(self):
+        """True if the model file is present and matches its published SHA-256."""
+        if not os.path.isfile(self.model_path):
+            return False
+        stat = os.stat(self.model_path)
+        entry = self._read_manifest().get(os.path.basename(self.model_path))
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['sha256'] == self.expected_sha256
+
+        print(f"Verifying {self.model_path}...")
+        sha256 = sha256_file(self.model_path)
+        self._remember_checksum(sha256)
+        return sha256 == self.expected_sha256
+
+    def _fetch(self, partial_path):
+        # Appends to partial_path from where it ends, feeding self._digest
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        request = urllib.request.Request(self.url)
+        if offset:
+            request.add_header('Range', f'bytes={offset}-')
+        try:
+            source = urllib.request.urlopen(request, timeout=TIMEOUT_SECONDS)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset:
+                return  # the partial file is already complete
+            raise
+
+        with source:
+            if offset and source.status != 206:
+                # Server ignored the range; start over
+                print(f"{self.model_size}: server does not support resuming, restarting download")
+                offset = 0
+                self._digest = hashlib.sha256()
+            elif offset:
+                print(f"{self.model_size}: resuming at {offset / 1024 ** 2:.1f} MB")
+            length = source.headers.get('Content-Length')
+            total = offset + int(length) if length else None
+
+            received = 0
+            next_report = 0.25
+            with open(partial_path, 'ab' if offset else 'wb') as output:
+                for block in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    output.write(block)
+                    self._digest.update(block)
+                    received += len(block)
+                    if total and (offset + received) / total >= next_report:
+                        print(f"{self.model_size}: {(offset + received) / total:.0%} "
+                              f"of {total / 1024 ** 2:.0f} MB")
+                        next_report += 0.25
+            if total and offset + received < total:
+                # Connection closed early; the retry resumes from here
+                raise OSError(f"connection closed after {(offset + received) / 1024 ** 2:.1f} MB")
+
     def download_model(self):
+        """Make sure the verified checkpoint is on disk, downloading or resuming it if needed; returns its path.
+
+        The model is never loaded here: provisioning only needs the file.
+        """
         try:
-            print(f"Downloading {self.model_size} model...")
-            
-            # First ensure the model exists
-            if self.model_size not in _MODELS:
-                raise ValueError(f"Model {self.model_size} not found. Available models: {whisper.available_models()}")
-            
-            # Download the model to the specified directory
-            if not os.path.exists(self.model_path):
-                print(f"Downloading model to {self.model_path}")
-                _download(_MODELS[self.model_size], self.model_dir, False)
-            
-            # Load the model
-            model = whisper.load_model(self.model_size)
-            print("Model downloaded and loaded successfully")
-            return model
-            
+            if self.verify():
+                print(f"{self.model_size} model already present at {self.model_path}")
+                return self.model_path
+
+            partial_path = f"{self.model_path}.part"
+            self._digest = hashlib.sha256()
+            if os.path.exists(partial_path):
+                # Hash what is already there once, then only the new bytes
+                with open(partial_path, 'rb') as f:
+                    for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        self._digest.update(block)
+
+            print(f"Downloading {self.model_size} model to {self.model_path}")
+            start_time = time.time()
+            for attempt in range(1, RETRIES + 1):
+                try:
+                    self._fetch(partial_path)
+                    break
+                except (urllib.error.URLError, OSError) as e:
+                    if attempt == RETRIES:
+                        raise
+                    print(f"{self.model_size}: download interrupted ({str(e)}), retrying")
+
+            sha256 = self._digest.hexdigest()
+            if sha256 != self.expected_sha256:
+                os.remove(partial_path)
+                raise RuntimeError(f"SHA-256 mismatch for {self.model_size} "
+                                   f"(expected {self.expected_sha256}, got {sha256})")
+            os.replace(partial_path, self.model_path)
+            self._remember_checksum(sha256)
+
+            elapsed = time.time() - start_time
+            print(f"✓ {self.model_size} model downloaded and verified "
+                  f"({os.path.getsize(self.model_path) / 1024 ** 2:.1f} MB in {elapsed:.1f}s)")
+            return self.model_path
+
         except Exception as e:
-            raise Exception(f"Error downloading/loading model: {str(e)}")
+            raise Exception(f"Error downloading model: {str(e)}")
+
+
+def download_models(model_sizes, model_dir='whisper_model', parallel=3, base_url=None):
+    """Provision several model sizes concurrently; returns {size: path or None}."""
+    def download(model_size):
+        try:
+            return ModelDownloader(model_dir, model_size, base_url).download_model()
+        except Exception as e:
+            print(str(e))
+            return None
+
+    # Aliases ('large' and 'large-v3', 'turbo' and 'large-v3-turbo') name the same file;
+    # downloading it twice at once would interleave writes to one .part file
+    urls = {}
+    for model_size in model_sizes:
+        try:
+            urls[model_size] = model_url(model_size, base_url)
+        except ValueError as e:
+            print(f"Error downloading model: {str(e)}")
+            urls[model_size] = None
+    first_size = {}
+    for model_size, url in urls.items():
+        if url:
+            first_size.setdefault(url, model_size)
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        paths = dict(zip(first_size, executor.map(download, first_size.values())))
+    return {model_size: paths.get(url) for model_size, url in urls.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download and verify Whisper checkpoints without loading them")
+    parser.add_argument('model_sizes', nargs='*', default=['small'], help="e.g. tiny base small")
+    parser.add_argument('--model-dir', default='whisper_model')
+    parser.add_argument('--parallel', type=int, default=3, help="Models downloaded at once")
+    parser.add_argument('--mirror', help=f"Base URL to use instead of {DEFAULT_BASE_URL}")
+    parser.add_argument('--verify', action='store_true', help="Only check the files already on disk")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.verify:
+            for model_size in args.model_sizes:
+                downloader = ModelDownloader(args.model_dir, model_size, args.mirror)
+                print(f"{model_size}: {'OK' if downloader.verify() else 'missing or corrupt'}")
+            return
+        results = download_models(args.model_sizes, args.model_dir, args.parallel, args.mirror)
+        failed = [size for size, path in results.items() if path is None]
+        if failed:
+            print(f"\nFailed: {', '.join(failed)}")
+    except KeyboardInterrupt:
+        print("\nDownload interrupted; run again to resume")
+    except Exception as e:
+        print(f"\nFatal error: {str(e)}")
 
-# Example usage
 if __name__ == "__main__":
-    downloader = ModelDownloader(model_dir='whisper_model', model_size='small')
-    model = downloader.download_model()
\ No newline at end of file
+    main()
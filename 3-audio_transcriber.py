@@ -1,110 +1,410 @@
 import os
-import json
-from datetime import datetime
-import whisper
-import torch
+import time
+import argparse
+from audio_io import SAMPLE_RATE, WHISPER_AUDIO_EXTENSION, is_whisper_audio, load_whisper_audio, real_time_factor
+from job_ledger import JobLedger
+from segment_store import SegmentStoreWriter, store_path, txt_line, write_segment_store
+from sharded_transcription import DEFAULT_SHARD_SECONDS, ShardedTranscriber, stream_transcription
+from vad import detect_speech
+from transcription_backends import ENGINES, FASTER_WHISPER_COMPUTE_TYPES, backend_params, create_backend
+
+AUDIO_EXTENSIONS = ('.aac', '.mp3', '.wav', '.m4a', WHISPER_AUDIO_EXTENSION)
+
+# torch and whisper are imported where the model is loaded or audio decoded, so listing
+# work (see pipeline_plan.py) does not pay for them
+
+def list_audio_files(audio_folder):
+    """Audio files in a folder that the transcriber accepts."""
+    return [f for f in os.listdir(audio_folder) if f.lower().endswith(AUDIO_EXTENSIONS)]
+
+def transcription_params(engine, model_size, compute_type, vad=False, stream=False, word_timestamps=False):
+    """Stage parameters identifying a transcript in the job ledger."""
+    params = backend_params(engine, model_size, compute_type)
+    if vad:
+        params['vad'] = True
+    if stream:
+        params['stream'] = True
+    if word_timestamps:
+        params['word_timestamps'] = True
+    return params
 
 class AudioTranscriber:
     def __init__(self, audio_folder='aac', output_folder='transcripts', 
-                 model_size='small'):
+                 model_size='small', ledger=None, engine='whisper', compute_type='int8',
+                 vad=False, shard_workers=1, shard_seconds=DEFAULT_SHARD_SECONDS,
+                 shared_weights=False, stream=False, word_timestamps=False):
         self.audio_folder = audio_folder
         self.output_folder = output_folder
-        self.tracking_file = os.path.join(output_folder, 'transcribed_files.json')
+        self.model_size = model_size
+        self.engine = engine
+        self.compute_type = compute_type
+        # Voice-activity pre-pass: only speech regions are sent to the model
+        self.vad = vad
+        # Decode files through an ffmpeg pipe in 30-second windows instead of loading them whole
+        self.stream = stream
+        # Per-word times and probabilities, kept in the segment store next to each transcript
+        self.word_timestamps = word_timestamps
         
         # Create necessary directories
         os.makedirs(self.audio_folder, exist_ok=True)
         os.makedirs(self.output_folder, exist_ok=True)
         
-        # Load processed files tracking
-        self.processed_files = self._load_processed_files()
+        # Shared job ledger (one per pipeline, safe across threads)
+        self.ledger = ledger or JobLedger()
+        self.transcribed_count = 0
+        self.transcribed_seconds = 0.0
         
         # Set device
+        import torch
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
         
         # Load the model safely
         try:
-            print("Loading Whisper model...")
-            # Add Whisper model classes to safe globals
-            torch.serialization.add_safe_globals([whisper.model.Whisper])
-            
-            # Load model with weights_only=True
-            self.model = whisper.load_model(
+            print(f"Loading Whisper model ({engine})...")
+            self.backend = create_backend(
+                engine,
                 model_size,
                 device=self.device,
-                download_root=os.path.join(os.getcwd(), "whisper_model")
+                download_root=os.path.join(os.getcwd(), "whisper_model"),
+                compute_type=compute_type,
+                shared_weights=shared_weights,
+                word_timestamps=word_timestamps
             )
+            # Underlying model, used directly by the batched mode (openai-whisper only)
+            self.model = self.backend.model
             print("Model loaded successfully")
         except Exception as e:
             raise Exception(f"Error loading model: {str(e)}")
 
-    # Rest of your class implementation remains the same...
+        # Files longer than two shards are split at silences and transcribed across processes
+        self.sharder = None
+        if shard_workers > 1:
+            self.sharder = ShardedTranscriber(engine, model_size, device=self.device,
+                                              compute_type=compute_type, workers=shard_workers,
+                                              shard_seconds=shard_seconds, vad=vad,
+                                              shared_weights=shared_weights,
+                                              word_timestamps=word_timestamps)
+
+    def _ledger_params(self):
+        return transcription_params(self.engine, self.model_size, self.compute_type, self.vad, self.stream,
+                                    self.word_timestamps)
+
+    def _list_audio_files(self):
+        return list_audio_files(self.audio_folder)
+
+    def _output_path(self, audio_file):
+        return os.path.join(self.output_folder, os.path.splitext(audio_file)[0] + '.txt')
 
-    def _load_processed_files(self):
-        if os.path.exists(self.tracking_file):
-            with open(self.tracking_file, 'r') as f:
-                return json.load(f)
-        return {}
+    def _find_completed(self, audio_file):
+        # Returns (content hash, completed ledger entry or None)
+        content_hash = self.ledger.file_hash(os.path.join(self.audio_folder, audio_file))
+        return content_hash, self.ledger.lookup(content_hash, 'transcribe', self._ledger_params())
 
-    def _update_processed_files(self, filename):
-        self.processed_files[filename] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.tracking_file, 'w') as f:
-            json.dump(self.processed_files, f, indent=4)
+    def _load_audio(self, audio_path):
+        # Whisper-ready .npy audio is memory-mapped as-is instead of decoded through ffmpeg
+        if is_whisper_audio(audio_path):
+            return load_whisper_audio(audio_path)
+        import whisper
+        return whisper.load_audio(audio_path)
 
-    def transcribe_files(self):
-        audio_files = [f for f in os.listdir(self.audio_folder) 
-                      if f.lower().endswith(('.aac', '.mp3', '.wav', '.m4a'))]
+    def _prepare_audio(self, audio_file):
+        # Returns (audio for the model, speech timeline or None, original duration in seconds)
+        audio = self._load_audio(os.path.join(self.audio_folder, audio_file))
+        if len(audio) == 0:
+            # A file ffmpeg reads without error can still hold no audio; never record it as transcribed
+            raise RuntimeError(f"No audio decoded from {audio_file}")
+        duration = len(audio) / SAMPLE_RATE
+        if not self.vad:
+            return audio, None, duration
+
+        timeline = detect_speech(audio)
+        print(f"{audio_file}: skipping {timeline.skipped_fraction:.1%} of {duration:.1f}s as non-speech")
+        return timeline.compact(audio), timeline, duration
+
+    def _write_transcript(self, output_path, result):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            if 'segments' in result:
+                for segment in result['segments']:
+                    f.write(txt_line(segment['start'], segment['end'], segment['text']))
+            else:
+                f.write(result['text'])
+        # Written after the text, so a store older than its transcript means the text was edited
+        if 'segments' in result:
+            write_segment_store(store_path(output_path), result['segments'])
+
+    def _remove_transcript(self, output_path):
+        for path in (output_path, store_path(output_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _print_speed(self, label, files, audio_seconds, elapsed):
+        if files == 0 or audio_seconds <= 0:
+            return
+        print(f"\n{label}: {files} files, {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+              f"(real-time factor {real_time_factor(elapsed, audio_seconds):.3f})")
+
+    def transcribe_files(self, batch_size=1):
+        audio_files = self._list_audio_files()
 
         if not audio_files:
             print("No audio files found in the input folder")
             return
 
+        start_files, start_seconds = self.transcribed_count, self.transcribed_seconds
+        start_time = time.time()
+        try:
+            if batch_size > 1:
+                if self.engine != 'whisper':
+                    raise ValueError("Batched transcription requires the 'whisper' engine")
+                if self.word_timestamps:
+                    raise ValueError("Batched transcription does not produce word timestamps")
+                self._transcribe_batched(audio_files, batch_size)
+                return
+            for audio_file in audio_files:
+                self.transcribe_file(audio_file)
+        finally:
+            self.close()
+        self._print_speed("Sequential transcription", self.transcribed_count - start_files,
+                          self.transcribed_seconds - start_seconds, time.time() - start_time)
+
+    def _transcribe_batched(self, audio_files, batch_size):
+        pending = {}
         for audio_file in audio_files:
-            if audio_file in self.processed_files:
+            try:
+                content_hash, completed = self._find_completed(audio_file)
+            except OSError as e:
+                print(f"Error reading {audio_file}: {str(e)}")
+                continue
+            if completed:
                 print(f"Skipping {audio_file} - already transcribed on "
-                      f"{self.processed_files[audio_file]}")
+                      f"{completed['completed_at']}")
                 continue
+            pending[audio_file] = content_hash
+
+        if not pending:
+            return
+
+        timelines = {}
+        durations = {}
+
+        def inputs():
+            # Audio is loaded lazily, as the batcher needs more windows
+            for audio_file in pending:
+                try:
+                    audio, timelines[audio_file], durations[audio_file] = self._prepare_audio(audio_file)
+                    yield audio_file, audio
+                except Exception as e:
+                    print(f"Error loading {audio_file}: {str(e)}")
 
+        def on_complete(audio_file, result):
+            output_path = self._output_path(audio_file)
+            timeline = timelines.pop(audio_file, None)
             try:
-                print(f"\nTranscribing {audio_file}...")
-                audio_path = os.path.join(self.audio_folder, audio_file)
-                output_path = os.path.join(
-                    self.output_folder, 
-                    os.path.splitext(audio_file)[0] + '.txt'
-                )
+                if timeline is not None:
+                    timeline.remap_result(result)
+                self._write_transcript(output_path, result)
+                self.ledger.record(pending[audio_file], 'transcribe', self._ledger_params(),
+                                   audio_file, output_path)
+                print(f"Successfully transcribed {audio_file}")
+            except Exception as e:
+                print(f"Error writing {audio_file}: {str(e)}")
+                self._remove_transcript(output_path)
+
+        print(f"\nTranscribing {len(pending)} files in batches of {batch_size} windows...")
+        from batched_transcription import BatchedTranscriber
+        batcher = BatchedTranscriber(self.model, batch_size=batch_size, language="en")
+        results = batcher.transcribe(inputs(), on_complete=on_complete)
+        self._print_speed("Batched transcription", len(results),
+                          sum(durations[f] for f in results), batcher.stats["elapsed"])
+
+    def compare_batched(self, batch_size, limit=None):
+        """Time the sequential loop against batched decoding on the same files; nothing is written."""
+        if self.engine != 'whisper':
+            raise ValueError("Batched transcription requires the 'whisper' engine")
+        audio_files = self._list_audio_files()[:limit]
+        if not audio_files:
+            print("No audio files found in the input folder")
+            return
+
+        audio = [(f, self._load_audio(os.path.join(self.audio_folder, f))) for f in audio_files]
+        audio_seconds = sum(len(samples) for _, samples in audio) / SAMPLE_RATE
+
+        start_time = time.time()
+        for _, samples in audio:
+            self.model.transcribe(samples, language="en", fp16=False)
+        sequential = time.time() - start_time
+
+        from batched_transcription import BatchedTranscriber
+        batcher = BatchedTranscriber(self.model, batch_size=batch_size, language="en")
+        batcher.transcribe(audio)
+        batched = batcher.stats["elapsed"]
+
+        print(f"\n{len(audio)} files, {audio_seconds:.1f}s of audio")
+        print(f"Sequential:            {sequential:.1f}s (real-time factor "
+              f"{real_time_factor(sequential, audio_seconds):.3f})")
+        print(f"Batched (batch {batch_size:>3}):  {batched:.1f}s (real-time factor "
+              f"{real_time_factor(batched, audio_seconds):.3f})")
+        if batched > 0:
+            print(f"Speed-up: {sequential / batched:.2f}x")
+
+    def close(self):
+        # Stops the shard worker processes, if any were started, after reporting their memory
+        if self.sharder is not None:
+            self.sharder.print_memory()
+            self.sharder.close()
+
+    def _transcribe_sharded(self, audio_file):
+        # Returns (result, duration), or None when the file is too short to be worth sharding
+        audio_path = os.path.join(self.audio_folder, audio_file)
+        shards = self.sharder.plan(audio_path)
+        if len(shards) < 2:
+            return None
+        duration = shards[-1][1]
+        print(f"{audio_file}: {duration:.1f}s split into {len(shards)} shards "
+              f"across {self.sharder.workers} processes")
+        return self.sharder.transcribe(audio_path, shards), duration
+
+    def transcribe_file(self, audio_file):
+        # Returns the transcript path on success (or if already transcribed), None on failure
+        output_path = self._output_path(audio_file)
+
+        try:
+            content_hash, completed = self._find_completed(audio_file)
+        except OSError as e:
+            print(f"Error reading {audio_file}: {str(e)}")
+            return None
+
+        if completed:
+            print(f"Skipping {audio_file} - already transcribed on "
+                  f"{completed['completed_at']}")
+            return output_path if os.path.exists(output_path) else None
+
+        try:
+            print(f"\nTranscribing {audio_file}...")
+            start_time = time.time()
+            sharded = self._transcribe_sharded(audio_file) if self.sharder else None
+            if sharded is not None:
+                result, duration = sharded
+            elif self.stream:
+                # Writes the transcript and records it in the ledger itself
+                return self.transcribe_streaming(os.path.join(self.audio_folder, audio_file),
+                                                 self._print_segments, output_path, content_hash)
+            else:
+                audio, timeline, duration = self._prepare_audio(audio_file)
 
                 # Perform transcription
-                result = self.model.transcribe(
-                    audio_path,
-                    language="en",
-                    fp16=False  # Use False if you don't have GPU
-                )
-
-                # Write transcription to file
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    if 'segments' in result:
-                        for segment in result['segments']:
-                            f.write(f"[{segment['start']:.2f}s -> {segment['end']:.2f}s] "
-                                   f"{segment['text']}\n")
-                    else:
-                        f.write(result['text'])
-
-                self._update_processed_files(audio_file)
-                print(f"Successfully transcribed {audio_file}")
+                if len(audio) > 0:
+                    result = self.backend.transcribe(audio, language="en")
+                else:
+                    result = {'text': '', 'segments': []}  # nothing but silence
 
-            except Exception as e:
-                print(f"Error processing {audio_file}: {str(e)}")
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                continue
+                # Put timestamps back on the original timeline when silence was cut out
+                if timeline is not None:
+                    timeline.remap_result(result)
+            self.transcribed_count += 1
+            self.transcribed_seconds += duration
+
+            # Write transcription to file
+            self._write_transcript(output_path, result)
+
+            self.ledger.record(content_hash, 'transcribe', self._ledger_params(),
+                               audio_file, output_path)
+            print(f"Successfully transcribed {audio_file} "
+                  f"(real-time factor {real_time_factor(time.time() - start_time, duration):.3f})")
+            return output_path
+
+        except Exception as e:
+            print(f"Error processing {audio_file}: {str(e)}")
+            self._remove_transcript(output_path)
+            return None
+
+    def _print_segments(self, segments):
+        for segment in segments:
+            print(f"  [{segment['start']:.2f}s -> {segment['end']:.2f}s]{segment['text']}")
+
+    def transcribe_streaming(self, audio_path, on_segments, output_path=None, content_hash=None):
+        # Transcribes one file (any format ffmpeg reads) 30 seconds at a time as ffmpeg
+        # decodes it, so memory does not grow with its length. on_segments(new segments)
+        # is called after each window and the transcript is written as it grows; returns
+        # its path. The segment store is written once the transcript is complete. Errors
+        # are raised to the caller, which reports them
+        audio_file = os.path.basename(audio_path)
+        output_path = output_path or self._output_path(audio_file)
+        content_hash = content_hash or self.ledger.file_hash(audio_path)
+        start_time = time.time()
+
+        duration = 0.0
+        partial_path = f"{output_path}.part"
+        # Only the columns are kept (not tokens), so this stays small for multi-hour files
+        store = SegmentStoreWriter()
+        try:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                for added, duration in stream_transcription(self.backend, audio_path, vad=self.vad):
+                    for segment in added:
+                        f.write(txt_line(segment['start'], segment['end'], segment['text']))
+                    f.flush()
+                    store.add(added)
+                    if added:
+                        on_segments(added)
+            os.replace(partial_path, output_path)
+            store.write(store_path(output_path))
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        self.transcribed_count += 1
+        self.transcribed_seconds += duration
+        self.ledger.record(content_hash, 'transcribe', self._ledger_params(), audio_file, output_path)
+        print(f"Successfully transcribed {audio_file} "
+              f"(real-time factor {real_time_factor(time.time() - start_time, duration):.3f})")
+        return output_path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe audio files with Whisper")
+    parser.add_argument('--model-size', default='small')
+    parser.add_argument('--engine', choices=ENGINES, default='whisper')
+    parser.add_argument('--compute-type', choices=FASTER_WHISPER_COMPUTE_TYPES, default='int8',
+                        help="faster-whisper weight/compute precision (int8 is fastest on CPU)")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Decode this many 30-second windows (across files) per forward pass")
+    parser.add_argument('--vad', action='store_true',
+                        help="Detect speech first and only transcribe speech regions")
+    parser.add_argument('--shard-workers', type=int, default=1,
+                        help="Split long files at silences and transcribe the shards in this many processes")
+    parser.add_argument('--shard-seconds', type=float, default=DEFAULT_SHARD_SECONDS,
+                        help="Target shard length; only files longer than two shards are split")
+    parser.add_argument('--shared-weights', action='store_true',
+                        help="Shard workers map one float32 copy of the model weights instead of loading one each")
+    parser.add_argument('--stream', action='store_true',
+                        help="Decode each file through ffmpeg in 30-second windows (flat memory, segments printed as they are decoded)")
+    parser.add_argument('--word-timestamps', action='store_true',
+                        help="Also record per-word times and probabilities in the segment store (not with --batch-size)")
+    parser.add_argument('--compare', action='store_true',
+                        help="Report real-time factor of the sequential loop vs --batch-size, without writing")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
 
-def main():
     try:
         transcriber = AudioTranscriber(
             audio_folder='aac',
             output_folder='transcripts',
-            model_size='small'
+            model_size=args.model_size,
+            engine=args.engine,
+            compute_type=args.compute_type,
+            vad=args.vad,
+            shard_workers=args.shard_workers,
+            shard_seconds=args.shard_seconds,
+            shared_weights=args.shared_weights,
+            stream=args.stream,
+            word_timestamps=args.word_timestamps
         )
-        transcriber.transcribe_files()
+        if args.compare:
+            transcriber.compare_batched(max(args.batch_size, 2))
+        else:
+            transcriber.transcribe_files(batch_size=args.batch_size)
         
     except KeyboardInterrupt:
         print("\nTranscription interrupted by user")
@@ -112,4 +412,4 @@ def main():
         print(f"\nFatal error: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
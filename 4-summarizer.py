@@ -0,0 +1,454 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from instrumentation import span
+from job_ledger import JobLedger
+from ollama_session import DEFAULT_HOST, KEEP_ALIVE, create_client, keep_model_loaded
+from summary_cache import DEFAULT_CACHE_PATH, CachedClient, SummaryCache, summary_key
+from transcript_chunks import chunk_pieces, create_chunks, estimate_tokens, label_time_range, segment_pieces
+
+# Constants
+MODELS = {'1.7b': 'smollm2', '360m': 'smollm2:360m'}
+# Which model runs each phase: 'map' summarizes chunks, 'reduce' merges groups of
+# summaries and 'final' writes the summary that is saved. The cascade lets the small
+# model do the many map/reduce calls and keeps the larger one for the final text
+ROUTING_POLICIES = {
+    '1.7b': {'map': 'smollm2', 'reduce': 'smollm2', 'final': 'smollm2'},
+    '360m': {'map': 'smollm2:360m', 'reduce': 'smollm2:360m', 'final': 'smollm2:360m'},
+    'cascade': {'map': 'smollm2:360m', 'reduce': 'smollm2:360m', 'final': 'smollm2'},
+}
+DEFAULT_POLICY = '1.7b'
+PHASES = ('map', 'reduce', 'final')
+# Chunk requests in flight at once; match the server's OLLAMA_NUM_PARALLEL
+PARALLEL_REQUESTS = 4
+# Estimated tokens of summaries allowed into one combining prompt. smollm2 runs with a
+# small context window by default and Ollama silently drops whatever does not fit
+REDUCE_TOKEN_BUDGET = 1500
+
+# Instructions go in the system prompt, ahead of the text, so every request of a phase
+# starts with the same tokens and Ollama can reuse their evaluation from its KV cache
+CHUNK_SYSTEM_PROMPT = """As an expert analyst, provide a detailed and structured summary of each transcript segment you are given. Focus on creating a comprehensive narrative that captures:
+
+CONTEXT & STRUCTURE:
+- Identify the format (lecture, audiobook, podcast, discussion)
+- Note speaking style, tone, and delivery method
+- Capture the flow and progression of ideas
+
+KEY ELEMENTS TO ANALYZE:
+- Main topics and core arguments presented
+- Supporting evidence and examples given
+- Technical terms or specialized concepts explained
+- Notable quotes or significant statements
+- Questions raised and answers provided
+- Any debates or contrasting viewpoints
+- Real-world applications or case studies mentioned
+
+ENSURE TO INCLUDE:
+- Chronological progression of the discussion
+- Relationships between different topics
+- Practical takeaways or actionable insights
+- Complex concepts broken down into understandable parts
+
+Provide a thorough summary that:
+1. Maintains the original depth and complexity
+2. Uses clear topic transitions
+3. Preserves important details and examples
+4. Captures the educational or informative value
+5. Reflects the speaker's expertise and perspective"""
+
+COMBINE_SYSTEM_PROMPT = """Merge the consecutive segment summaries of one transcript you are given into a single detailed summary.
+
+Each summary starts with the time range of the recording it covers.
+Keep the chronological order, the key arguments, examples, technical terms and notable quotes.
+Do not add an introduction or conclusion; the result will be combined with other parts later."""
+
+FINAL_SYSTEM_PROMPT = """Create a cohesive and comprehensive final summary of an entire transcript from the segment summaries you are given.
+
+The content is divided into several segments. Synthesize these into a well-structured analysis that:
+
+1. Opens with an overview of the entire content
+2. Maintains chronological and logical flow
+3. Highlights the progression of ideas
+4. Preserves critical details and examples
+5. Connects related concepts across segments
+6. Concludes with key takeaways
+
+Provide a detailed final summary that captures the full scope and depth of the content while maintaining clarity and coherence."""
+
+# Request options and prompt templates of the reduce and final phases; with the system
+# prompts and the models they also identify a final summary in the cache
+COMBINE_OPTIONS = {'temperature': 0.3, 'top_p': 0.92, 'max_tokens': 500,
+                   'presence_penalty': 0.3, 'frequency_penalty': 0.3}
+FINAL_OPTIONS = {'temperature': 0.3, 'top_p': 0.92,
+                 'max_tokens': 800,  # Increased for comprehensive final summary
+                 'presence_penalty': 0.3, 'frequency_penalty': 0.3}
+COMBINE_PROMPT = "Segment summaries:\n\n{summaries}"
+FINAL_PROMPT = "Here are the segment summaries to combine:\n\n{summaries}"
+
+def routing_params(routing):
+    """Stage parameters for the job ledger; a single-model routing keeps the old {'model': ...} key."""
+    models = set(routing.values())
+    if len(models) == 1:
+        return {'model': models.pop()}
+    return dict(routing)
+
+class ModelRouter:
+    """Sends each phase's requests to its model and keeps per-phase latency and token totals."""
+
+    def __init__(self, client, routing, name='custom'):
+        self.client = client
+        self.routing = dict(routing)
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {phase: {'calls': 0, 'cached': 0, 'seconds': 0.0, 'prompt_tokens': 0,
+                              'output_tokens': 0} for phase in PHASES}
+
+    def ledger_params(self):
+        return routing_params(self.routing)
+
+    def models(self):
+        return sorted(set(self.routing.values()))
+
+    def generate(self, phase, prompt, options, label, system=None):
+        """Run one Ollama generate call on the phase's model and report its latency, prompt reuse and decode speed."""
+        model = self.routing[phase]
+        start_time = time.time()
+        with span('summarize.generate', model=model, phase=phase) as generate_span:
+            response = self.client.generate(model=model, prompt=prompt, system=system, options=options,
+                                            keep_alive=KEEP_ALIVE)
+            # Ollama reports the decode phase as eval_count tokens over eval_duration nanoseconds
+            eval_count = response.get('eval_count') or 0
+            eval_duration = response.get('eval_duration') or 0
+            tokens_per_sec = eval_count / (eval_duration / 1e9) if eval_duration else 0.0
+            # prompt_eval_count only counts tokens that were not already in the KV cache
+            prompt_eval_count = response.get('prompt_eval_count') or 0
+            prompt_eval_duration = response.get('prompt_eval_duration') or 0
+            generate_span.set(cached=bool(response.get('cached')), prompt_tokens=prompt_eval_count,
+                              output_tokens=eval_count, eval_seconds=eval_duration / 1e9,
+                              tokens_per_second=tokens_per_sec)
+        latency = time.time() - start_time
+        if response.get('cached'):
+            with self._lock:
+                self.stats[phase]['cached'] += 1
+            print(f"{label}: cached")
+            return response['response']
+
+        # The rest of the system + prompt was reused, saving its share of prompt evaluation time
+        reused = max(estimate_tokens((system or '') + '\n' + prompt) - prompt_eval_count, 0)
+        saved = reused * prompt_eval_duration / prompt_eval_count / 1e9 if prompt_eval_count else 0.0
+
+        with self._lock:
+            stats = self.stats[phase]
+            stats['calls'] += 1
+            stats['seconds'] += latency
+            stats['prompt_tokens'] += prompt_eval_count
+            stats['output_tokens'] += eval_count
+
+        print(f"{label} ({model}): {latency:.1f}s, prompt {prompt_eval_count} tokens evaluated "
+              f"(~{reused} reused, ~{saved:.2f}s saved), {eval_count} tokens at {tokens_per_sec:.1f} tokens/sec")
+        return response['response']
+
+    def report(self):
+        """Print request latency and token cost per phase for this routing policy."""
+        print(f"\nRouting policy '{self.name}': " +
+              ', '.join(f"{phase}={self.routing[phase]}" for phase in PHASES))
+        print(f"{'phase':<8}{'model':<16}{'calls':>7}{'cached':>8}{'seconds':>10}{'prompt tok':>12}{'output tok':>12}")
+        totals = {'calls': 0, 'cached': 0, 'seconds': 0.0, 'prompt_tokens': 0, 'output_tokens': 0}
+        for phase in PHASES:
+            stats = self.stats[phase]
+            for key in totals:
+                totals[key] += stats[key]
+            print(f"{phase:<8}{self.routing[phase]:<16}{stats['calls']:>7}{stats['cached']:>8}"
+                  f"{stats['seconds']:>10.1f}{stats['prompt_tokens']:>12}{stats['output_tokens']:>12}")
+        print(f"{'total':<24}{totals['calls']:>7}{totals['cached']:>8}{totals['seconds']:>10.1f}"
+              f"{totals['prompt_tokens']:>12}{totals['output_tokens']:>12}")
+        return totals
+
+def summarize_chunk(router, chunk, label='Chunk'):
+    """Summarize a single chunk of text with enhanced prompt for detailed analysis."""
+    prompt = f"""Here's the transcript segment to analyze:
+
+{chunk}"""
+    
+    return router.generate(
+        'map',
+        prompt,
+        options={
+            'temperature': 0.3,  # Reduced for more focused output
+            'top_p': 0.92,
+            'max_tokens': 500,   # Increased for more detailed summaries
+            'presence_penalty': 0.3,  # Encourage diverse content
+            'frequency_penalty': 0.3  # Reduce repetition
+        },
+        label=label,
+        system=CHUNK_SYSTEM_PROMPT
+    )
+
+def map_parallel(function, items, parallel=PARALLEL_REQUESTS):
+    """Call function(index, item) for every item with up to `parallel` calls at once; results keep item order."""
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        return list(executor.map(lambda pair: function(*pair), enumerate(items, 1)))
+
+def summarize_chunks(router, chunks, parallel=PARALLEL_REQUESTS):
+    """Summarize independent chunks concurrently; summaries come back in chunk order."""
+    start_time = time.time()
+    summaries = map_parallel(
+        lambda i, chunk: summarize_chunk(
+            router, chunk.text, label_time_range(f"Chunk {i}/{len(chunks)}", chunk.start, chunk.end)),
+        chunks, parallel)
+    print(f"Summarized {len(chunks)} chunks in {time.time() - start_time:.1f}s "
+          f"({min(parallel, len(chunks))} in parallel)")
+    return summaries
+
+def combine_summaries(router, summaries, label='Group'):
+    """Merge consecutive segment summaries into one intermediate summary."""
+    return router.generate(
+        'reduce',
+        COMBINE_PROMPT.format(summaries='\n'.join(summaries)),
+        options=COMBINE_OPTIONS,
+        label=label,
+        system=COMBINE_SYSTEM_PROMPT
+    )
+
+def group_by_budget(summaries, token_budget=REDUCE_TOKEN_BUDGET):
+    """Split summaries into consecutive groups whose estimated size fits the token budget."""
+    groups = []
+    current, current_tokens = [], 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        # Every group takes at least two summaries, so each level is guaranteed to shrink
+        if current_tokens + tokens > token_budget and len(current) >= 2:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])  # never leave a lone summary to be "combined" by itself
+    elif current:
+        groups.append(current)
+    return groups
+
+def reduce_summaries(router, summaries, ranges, parallel=PARALLEL_REQUESTS,
+                     token_budget=REDUCE_TOKEN_BUDGET):
+    """Recursively combine summaries in groups until together they fit in one prompt.
+
+    summaries are labelled with their time range; ranges holds the matching
+    (start, end) pairs so every combined summary is labelled with the span it covers.
+    """
+    shape = [len(summaries)]
+    level = 1
+    while len(summaries) > 1 and estimate_tokens('\n'.join(summaries)) > token_budget:
+        groups = group_by_budget(summaries, token_budget)
+        start_time = time.time()
+        summaries = map_parallel(
+            lambda i, group: combine_summaries(router, group, f"Level {level} group {i}/{len(groups)}"),
+            groups, parallel)
+
+        # Groups are consecutive, so each one covers from its first to its last summary's range
+        grouped_ranges, position = [], 0
+        for group in groups:
+            grouped_ranges.append((ranges[position][0], ranges[position + len(group) - 1][1]))
+            position += len(group)
+        ranges = grouped_ranges
+        summaries = [label_time_range(summary, start, end)
+                     for summary, (start, end) in zip(summaries, ranges)]
+        print(f"Reduce level {level}: {sum(len(g) for g in groups)} summaries -> {len(summaries)} "
+              f"(groups of {', '.join(str(len(g)) for g in groups)}) in {time.time() - start_time:.1f}s")
+        shape.append(len(summaries))
+        level += 1
+    print(f"Reduce tree: {' -> '.join(str(n) for n in shape)} -> final")
+    return summaries
+
+def final_summary_key(router, chunk_summaries):
+    """Cache key of a transcript's final summary, known before the reduce step runs."""
+    return summary_key('final summary', router.routing, chunk_summaries, {
+        'reduce': [COMBINE_SYSTEM_PROMPT, COMBINE_PROMPT, COMBINE_OPTIONS, REDUCE_TOKEN_BUDGET],
+        'final': [FINAL_SYSTEM_PROMPT, FINAL_PROMPT, FINAL_OPTIONS],
+    })
+
+def load_chunks(transcript_path):
+    """Chunks of a transcript, read from its segment store when it has an up-to-date one."""
+    # numpy comes with the store, so it is only imported once there is a transcript to read
+    from segment_store import SegmentStore, store_path
+    segments_path = store_path(transcript_path)
+    # A transcript edited (or written by hand) after the store was saved is parsed as text
+    if os.path.exists(segments_path) and os.path.getmtime(segments_path) >= os.path.getmtime(transcript_path):
+        try:
+            return chunk_pieces(segment_pieces(SegmentStore(segments_path).iter_segments()))
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable segment store {segments_path}: {str(e)}")
+
+    with open(transcript_path, 'r', encoding='utf-8') as f:
+        return create_chunks(f.read())
+
+def process_transcript(router, transcript_path, parallel=PARALLEL_REQUESTS):
+    """Process a single transcript file with enhanced summary compilation."""
+    try:
+        chunks = load_chunks(transcript_path)
+        if not chunks:
+            print(f"No text in {transcript_path}")
+            return None
+        print(f"{len(chunks)} chunks, ~{sum(chunk.tokens for chunk in chunks)} tokens")
+        chunk_summaries = summarize_chunks(router, chunks, parallel)
+
+        if len(chunk_summaries) > 1:
+            # Label each summary with its time range, then combine in groups first
+            # when all of them would overflow the final prompt
+            ranges = [(chunk.start, chunk.end) for chunk in chunks]
+            chunk_summaries = [label_time_range(summary, start, end)
+                               for summary, (start, end) in zip(chunk_summaries, ranges)]
+
+            # Unchanged chunk summaries mean the reduce would produce the same final summary
+            cache = getattr(router.client, 'cache', None)
+            final_key = final_summary_key(router, chunk_summaries)
+            cached = cache.get(final_key) if cache else None
+            if cached is not None:
+                print("No chunk summary changed; skipping the reduce step")
+                return cached
+
+            chunk_summaries = reduce_summaries(router, chunk_summaries, ranges, parallel)
+
+            summary = router.generate(
+                'final',
+                FINAL_PROMPT.format(summaries=' '.join(chunk_summaries)),
+                options=FINAL_OPTIONS,
+                label="Final summary",
+                system=FINAL_SYSTEM_PROMPT
+            )
+            if cache:
+                cache.put(final_key, router.routing['final'], summary)
+            return summary
+        
+        return chunk_summaries[0]
+    
+    except Exception as e:
+        print(f"Error processing {transcript_path}: {str(e)}")
+        return None
+
+def summarize_transcript_file(router, transcript_file, ledger, summary_dir, parallel=PARALLEL_REQUESTS):
+    """Summarize one transcript file if its content is new; return the summary path or None."""
+    transcript_file = Path(transcript_file)
+    summary_path = Path(summary_dir) / f'summary_{transcript_file.name}'
+    params = router.ledger_params()
+
+    # Skip if this exact transcript content was already summarized with these models
+    content_hash = ledger.file_hash(transcript_file)
+    completed = ledger.lookup(content_hash, 'summarize', params)
+    if completed:
+        print(f"Skipping already processed file: {transcript_file.name}")
+        # The same content may have been summarized under another name
+        for path in (summary_path, ledger.resolve(completed['output_path'])):
+            if path and Path(path).exists():
+                return Path(path)
+        return None
+
+    print(f"\nProcessing: {transcript_file.name}")
+
+    summary = process_transcript(router, transcript_file, parallel)
+    if not summary:
+        return None
+
+    # Save summary
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        f.write(summary)
+
+    # Record completion in the job ledger
+    ledger.record(content_hash, 'summarize', params, transcript_file.name, summary_path)
+
+    print(f"✓ Summary created: {summary_path.name}")
+    return summary_path
+
+def policy_routing(policy=DEFAULT_POLICY, map_model=None, reduce_model=None, final_model=None):
+    """Model per phase for a named routing policy, with optional per-phase model overrides."""
+    routing = dict(ROUTING_POLICIES[policy])
+    overrides = {'map': map_model, 'reduce': reduce_model, 'final': final_model}
+    routing.update({phase: MODELS.get(model, model) for phase, model in overrides.items() if model})
+    return routing
+
+def create_router(client, policy=DEFAULT_POLICY, map_model=None, reduce_model=None, final_model=None):
+    """ModelRouter for a named routing policy, with optional per-phase model overrides."""
+    routing = policy_routing(policy, map_model, reduce_model, final_model)
+    overridden = any((map_model, reduce_model, final_model))
+    return ModelRouter(client, routing, name=f"{policy}+overrides" if overridden else policy)
+
+def compare_policies(client, transcript_path, policies, parallel=PARALLEL_REQUESTS, output_dir=None):
+    """Summarize one transcript under each routing policy and compare latency and token cost."""
+    results = []
+    for policy in policies:
+        router = create_router(client, policy)
+        for model in router.models():
+            keep_model_loaded(client, model)
+        start_time = time.time()
+        summary = process_transcript(router, transcript_path, parallel)
+        elapsed = time.time() - start_time
+        totals = router.report()
+        # Keep each policy's output so the final texts can be compared for quality
+        if summary and output_dir:
+            with open(Path(output_dir) / f'compare_{policy}_{Path(transcript_path).name}', 'w', encoding='utf-8') as f:
+                f.write(summary)
+        results.append((policy, elapsed, totals))
+
+    print(f"\n{'policy':<12}{'wall s':>9}{'calls':>7}{'request s':>11}{'prompt tok':>12}{'output tok':>12}")
+    for policy, elapsed, totals in results:
+        print(f"{policy:<12}{elapsed:>9.1f}{totals['calls']:>7}{totals['seconds']:>11.1f}"
+              f"{totals['prompt_tokens']:>12}{totals['output_tokens']:>12}")
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize transcripts with Ollama")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--policy', choices=sorted(ROUTING_POLICIES), default=DEFAULT_POLICY,
+                        help="Model per phase: a single model, or 'cascade' (360m for chunks, 1.7b for the final summary)")
+    parser.add_argument('--map-model', help="Override the chunk model (1.7b, 360m or any Ollama model name)")
+    parser.add_argument('--reduce-model', help="Override the model that merges groups of summaries")
+    parser.add_argument('--final-model', help="Override the model that writes the final summary")
+    parser.add_argument('--compare-policies', metavar='TRANSCRIPT',
+                        help="Summarize one transcript with every routing policy and report cost (uncached, not recorded)")
+    parser.add_argument('--parallel', type=int, default=PARALLEL_REQUESTS,
+                        help="Chunk requests sent to Ollama concurrently (see OLLAMA_NUM_PARALLEL)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Chunk summary cache database")
+    parser.add_argument('--no-cache', action='store_true', help="Always ask Ollama, even for unchanged chunks")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Setup paths
+    base_dir = Path.cwd()
+    transcript_dir = base_dir / 'transcripts'
+    summary_dir = base_dir / 'summaries'
+    summary_dir.mkdir(exist_ok=True)
+    
+    # Initialize Ollama client
+    client = create_client(args.host, pool_size=args.parallel)
+    if args.compare_policies:
+        compare_policies(client, args.compare_policies, sorted(ROUTING_POLICIES), args.parallel, summary_dir)
+        return
+
+    # Open the job ledger
+    ledger = JobLedger()
+
+    # Answer unchanged chunks from the summary cache
+    cache = None if args.no_cache else SummaryCache(args.cache)
+    if cache:
+        client = CachedClient(client, cache)
+    router = create_router(client, args.policy, args.map_model, args.reduce_model, args.final_model)
+    for model in router.models():
+        keep_model_loaded(client, model)
+    
+    # Process unprocessed transcript files
+    for transcript_file in transcript_dir.glob('*.txt'):
+        summarize_transcript_file(router, transcript_file, ledger, summary_dir, args.parallel)
+
+    router.report()
+    if cache:
+        cache.print_stats()
+
+if __name__ == "__main__":
+    main()
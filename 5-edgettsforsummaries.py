@@ -1,9 +1,12 @@
 import asyncio
-import edge_tts
-import json
 import os
+import time
 from pathlib import Path
-from datetime import datetime
+from instrumentation import span
+from job_ledger import JobLedger
+from mp3_frames import concat_mp3
+from transcript_chunks import boundary_hash, split_sentences
+from tts_cache import AudioCache, audio_key
 
 # Constants
 VOICE = "en-US-JennyNeural"
@@ -11,94 +14,165 @@ SUMMARY_DIR = "summaries"
 AUDIO_DIR = "summaryaudio"
 RATE = "+1%"
 VOLUME = "+0%"
+# Summaries are voiced sentence by sentence, concurrently; shorter sentences than this are
+# joined with the next ones (see split_into_shards)
+MIN_SHARD_CHARS = 80
+# edge-tts requests in flight (shared by every file) and summary files converted at once
+MAX_REQUESTS = 8
+MAX_FILES = 4
+# Stage parameters identifying voiced audio in the job ledger
+TTS_PARAMS = {'voice': VOICE, 'rate': RATE, 'volume': VOLUME}
+# edge-tts streams constant-bitrate MP3 at 48 kbps, so its length follows from its size
+EDGE_TTS_BITS_PER_SECOND = 48000
 
-def load_audio_status(summary_dir):
-    """Load the audio conversion tracking JSON file or create if not exists."""
-    tracking_file = Path(summary_dir) / "summary_audio_status.json"
-    if tracking_file.exists():
-        with open(tracking_file, 'r') as f:
-            return json.load(f)
-    return {"completed_conversions": {}}
-
-def save_audio_status(summary_dir, status_data):
-    """Save the audio conversion status to JSON file."""
-    tracking_file = Path(summary_dir) / "summary_audio_status.json"
-    with open(tracking_file, 'w') as f:
-        json.dump(status_data, f, indent=4)
-
-async def convert_text_to_speech(text, output_file, voice=VOICE):
-    """Convert text to speech using edge-tts."""
-    try:
+def split_into_shards(text, min_chars=MIN_SHARD_CHARS):
+    """Group consecutive sentences into shards that average about min_chars.
+
+    Whether a sentence ends a shard depends only on its own text: it always does once it
+    is min_chars long, and a shorter one does with probability len / min_chars, picked by
+    hashing it. Editing a sentence therefore changes only the shard holding it (joined
+    with the next one if the edit moves its boundary); the other shards, and their cached
+    audio, stay the same.
+    """
+    shards = []
+    current = []
+    for sentence in split_sentences(text.replace('\n', ' ')):
+        current.append(sentence)
+        if boundary_hash(sentence) * min_chars < len(sentence):
+            shards.append(' '.join(current))
+            current = []
+    if current:
+        shards.append(' '.join(current))
+    return shards
+
+async def synthesize(text, voice=VOICE):
+    """Synthesize text with edge-tts and return the MP3 bytes."""
+    import edge_tts
+    with span('tts.synthesize', voice=voice, chars=len(text)) as synthesize_span:
         communicate = edge_tts.Communicate(text, voice, rate=RATE, volume=VOLUME)
-        await communicate.save(output_file)
-        return True
+        audio = bytearray()
+        async for message in communicate.stream():
+            if message["type"] == "audio":
+                audio.extend(message["data"])
+        synthesize_span.set(bytes=len(audio), audio_seconds=len(audio) * 8 / EDGE_TTS_BITS_PER_SECOND)
+    return bytes(audio)
+
+async def convert_text_to_speech(text, output_file, voice=VOICE, semaphore=None, synthesizer=synthesize,
+                                 cache=None):
+    """Convert text to speech, synthesizing sentence shards concurrently and joining them in order."""
+    semaphore = semaphore or asyncio.Semaphore(MAX_REQUESTS)
+
+    async def synthesize_shard(shard):
+        # Shards voiced before with the same settings are reused from the audio cache
+        key = audio_key(shard, voice, RATE, VOLUME)
+        audio = cache.get(key) if cache else None
+        if audio is not None:
+            return audio
+        async with semaphore:
+            audio = await synthesizer(shard, voice)
+        if cache:
+            cache.put(key, audio)
+        return audio
+
+    try:
+        shards = split_into_shards(text)
+        if not shards:
+            # Nothing to voice; a zero-byte MP3 would be served as if it were audio
+            print("Error converting text to speech: no text to voice")
+            return 0
+        # gather returns results in shard order, however the requests finish
+        parts = await asyncio.gather(*(synthesize_shard(shard) for shard in shards))
+
+        # Write under a temporary name so a failed run never leaves a partial MP3 behind
+        partial_file = f"{output_file}.part"
+        with open(partial_file, 'wb') as f:
+            f.write(concat_mp3(parts))
+        os.replace(partial_file, output_file)
+        return len(shards)
     except Exception as e:
         print(f"Error converting text to speech: {str(e)}")
-        return False
+        return 0
+
+async def convert_summary_file(summary_file, audio_dir, ledger, semaphore=None, cache=None,
+                               synthesizer=synthesize):
+    """Convert one summary file to audio if its content is new; return the audio path or None."""
+    summary_file = Path(summary_file)
+    output_filename = Path(audio_dir) / f"{summary_file.stem}.mp3"
+    params = TTS_PARAMS
+    try:
+        # Skip if this exact summary was already voiced with the same settings
+        content_hash = ledger.file_hash(summary_file)
+        completed = ledger.lookup(content_hash, 'tts', params)
+        if completed:
+            print(f"Skipping already processed file: {summary_file.name}")
+            # The same content may have been voiced under another name
+            for path in (output_filename, ledger.resolve(completed['output_path'])):
+                if path and Path(path).exists():
+                    return Path(path)
+            return None
+
+        # Read the summary text
+        with open(summary_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        print(f"Converting {summary_file.name} to audio...")
+        start_time = time.time()
+
+        # Convert to speech
+        shards = await convert_text_to_speech(
+            text=text,
+            output_file=str(output_filename),
+            semaphore=semaphore,
+            synthesizer=synthesizer,
+            cache=cache
+        )
+
+        if shards:
+            # Record completion in the job ledger
+            ledger.record(content_hash, 'tts', params, summary_file.name, output_filename)
 
-async def process_summary_files():
-    """Process all summary files and convert them to audio."""
+            print(f"✓ Created audio file: {output_filename.name} "
+                  f"({shards} shards in {time.time() - start_time:.1f}s)")
+            return output_filename
+
+        print(f"✗ Failed to create audio for: {summary_file.name}")
+
+    except Exception as e:
+        print(f"Error processing {summary_file.name}: {str(e)}")
+
+    return None
+
+async def process_summary_files(summary_dir=SUMMARY_DIR, audio_dir=AUDIO_DIR, ledger=None, cache=None,
+                                synthesizer=synthesize):
+    """Process all summary files and convert them to audio; returns the audio paths (None for failures)."""
     # Create output directory if it doesn't exist
-    audio_dir = Path(AUDIO_DIR)
+    audio_dir = Path(audio_dir)
     audio_dir.mkdir(exist_ok=True)
     
     # Get the summaries directory
-    summaries_dir = Path(SUMMARY_DIR)
+    summaries_dir = Path(summary_dir)
     if not summaries_dir.exists():
-        print("Error: 'summaries' directory not found!")
-        return
+        print(f"Error: '{summaries_dir}' directory not found!")
+        return []
     
-    # Load tracking status from summaries directory
-    status_data = load_audio_status(summaries_dir)
+    # Open the job ledger and the per-shard audio cache
+    ledger = ledger or JobLedger()
+    cache = cache or AudioCache()
     
-    # Process each summary file
-    for summary_file in summaries_dir.glob('*.txt'):
-        try:
-            file_path = str(summary_file)
-            file_stats = os.stat(file_path)
-            
-            # Skip if file was already processed and hasn't been modified
-            if (file_path in status_data["completed_conversions"] and 
-                status_data["completed_conversions"][file_path]["mtime"] == file_stats.st_mtime):
-                print(f"Skipping already processed file: {summary_file.name}")
-                continue
-            
-            # Read the summary text
-            with open(summary_file, 'r', encoding='utf-8') as f:
-                text = f.read()
-            
-            # Create output filename
-            output_filename = audio_dir / f"{summary_file.stem}.mp3"
-            
-            print(f"Converting {summary_file.name} to audio...")
-            
-            # Convert to speech
-            success = await convert_text_to_speech(
-                text=text,
-                output_file=str(output_filename)
-            )
-            
-            if success:
-                # Update status data
-                status_data["completed_conversions"][file_path] = {
-                    "mtime": file_stats.st_mtime,
-                    "processed_date": datetime.now().isoformat(),
-                    "audio_path": str(output_filename),
-                    "summary_file": summary_file.name,
-                    "voice_used": VOICE,
-                    "rate": RATE,
-                    "volume": VOLUME
-                }
-                
-                # Save updated status in summaries directory
-                save_audio_status(summaries_dir, status_data)
-                
-                print(f"✓ Created audio file: {output_filename.name}")
-            else:
-                print(f"✗ Failed to create audio for: {summary_file.name}")
-                
-        except Exception as e:
-            print(f"Error processing {summary_file.name}: {str(e)}")
+    # Convert up to MAX_FILES summaries at once; all of them share the request limit
+    file_slots = asyncio.Semaphore(MAX_FILES)
+    requests = asyncio.Semaphore(MAX_REQUESTS)
+
+    async def convert(summary_file):
+        async with file_slots:
+            return await convert_summary_file(summary_file, audio_dir, ledger, requests, cache, synthesizer)
+
+    start_time = time.time()
+    results = await asyncio.gather(*(convert(summary_file) for summary_file in summaries_dir.glob('*.txt')))
+    print(f"\n{sum(1 for result in results if result)} of {len(results)} summaries voiced "
+          f"in {time.time() - start_time:.1f}s")
+    cache.print_stats()
+    return results
 
 def main():
     """Main function to run the text-to-speech conversion."""
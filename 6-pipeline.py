@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from job_ledger import DEFAULT_LEDGER_PATH, JobLedger
+from stages import load_stage
+from ollama_session import create_client
+from shared_weights import prepare_shared_checkpoint, print_memory, process_memory
+from summary_cache import DEFAULT_CACHE_PATH, CachedClient, SummaryCache
+from tts_cache import DEFAULT_CACHE_PATH as DEFAULT_TTS_CACHE_PATH, AudioCache
+
+# Stage modules are loaded at import time so worker processes can unpickle their functions
+convert = load_stage('convert')
+transcribe = load_stage('transcribe')
+tts = load_stage('tts')
+
+# Sentinel telling a stage worker to exit
+STOP = object()
+
+
+class PipelineStage:
+    def __init__(self, name, handler, workers=1, queue_size=4, setup=None):
+        self.name = name
+        self.handler = handler   # handler(context, item) -> item for the next stage, or None
+        self.setup = setup       # optional per-worker context factory (e.g. one Whisper model each)
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next_stage = None
+
+        self.completed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.started = None
+        self.finished = None
+        self._stats_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self.started = time.time()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        # Called once the upstream stage has drained; workers finish their queue first
+        for _ in self._threads:
+            self.queue.put(STOP)
+        for thread in self._threads:
+            thread.join()
+        self.finished = time.time()
+
+    def _worker(self):
+        context = None
+        setup_failed = False
+        if self.setup is not None:
+            try:
+                context = self.setup()
+            except Exception as e:
+                # Keep draining the queue so upstream workers never block on a dead stage
+                print(f"[{self.name}] Worker setup failed: {str(e)}")
+                setup_failed = True
+
+        while True:
+            item = self.queue.get()
+            if item is STOP:
+                break
+
+            start = time.time()
+            result = None
+            if not setup_failed:
+                try:
+                    result = self.handler(context, item)
+                except Exception as e:
+                    print(f"[{self.name}] Error processing {item}: {str(e)}")
+            elapsed = time.time() - start
+
+            with self._stats_lock:
+                self.busy_time += elapsed
+                if result is None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+            # Blocks when the next queue is full, which throttles this stage
+            if result is not None and self.next_stage is not None:
+                self.next_stage.queue.put(result)
+
+    def stats(self):
+        with self._stats_lock:
+            elapsed = (self.finished or time.time()) - self.started if self.started else 0.0
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "completed": self.completed,
+                "failed": self.failed,
+                "files_per_sec": self.completed / elapsed if elapsed > 0 else 0.0,
+                "busy_time": self.busy_time,
+            }
+
+
+class Pipeline:
+    def __init__(self, stages, report_interval=10):
+        self.stages = stages
+        self.report_interval = report_interval
+        for current, following in zip(stages, stages[1:]):
+            current.next_stage = following
+
+    def report(self):
+        for stats in (stage.stats() for stage in self.stages):
+            print(f"[pipeline] {stats['stage']:<10} queue {stats['queue_depth']}/{stats['queue_size']}  "
+                  f"done {stats['completed']} (failed {stats['failed']})  "
+                  f"{stats['files_per_sec']:.3f} files/s  busy {stats['busy_time']:.1f}s")
+
+    def _reporter(self, finished):
+        while not finished.wait(self.report_interval):
+            self.report()
+
+    def run(self, items):
+        start = time.time()
+        for stage in self.stages:
+            stage.start()
+
+        finished = threading.Event()
+        reporter = threading.Thread(target=self._reporter, args=(finished,), daemon=True)
+        reporter.start()
+
+        try:
+            for item in items:
+                self.stages[0].queue.put(item)
+
+            # Shut stages down front to back so every item drains through
+            for stage in self.stages:
+                stage.stop()
+        finally:
+            finished.set()
+            reporter.join()
+
+        print(f"\n[pipeline] Finished in {time.time() - start:.1f}s")
+        self.report()
+        return [stage.stats() for stage in self.stages]
+
+
+def build_pipeline(args):
+    """Wire the four processing stages together with bounded queues."""
+    summarizer = load_stage('summarize')
+    # One ledger for every stage; it keeps a SQLite connection per worker thread
+    ledger = JobLedger(args.ledger)
+
+    # Stage 1: media -> AAC (threads share one converter and hand the decode/encode to a process pool)
+    converter = convert.MediaConverter(input_folder=args.media_dir, output_folder=args.audio_dir,
+                                       output_format=args.audio_format, ledger=ledger,
+                                       stream_copy=not args.transcode)
+    if args.convert_workers > 1:
+        converter.executor = ProcessPoolExecutor(max_workers=args.convert_workers)
+    convert_stage = PipelineStage(
+        'convert',
+        lambda context, media_file: converter.convert_file(media_file),
+        workers=args.convert_workers, queue_size=args.queue_size)
+
+    # Stage 2: AAC -> transcript (Whisper models are not thread-safe, so one per worker)
+    if args.shared_weights and args.engine == 'whisper':
+        import torch
+        if not torch.cuda.is_available():
+            # Written once up front; each worker's model then maps the same weights
+            prepare_shared_checkpoint(args.model_size, os.path.join(os.getcwd(), "whisper_model"))
+    transcribe_stage = PipelineStage(
+        'transcribe',
+        lambda transcriber, audio_path: transcriber.transcribe_file(os.path.basename(audio_path)),
+        workers=args.transcribe_workers, queue_size=args.queue_size,
+        setup=lambda: transcribe.AudioTranscriber(audio_folder=args.audio_dir,
+                                                  output_folder=args.transcript_dir,
+                                                  model_size=args.model_size,
+                                                  ledger=ledger,
+                                                  engine=args.engine,
+                                                  compute_type=args.compute_type,
+                                                  vad=args.vad,
+                                                  shared_weights=args.shared_weights,
+                                                  stream=args.stream))
+
+    # Stage 3: transcript -> summary
+    summary_dir = Path(args.summary_dir)
+    summary_dir.mkdir(exist_ok=True)
+    summary_cache = SummaryCache(args.summary_cache)
+    # One Ollama client, and one connection pool, shared by every summarize worker
+    ollama_client = CachedClient(
+        create_client(args.ollama_host, pool_size=args.summarize_workers * args.summarize_parallel),
+        summary_cache)
+    # The router (model per phase, thread-safe stats) is shared too
+    router = summarizer.create_router(ollama_client, args.summary_policy)
+    summarize_stage = PipelineStage(
+        'summarize',
+        lambda router, transcript_path: summarizer.summarize_transcript_file(
+            router, transcript_path, ledger, summary_dir, args.summarize_parallel),
+        workers=args.summarize_workers, queue_size=args.queue_size,
+        setup=lambda: router)
+
+    # Stage 4: summary -> MP3
+    audio_dir = Path(args.summary_audio_dir)
+    audio_dir.mkdir(exist_ok=True)
+    tts_cache = AudioCache(args.tts_cache)
+    tts_stage = PipelineStage(
+        'tts',
+        lambda context, summary_path: asyncio.run(tts.convert_summary_file(
+            summary_path, audio_dir, ledger, cache=tts_cache)),
+        workers=args.tts_workers, queue_size=args.queue_size)
+
+    pipeline = Pipeline([convert_stage, transcribe_stage, summarize_stage, tts_stage],
+                        report_interval=args.report_interval)
+    # Printed once the run is over
+    reports = [router.report, summary_cache.print_stats, tts_cache.print_stats,
+               lambda: print_memory([process_memory()], label='pipeline')]
+    return pipeline, converter, reports
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run all pipeline stages concurrently with bounded queues")
+    parser.add_argument('--media-dir', default='media')
+    parser.add_argument('--audio-dir', default='aac')
+    parser.add_argument('--transcript-dir', default='transcripts')
+    parser.add_argument('--summary-dir', default='summaries')
+    parser.add_argument('--summary-audio-dir', default='summaryaudio')
+    parser.add_argument('--audio-format', choices=['aac', 'whisper'], default='aac',
+                        help="'whisper' skips the AAC encode and hands 16 kHz .npy audio to Whisper")
+    parser.add_argument('--transcode', action='store_true',
+                        help="Always re-encode to AAC, even when the audio already is AAC")
+    parser.add_argument('--model-size', default='small', help="Whisper model size")
+    parser.add_argument('--engine', choices=['whisper', 'faster-whisper'], default='whisper')
+    parser.add_argument('--compute-type', default='int8', help="faster-whisper compute type")
+    parser.add_argument('--vad', action='store_true', help="Only transcribe detected speech regions")
+    parser.add_argument('--stream', action='store_true',
+                        help="Transcribe through an ffmpeg pipe in 30-second windows, so memory does not grow with file length")
+    parser.add_argument('--shared-weights', action='store_true',
+                        help="Transcribe workers share one memory-mapped copy of the Whisper weights")
+    parser.add_argument('--summary-policy', '--summarizer', dest='summary_policy', default='1.7b',
+                        choices=['1.7b', '360m', 'cascade'],
+                        help="Ollama model per summarization phase ('cascade': 360m for chunks, 1.7b for the final text)")
+    parser.add_argument('--ollama-host', default='http://localhost:11434')
+    parser.add_argument('--summary-cache', default=DEFAULT_CACHE_PATH, help="Chunk summary cache database")
+    parser.add_argument('--tts-cache', default=DEFAULT_TTS_CACHE_PATH, help="Per-sentence TTS audio cache database")
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help="Job ledger database")
+    parser.add_argument('--convert-workers', type=int, default=2)
+    parser.add_argument('--transcribe-workers', type=int, default=1)
+    parser.add_argument('--summarize-workers', type=int, default=2)
+    parser.add_argument('--summarize-parallel', type=int, default=4,
+                        help="Chunk requests each summarize worker keeps in flight to Ollama")
+    parser.add_argument('--tts-workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=4, help="Maximum items waiting per stage")
+    parser.add_argument('--report-interval', type=float, default=10, help="Seconds between progress reports")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        pipeline, converter, reports = build_pipeline(args)
+        try:
+            media_files = converter.list_media_files()
+            if not media_files:
+                print("No media files found in the input folder")
+                return
+            pipeline.run(media_files)
+            for report in reports:
+                report()
+        finally:
+            if converter.executor is not None:
+                converter.executor.shutdown()
+    except KeyboardInterrupt:
+        print("\nPipeline interrupted by user")
+    except Exception as e:
+        print(f"\nFatal error: {str(e)}")
+
+if __name__ == "__main__":
+    main()
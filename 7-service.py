@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from aiohttp import web
+
+from instrumentation import export_metrics, tracing_enabled
+from job_ledger import DEFAULT_LEDGER_PATH, JobLedger
+from ollama_session import DEFAULT_HOST, create_client, keep_model_loaded
+from segment_store import EXPORT_FORMATS, EXPORTERS, SegmentStore, store_path
+from stages import load_stage
+from summary_cache import DEFAULT_CACHE_PATH, CachedClient, SummaryCache
+from tts_cache import DEFAULT_CACHE_PATH as DEFAULT_TTS_CACHE_PATH, AudioCache
+
+# Long-lived pipeline service: the Whisper model, the Ollama session and the caches are
+# loaded once, uploads become jobs, and each job streams its transcript segments, then
+# its summary and audio links, as server-sent events
+transcribe = load_stage('transcribe')
+summarizer = load_stage('summarize')
+tts = load_stage('tts')
+
+DEFAULT_PORT = 8080
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Seconds between SSE comments that keep idle connections open through proxies
+HEARTBEAT_SECONDS = 15
+UNSAFE_FILENAME = re.compile(r'[^\w.-]+')
+EXPORT_CONTENT_TYPES = {'srt': 'application/x-subrip', 'vtt': 'text/vtt', 'json': 'application/json'}
+
+
+class Job:
+    def __init__(self, job_id, media_path):
+        self.id = job_id
+        self.media_path = media_path
+        self.status = 'queued'
+        self.created = time.time()
+        self.finished = None
+        self.transcript = None
+        self.events = []          # every event so far, replayed to late subscribers
+        self.subscribers = set()  # one asyncio.Queue per open event stream
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def publish(self, event, data):
+        # Only called on the event loop thread
+        self.events.append((event, data))
+        for subscriber in self.subscribers:
+            subscriber.put_nowait((event, data))
+
+    def info(self):
+        return {'id': self.id, 'status': self.status, 'file': os.path.basename(self.media_path),
+                'events': len(self.events), 'created': self.created, 'finished': self.finished}
+
+
+class PipelineService:
+    def __init__(self, args):
+        self.upload_dir = Path(args.upload_dir)
+        self.summary_dir = Path(args.summary_dir)
+        self.audio_dir = Path(args.summary_audio_dir)
+        for directory in (self.upload_dir, self.summary_dir, self.audio_dir):
+            directory.mkdir(exist_ok=True)
+        self.summarize_parallel = args.summarize_parallel
+
+        self.ledger = JobLedger(args.ledger)
+        # Loaded once and kept for the life of the service
+        self.transcriber = transcribe.AudioTranscriber(audio_folder=str(self.upload_dir),
+                                                       output_folder=args.transcript_dir,
+                                                       model_size=args.model_size,
+                                                       ledger=self.ledger,
+                                                       engine=args.engine,
+                                                       compute_type=args.compute_type,
+                                                       vad=args.vad,
+                                                       stream=True)
+        self.summary_cache = SummaryCache(args.summary_cache)
+        self.router = summarizer.create_router(
+            CachedClient(create_client(args.ollama_host, pool_size=args.summarize_parallel),
+                         self.summary_cache),
+            args.summary_policy)
+        self.tts_cache = AudioCache(args.tts_cache)
+        self.tts_semaphore = asyncio.Semaphore(tts.MAX_REQUESTS)
+
+        self.jobs = {}
+        self.pending = asyncio.Queue()
+        # Whisper models are not thread-safe: one thread decodes, one job at a time, while
+        # summaries and audio of earlier jobs are produced alongside
+        self.transcribe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transcribe')
+        self.summarize_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='summarize')
+        self._tasks = set()
+
+    async def start(self, app):
+        loop = asyncio.get_running_loop()
+        for model in self.router.models():
+            await loop.run_in_executor(self.summarize_executor, keep_model_loaded, self.router.client, model)
+        self._tasks.add(asyncio.create_task(self._transcribe_worker()))
+
+    async def stop(self, app):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.transcribe_executor.shutdown(wait=False, cancel_futures=True)
+        self.summarize_executor.shutdown(wait=False, cancel_futures=True)
+        self.router.report()
+        self.summary_cache.print_stats()
+        self.tts_cache.print_stats()
+
+    def submit(self, job_id, media_path):
+        job = Job(job_id, media_path)
+        self.jobs[job_id] = job
+        job.publish('queued', {'job': job_id})
+        self.pending.put_nowait(job)
+        return job
+
+    async def _transcribe_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.pending.get()
+            job.status = 'transcribing'
+            job.publish('status', {'status': job.status})
+
+            def on_segments(segments, job=job):
+                # Called on the transcription thread after each stitched piece
+                for segment in segments:
+                    data = {'start': round(segment['start'], 2), 'end': round(segment['end'], 2),
+                            'text': segment['text'].strip()}
+                    loop.call_soon_threadsafe(job.publish, 'segment', data)
+
+            try:
+                transcript = await loop.run_in_executor(
+                    self.transcribe_executor, self.transcriber.transcribe_streaming,
+                    job.media_path, on_segments)
+            except Exception as e:
+                print(f"[service] Error transcribing job {job.id}: {str(e)}")
+                self._fail(job, f"Transcription failed: {str(e)}")
+                continue
+
+            job.transcript = transcript
+            job.publish('transcript', {'url': f"/jobs/{job.id}/transcript"})
+            # The next upload is transcribed while this one is summarized and voiced
+            task = asyncio.create_task(self._finish_job(job, transcript))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(self._export_metrics)
+
+    def _export_metrics(self, task):
+        # A long-lived service never reaches exit, so the Prometheus file is refreshed after each job
+        if tracing_enabled():
+            asyncio.get_running_loop().run_in_executor(None, export_metrics)
+
+    async def _finish_job(self, job, transcript):
+        # Every job ends 'done' or 'failed', so its event streams always get a last event
+        try:
+            loop = asyncio.get_running_loop()
+            job.status = 'summarizing'
+            job.publish('status', {'status': job.status})
+            summary_path = await loop.run_in_executor(
+                self.summarize_executor, summarizer.summarize_transcript_file,
+                self.router, transcript, self.ledger, self.summary_dir, self.summarize_parallel)
+            if summary_path is None:
+                self._fail(job, "Summarization failed")
+                return
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                job.publish('summary', {'url': f"/files/summaries/{summary_path.name}", 'text': f.read()})
+
+            job.status = 'voicing'
+            job.publish('status', {'status': job.status})
+            audio_path = await tts.convert_summary_file(summary_path, self.audio_dir, self.ledger,
+                                                        semaphore=self.tts_semaphore, cache=self.tts_cache)
+            if audio_path is None:
+                self._fail(job, "Text-to-speech failed")
+                return
+            job.publish('audio', {'url': f"/files/audio/{Path(audio_path).name}"})
+
+            job.status = 'done'
+            job.finished = time.time()
+            job.publish('done', job.info())
+        except Exception as e:
+            print(f"[service] Error finishing job {job.id}: {str(e)}")
+            self._fail(job, f"Failed while {job.status}: {str(e)}")
+
+    def _fail(self, job, message):
+        job.status = 'failed'
+        job.finished = time.time()
+        job.publish('error', {'message': message})
+
+    # HTTP handlers
+
+    async def create_job(self, request):
+        # Accepts a multipart form with a 'file' field, or the raw file as the body with ?filename=
+        if request.content_type.startswith('multipart/'):
+            reader = await request.multipart()
+            field = await reader.next()
+            while field is not None and field.name != 'file':
+                field = await reader.next()
+            if field is None or not field.filename:
+                raise web.HTTPBadRequest(text="Expected a 'file' form field")
+            filename, read_chunk = field.filename, field.read_chunk
+        else:
+            filename, read_chunk = request.query.get('filename'), request.content.read
+            if not filename:
+                raise web.HTTPBadRequest(text="Pass ?filename= with a raw upload")
+
+        job_id = uuid.uuid4().hex[:12]
+        # Clients may percent-encode non-ASCII or spaces in the form filename
+        filename = UNSAFE_FILENAME.sub('_', os.path.basename(unquote(filename)))
+        media_path = self.upload_dir / f"{job_id}_{filename}"
+        # Written in pieces so large uploads are never held in memory
+        with open(media_path, 'wb') as f:
+            while True:
+                chunk = await read_chunk(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+        job = self.submit(job_id, str(media_path))
+        print(f"[service] Job {job.id}: {media_path.name} queued")
+        return web.json_response({'job': job.id, 'status': job.status,
+                                  'events': f"/jobs/{job.id}/events"}, status=202)
+
+    def _job(self, request):
+        job = self.jobs.get(request.match_info['job_id'])
+        if job is None:
+            raise web.HTTPNotFound(text="Unknown job")
+        return job
+
+    async def job_status(self, request):
+        return web.json_response(self._job(request).info())
+
+    async def list_jobs(self, request):
+        return web.json_response([job.info() for job in self.jobs.values()])
+
+    async def job_transcript(self, request):
+        # ?format=srt|vtt|json is exported from the segment store; the default is the text file
+        job = self._job(request)
+        if job.transcript is None:
+            raise web.HTTPNotFound(text="Transcript not ready")
+        export_format = request.query.get('format', 'txt')
+        if export_format == 'txt':
+            return web.FileResponse(job.transcript)
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise web.HTTPBadRequest(text=f"Unknown format {export_format}. "
+                                          f"Available: {', '.join(EXPORT_FORMATS)}")
+        try:
+            store = SegmentStore(store_path(job.transcript))
+        except (OSError, ValueError) as e:
+            raise web.HTTPNotFound(text=f"No segment store: {str(e)}")
+        return web.Response(text=EXPORTERS[export_format](store),
+                            content_type=EXPORT_CONTENT_TYPES[export_format])
+
+    async def job_events(self, request):
+        job = self._job(request)
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream',
+                                               'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+
+        # Snapshot and subscribe with no await in between, so no event is missed or sent twice
+        subscriber = asyncio.Queue()
+        backlog = list(job.events)
+        if not job.done:
+            job.subscribers.add(subscriber)
+        try:
+            for event, data in backlog:
+                await _send_event(response, event, data)
+            while not job.done or not subscriber.empty():
+                try:
+                    event, data = await asyncio.wait_for(subscriber.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    await response.write(b': keep-alive\n\n')
+                    continue
+                await _send_event(response, event, data)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass  # client went away
+        finally:
+            job.subscribers.discard(subscriber)
+        return response
+
+
+async def _send_event(response, event, data):
+    await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+
+
+def create_app(args):
+    app = web.Application(client_max_size=0)
+    service = PipelineService(args)
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_post('/jobs', service.create_job)
+    app.router.add_get('/jobs', service.list_jobs)
+    app.router.add_get('/jobs/{job_id}', service.job_status)
+    app.router.add_get('/jobs/{job_id}/events', service.job_events)
+    app.router.add_get('/jobs/{job_id}/transcript', service.job_transcript)
+    app.router.add_static('/files/summaries', service.summary_dir)
+    app.router.add_static('/files/audio', service.audio_dir)
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the pipeline over HTTP with models kept loaded")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--upload-dir', default='uploads')
+    parser.add_argument('--transcript-dir', default='transcripts')
+    parser.add_argument('--summary-dir', default='summaries')
+    parser.add_argument('--summary-audio-dir', default='summaryaudio')
+    parser.add_argument('--model-size', default='small', help="Whisper model size")
+    parser.add_argument('--engine', choices=['whisper', 'faster-whisper'], default='whisper')
+    parser.add_argument('--compute-type', default='int8', help="faster-whisper compute type")
+    parser.add_argument('--vad', action='store_true', help="Only transcribe detected speech regions")
+    parser.add_argument('--summary-policy', default='1.7b', choices=['1.7b', '360m', 'cascade'])
+    parser.add_argument('--summarize-parallel', type=int, default=4,
+                        help="Chunk requests kept in flight to Ollama")
+    parser.add_argument('--ollama-host', default=DEFAULT_HOST)
+    parser.add_argument('--summary-cache', default=DEFAULT_CACHE_PATH, help="Chunk summary cache database")
+    parser.add_argument('--tts-cache', default=DEFAULT_TTS_CACHE_PATH, help="Per-shard TTS audio cache database")
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help="Job ledger database")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        web.run_app(create_app(args), host=args.host, port=args.port)
+    except Exception as e:
+        print(f"\nFatal error: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os
+import re
+import struct
+import subprocess
+import tempfile
+
+import numpy as np
+
+# Whisper-ready audio: 16 kHz mono float32 samples stored as a plain .npy file,
+# so the transcriber can memory-map it instead of decoding the audio again
+SAMPLE_RATE = 16000
+WHISPER_AUDIO_EXTENSION = '.npy'
+
+# Fixed-size .npy header, written as a placeholder first and filled in once the
+# sample count is known (the samples are streamed straight from ffmpeg)
+HEADER_SIZE = 128
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _npy_header(num_samples):
+    """Build a .npy v1.0 header for a 1-D little-endian float32 array, padded to HEADER_SIZE."""
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d,), }" % num_samples
+    header_len = HEADER_SIZE - len(_NPY_MAGIC) - 2
+    padding = header_len - len(header) - 1
+    return (_NPY_MAGIC + struct.pack('<H', header_len) +
+            header.encode('latin1') + b' ' * padding + b'\n')
+
+
+def write_whisper_audio(media_path, output_path, ffmpeg_binary='ffmpeg', chunk_size=1024*1024):
+    """Decode a media file to 16 kHz mono float32 .npy and return the number of samples written."""
+    command = [
+        ffmpeg_binary, '-nostdin', '-loglevel', 'error',
+        '-i', media_path,
+        '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE),
+        '-f', 'f32le', '-'
+    ]
+
+    data_bytes = 0
+    try:
+        with open(output_path, 'wb') as f:
+            f.write(_npy_header(0))
+
+            # ffmpeg's messages go to a file, as in stream_audio: a pipe only read after the
+            # audio would fill up on a flood of decode errors and stall ffmpeg
+            with tempfile.TemporaryFile() as stderr:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+                try:
+                    while True:
+                        chunk = process.stdout.read(chunk_size)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        data_bytes += len(chunk)
+                finally:
+                    process.stdout.close()
+                    process.wait()
+
+                if process.returncode != 0:
+                    stderr.seek(0)
+                    raise RuntimeError(f"ffmpeg failed: {stderr.read().decode(errors='ignore').strip()}")
+
+            num_samples = data_bytes // 4
+            if num_samples == 0:
+                raise RuntimeError("No audio decoded")
+
+            f.truncate(HEADER_SIZE + num_samples * 4)
+            f.seek(0)
+            f.write(_npy_header(num_samples))
+        return num_samples
+
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
+def save_whisper_audio(blocks, output_path):
+    """Write float32 sample blocks (16 kHz mono) as Whisper-ready .npy; returns the number of samples."""
+    num_samples = 0
+    with open(output_path, 'wb') as f:
+        f.write(_npy_header(0))
+        for block in blocks:
+            f.write(np.asarray(block, dtype='<f4').tobytes())
+            num_samples += len(block)
+        f.seek(0)
+        f.write(_npy_header(num_samples))
+    return num_samples
+
+
+def probe_audio(path, ffmpeg_binary='ffmpeg'):
+    """Codec name and duration (None if unknown) of a file's first audio stream, or None if it has none."""
+    # Read from ffmpeg's own stream listing: ffprobe is not shipped with every ffmpeg (moviepy's included)
+    result = subprocess.run([ffmpeg_binary, '-hide_banner', '-nostdin', '-i', path],
+                            capture_output=True)
+    listing = result.stderr.decode(errors='ignore')
+    stream = re.search(r'Stream #\d+:\d+\S*: Audio: (\w+)', listing)
+    if not stream:
+        return None
+    duration = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', listing)
+    seconds = None
+    if duration:
+        hours, minutes, rest = duration.groups()
+        seconds = int(hours) * 3600 + int(minutes) * 60 + float(rest)
+    return {'codec': stream.group(1), 'duration': seconds}
+
+
+def copy_audio_stream(media_path, output_path, ffmpeg_binary='ffmpeg', output_format='adts'):
+    """Copy the first audio stream into its own file without decoding it."""
+    command = [
+        ffmpeg_binary, '-nostdin', '-loglevel', 'error', '-y',
+        '-i', media_path,
+        '-map', '0:a:0', '-vn', '-c:a', 'copy', '-f', output_format, output_path
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='ignore').strip()}")
+
+
+def is_whisper_audio(path):
+    return str(path).lower().endswith(WHISPER_AUDIO_EXTENSION)
+
+
+def load_whisper_audio(path):
+    """Memory-map a Whisper-ready .npy file without copying or decoding it."""
+    # Copy-on-write keeps the array writable for torch.from_numpy without touching the file
+    audio = np.load(path, mmap_mode='c')
+    if audio.dtype != np.float32 or audio.ndim != 1:
+        raise ValueError(f"{path} is not 16 kHz mono float32 audio "
+                         f"(dtype={audio.dtype}, shape={audio.shape})")
+    return audio
+
+
+def _ffmpeg_decode_command(path, ffmpeg_binary, start_seconds=None, duration_seconds=None):
+    command = [ffmpeg_binary, '-nostdin', '-loglevel', 'error']
+    if start_seconds:
+        command += ['-ss', f"{start_seconds:.3f}"]
+    command += ['-i', path]
+    if duration_seconds is not None:
+        command += ['-t', f"{duration_seconds:.3f}"]
+    return command + ['-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', '-']
+
+
+def stream_audio(path, chunk_samples, ffmpeg_binary='ffmpeg'):
+    """Yield successive float32 chunks of 16 kHz mono audio without holding the whole file.
+
+    Raises RuntimeError once the stream ends if ffmpeg failed or the file held no audio.
+    """
+    if is_whisper_audio(path):
+        audio = load_whisper_audio(path)
+        if len(audio) == 0:
+            raise RuntimeError(f"No audio decoded from {path}")
+        for start in range(0, len(audio), chunk_samples):
+            yield audio[start:start + chunk_samples]
+        return
+
+    # ffmpeg's messages go to a file rather than a pipe, so a flood of decode errors
+    # can never fill a pipe nobody reads while the audio is streamed
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(_ffmpeg_decode_command(path, ffmpeg_binary),
+                                   stdout=subprocess.PIPE, stderr=stderr)
+        samples = 0
+        try:
+            while True:
+                # BufferedReader.read blocks until the full chunk (or EOF) arrives
+                data = process.stdout.read(chunk_samples * 4)
+                if not data:
+                    break
+                chunk = np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32)
+                samples += len(chunk)
+                yield chunk
+            returncode = process.wait()
+        finally:
+            # Also reached when the caller stops early; kill does nothing once ffmpeg has exited
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+        if returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"ffmpeg failed: {stderr.read().decode(errors='ignore').strip()}")
+    if samples == 0:
+        raise RuntimeError(f"No audio decoded from {path}")
+
+
+def load_audio_range(path, start_seconds, duration_seconds, ffmpeg_binary='ffmpeg'):
+    """Decode only [start, start + duration) of a file as 16 kHz mono float32."""
+    if is_whisper_audio(path):
+        audio = load_whisper_audio(path)
+        start = int(start_seconds * SAMPLE_RATE)
+        return audio[start:start + int(duration_seconds * SAMPLE_RATE)]
+
+    command = _ffmpeg_decode_command(path, ffmpeg_binary, start_seconds, duration_seconds)
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def real_time_factor(elapsed, audio_seconds):
+    """Processing seconds per second of audio (lower is faster; below 1.0 is faster than real time)."""
+    return elapsed / audio_seconds if audio_seconds > 0 else float('inf')
@@ -0,0 +1,205 @@
+import time
+
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+from whisper.decoding import DecodingOptions
+from whisper.tokenizer import get_tokenizer
+
+from instrumentation import span
+
+# Same fallback schedule and quality thresholds as whisper.transcribe
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class _FileState:
+    """Decoding progress of one input while its windows are spread over batches."""
+
+    def __init__(self, key, num_windows, duration):
+        self.key = key
+        self.duration = duration
+        self.pending = num_windows
+        self.window_segments = [None] * num_windows
+
+
+class BatchedTranscriber:
+    """Transcribe many inputs by packing their 30-second mel windows into shared batches.
+
+    whisper.transcribe runs the encoder and decoder once per window with batch size 1.
+    Here windows from several files (or several offsets of one long file) go through
+    whisper.decode together. Windows are fixed 30-second strides decoded without
+    previous-text conditioning, because every window in a batch is decoded at once.
+    """
+
+    def __init__(self, model, batch_size=8, language="en", fp16=False):
+        self.model = model
+        self.batch_size = batch_size
+        self.language = language
+        self.tokenizer = get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language=language,
+            task="transcribe",
+        )
+        self.fp16 = fp16
+        self.dtype = torch.float16 if self.fp16 else torch.float32
+
+        # Time covered by one output timestamp token (0.02s)
+        self.input_stride = N_FRAMES // model.dims.n_audio_ctx
+        self.time_precision = self.input_stride * HOP_LENGTH / SAMPLE_RATE
+
+    def _windows(self, key, audio):
+        """Split one input into (file state, window index, offset in seconds, frames, mel) jobs."""
+        # Pad 30 seconds of silence, like whisper.transcribe, so the last window can be sliced
+        mel = log_mel_spectrogram(audio, self.model.dims.n_mels, padding=N_SAMPLES)
+        content_frames = mel.shape[-1] - N_FRAMES
+        seeks = list(range(0, content_frames, N_FRAMES))
+        state = _FileState(key, len(seeks), content_frames * HOP_LENGTH / SAMPLE_RATE)
+
+        if not seeks:
+            yield state, None, None, None, None
+            return
+
+        for index, seek in enumerate(seeks):
+            segment_size = min(N_FRAMES, content_frames - seek)
+            mel_segment = pad_or_trim(mel[:, seek:seek + segment_size], N_FRAMES)
+            yield state, index, seek * HOP_LENGTH / SAMPLE_RATE, segment_size, mel_segment
+
+    def _decode_with_fallback(self, mel_batch):
+        """Decode a batch, re-decoding only the windows that fail the quality checks at higher temperatures."""
+        results = [None] * mel_batch.shape[0]
+        remaining = list(range(mel_batch.shape[0]))
+
+        for temperature in TEMPERATURES:
+            options = DecodingOptions(language=self.language, temperature=temperature, fp16=self.fp16)
+            decoded = whisper.decode(self.model, mel_batch[remaining], options)
+
+            retry = []
+            for index, result in zip(remaining, decoded):
+                results[index] = result
+                needs_fallback = (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or
+                                  result.avg_logprob < LOGPROB_THRESHOLD)
+                if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    needs_fallback = False  # silence
+                if needs_fallback:
+                    retry.append(index)
+
+            remaining = retry
+            if not remaining:
+                break
+
+        return results
+
+    def _segment(self, start, end, tokens, result):
+        text_tokens = [token for token in tokens if token < self.tokenizer.eot]
+        return {
+            "start": start,
+            "end": end,
+            "text": self.tokenizer.decode(text_tokens),
+            "tokens": tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }
+
+    def _window_segments(self, result, time_offset, segment_size):
+        """Turn one window's tokens into segments on the file's timeline."""
+        if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+            return []
+
+        tokens = list(result.tokens)
+        timestamp_begin = self.tokenizer.timestamp_begin
+        is_timestamp = [token >= timestamp_begin for token in tokens]
+        segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+        window_end = time_offset + segment_duration
+
+        def timestamp(token):
+            return time_offset + (token - timestamp_begin) * self.time_precision
+
+        # Segments are delimited by pairs of consecutive timestamp tokens
+        slices = [i for i in range(1, len(tokens)) if is_timestamp[i - 1] and is_timestamp[i]]
+        if not slices:
+            timestamps = [token for token in tokens if token >= timestamp_begin]
+            end = timestamp(timestamps[-1]) if timestamps and timestamps[-1] != timestamp_begin else window_end
+            return [self._segment(time_offset, end, tokens, result)]
+
+        segments = []
+        last_slice = 0
+        for current_slice in slices:
+            sliced = tokens[last_slice:current_slice]
+            segments.append(self._segment(timestamp(sliced[0]), timestamp(sliced[-1]), sliced, result))
+            last_slice = current_slice
+
+        # Windows have a fixed stride, so an unfinished trailing segment is kept up to the window end
+        # instead of being re-decoded from its start as whisper.transcribe does
+        trailing = tokens[last_slice:]
+        if any(token < self.tokenizer.eot for token in trailing):
+            start = timestamp(trailing[0]) if is_timestamp[last_slice] else segments[-1]["end"]
+            end = timestamp(trailing[-1]) if trailing[-1] >= timestamp_begin else window_end
+            segments.append(self._segment(start, max(start, end), trailing, result))
+
+        return segments
+
+    def _finish(self, state):
+        segments = [segment for window in state.window_segments for segment in (window or [])]
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": self.language,
+            "duration": state.duration,
+        }
+
+    def transcribe(self, inputs, on_complete=None):
+        """Transcribe (key, audio) pairs; audio is a path, NumPy array or tensor at 16 kHz.
+
+        Inputs are consumed lazily so only the files with windows in flight hold a
+        mel spectrogram. on_complete(key, result) is called as soon as every window
+        of a file has been decoded, and a {key: result} dict is returned at the end.
+        """
+        results = {}
+        self.stats = {"audio_seconds": 0.0, "windows": 0, "batches": 0, "elapsed": 0.0}
+        start_time = time.time()
+
+        def complete(state):
+            result = self._finish(state)
+            results[state.key] = result
+            self.stats["audio_seconds"] += state.duration
+            if on_complete is not None:
+                on_complete(state.key, result)
+
+        def flush(batch):
+            mel_batch = torch.stack([job[4] for job in batch]).to(self.model.device).to(self.dtype)
+            with span('transcribe.batch_decode', windows=len(batch),
+                      audio_seconds=sum(job[3] for job in batch) * HOP_LENGTH / SAMPLE_RATE):
+                decoded = self._decode_with_fallback(mel_batch)
+            self.stats["windows"] += len(batch)
+            self.stats["batches"] += 1
+
+            # Scatter results back to their file and position on its timeline
+            for (state, index, offset, segment_size, _), result in zip(batch, decoded):
+                state.window_segments[index] = self._window_segments(result, offset, segment_size)
+                state.pending -= 1
+                if state.pending == 0:
+                    complete(state)
+
+        batch = []
+        for key, audio in inputs:
+            for job in self._windows(key, audio):
+                if job[1] is None:
+                    complete(job[0])  # empty input
+                    continue
+                batch.append(job)
+                if len(batch) == self.batch_size:
+                    flush(batch)
+                    batch = []
+        if batch:
+            flush(batch)
+
+        self.stats["elapsed"] = time.time() - start_time
+        return results
@@ -0,0 +1,460 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, real_time_factor, save_whisper_audio
+from instrumentation import run_measured
+from segment_store import store_path, txt_line, write_segment_store
+from transcription_backends import ENGINES
+
+# Benchmark suite: every stage on generated input, against local stand-ins, so a run needs
+# no real videos, no Ollama and no network access:
+#   convert     synthetic audio muxed into video files, through MediaConverter
+#   transcribe  the same audio as Whisper-ready .npy, through AudioTranscriber (tiny model)
+#   summarize   synthetic transcripts, through the summarizer against fake_ollama
+#   tts         synthetic summaries, through the TTS stage with fake_edge_tts
+# Each stage runs in a fresh process, so its peak RSS is its own (the child reports it at
+# exit, see instrumentation.run_measured). Timings only compare on one machine, so no baseline ships with the code: save
+# one locally (benchmark_baseline.json, ignored by git) and measure every performance
+# change against it:
+#   python benchmark.py --save-baseline     before the change
+#   python benchmark.py                     after it (exits with 1 if a stage regressed)
+
+STAGES = ('convert', 'transcribe', 'summarize', 'tts')
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+# A stage regresses when its real-time factor or peak RSS grows by more than these fractions
+TIME_THRESHOLD = 0.10
+RSS_THRESHOLD = 0.15
+# Input files cycle through these containers
+CONTAINERS = ('mp4', 'mkv')
+# Tone and noise are generated this many seconds at a time
+BLOCK_SECONDS = 30
+# Synthetic transcripts are read at about this pace, in segments of a few seconds
+WORDS_PER_SECOND = 2.5
+WORDS = ('the', 'model', 'data', 'we', 'training', 'layer', 'attention', 'results', 'show', 'that',
+         'a', 'large', 'network', 'is', 'trained', 'on', 'text', 'and', 'then', 'evaluated',
+         'this', 'approach', 'improves', 'accuracy', 'for', 'each', 'task', 'with', 'fewer',
+         'parameters', 'so', 'the', 'next', 'step', 'uses', 'more', 'examples', 'in', 'practice',
+         'performance', 'depends', 'on', 'memory', 'and', 'compute', 'budget', 'as', 'well')
+
+
+def tone_audio(seconds, rng, frequency=440.0):
+    """Yield float32 blocks of a steady sine tone."""
+    total = int(seconds * SAMPLE_RATE)
+    for start in range(0, total, BLOCK_SECONDS * SAMPLE_RATE):
+        t = np.arange(start, min(start + BLOCK_SECONDS * SAMPLE_RATE, total)) / SAMPLE_RATE
+        yield (0.3 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def noise_audio(seconds, rng):
+    """Yield float32 blocks of white noise."""
+    total = int(seconds * SAMPLE_RATE)
+    for start in range(0, total, BLOCK_SECONDS * SAMPLE_RATE):
+        yield (0.1 * rng.standard_normal(min(BLOCK_SECONDS * SAMPLE_RATE, total - start))).astype(np.float32)
+
+
+def speech_like_audio(seconds, rng):
+    """Yield voiced phrases separated by pauses: a gliding harmonic tone pulsed at syllable rate."""
+    total = int(seconds * SAMPLE_RATE)
+    written = 0
+    while written < total:
+        length = min(int(rng.uniform(1.5, 4.0) * SAMPLE_RATE), total - written)
+        t = np.arange(length) / SAMPLE_RATE
+        pitch = rng.uniform(100, 220) * (1 + 0.15 * np.sin(2 * np.pi * rng.uniform(0.3, 0.8) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+        voiced = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 16))
+        syllables = np.sin(np.pi * rng.uniform(3.5, 5.5) * t) ** 2
+        yield (0.15 * voiced * syllables + 0.01 * rng.standard_normal(length)).astype(np.float32)
+        written += length
+
+        pause = min(int(rng.uniform(0.2, 0.8) * SAMPLE_RATE), total - written)
+        if pause:
+            yield (0.005 * rng.standard_normal(pause)).astype(np.float32)
+            written += pause
+
+
+AUDIO_KINDS = {'speech': speech_like_audio, 'tone': tone_audio, 'noise': noise_audio}
+
+
+def write_wav(blocks, path):
+    """Write float32 sample blocks as a 16-bit 16 kHz mono WAV file."""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        for block in blocks:
+            f.writeframes((np.clip(block, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def mux_video(audio_path, output_path, ffmpeg_binary):
+    """Mux an audio file with a blank low-resolution video track (container from the file extension)."""
+    command = [
+        ffmpeg_binary, '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', 'color=c=black:s=320x240:r=10',
+        '-i', audio_path,
+        '-map', '0:v', '-map', '1:a', '-shortest',
+        '-c:v', 'mpeg4', '-c:a', 'aac', output_path
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='ignore').strip()}")
+
+
+def synthetic_segments(seconds, rng):
+    """Transcript segments of a few seconds each, covering the given duration."""
+    segments = []
+    start = 0.0
+    while start < seconds:
+        end = min(seconds, start + rng.uniform(3.0, 8.0))
+        words = rng.choice(WORDS, size=max(1, round((end - start) * WORDS_PER_SECOND)))
+        segments.append({'start': start, 'end': end, 'text': f" {' '.join(words).capitalize()}.",
+                         'avg_logprob': -0.3, 'no_speech_prob': 0.01, 'compression_ratio': 1.5})
+        start = end
+    return segments
+
+
+def synthetic_summary(seconds, rng):
+    """Summary-like prose: sentences of 8 to 20 words, about two words per second of audio (120 at least)."""
+    sentences = []
+    words_left = max(120, int(seconds * 2))
+    while words_left > 0:
+        words = rng.choice(WORDS, size=min(words_left, int(rng.integers(8, 21))))
+        sentences.append(' '.join(words).capitalize() + '.')
+        words_left -= len(words)
+    return ' '.join(sentences) + '\n'
+
+
+def default_ffmpeg():
+    # The binary moviepy uses (from imageio-ffmpeg) when ffmpeg is not on the PATH
+    if shutil.which('ffmpeg'):
+        return 'ffmpeg'
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return 'ffmpeg'
+
+
+def generate_inputs(args, input_dir):
+    """Write every stage's synthetic input under input_dir."""
+    folders = {name: os.path.join(input_dir, name) for name in ('media', 'audio', 'transcripts', 'summaries')}
+    for folder in folders.values():
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+
+    generate_audio = AUDIO_KINDS[args.kind]
+    for index in range(args.files):
+        name = f"synthetic_{index:02d}"
+        # Same seed for both copies, so the media and the .npy hold the same audio
+        wav_path = os.path.join(input_dir, f"{name}.wav")
+        write_wav(generate_audio(args.duration, np.random.default_rng(args.seed + index)), wav_path)
+        container = CONTAINERS[index % len(CONTAINERS)]
+        mux_video(wav_path, os.path.join(folders['media'], f"{name}.{container}"), args.ffmpeg)
+        os.remove(wav_path)
+        save_whisper_audio(generate_audio(args.duration, np.random.default_rng(args.seed + index)),
+                           os.path.join(folders['audio'], f"{name}.npy"))
+
+        rng = np.random.default_rng(args.seed + index)
+        # Text and segment store, as the transcriber writes them
+        transcript_path = os.path.join(folders['transcripts'], f"{name}.txt")
+        segments = synthetic_segments(args.duration, rng)
+        with open(transcript_path, 'w', encoding='utf-8') as f:
+            f.writelines(txt_line(segment['start'], segment['end'], segment['text']) for segment in segments)
+        write_segment_store(store_path(transcript_path), segments)
+        with open(os.path.join(folders['summaries'], f"summary_{name}.txt"), 'w', encoding='utf-8') as f:
+            f.write(synthetic_summary(args.duration, rng))
+    return folders
+
+
+# Stage runners: executed in the child process, each returns the files processed, the
+# seconds of audio they hold and the time the stage itself took (model loading excluded)
+
+def bench_convert(args, input_dir, run_dir, ledger):
+    from stages import load_stage
+
+    converter = load_stage('convert').MediaConverter(
+        input_folder=os.path.join(input_dir, 'media'), output_folder=os.path.join(run_dir, 'audio'),
+        output_format=args.audio_format, ledger=ledger, stream_copy=not args.transcode)
+    start = time.perf_counter()
+    converter.convert_media(workers=args.workers)
+    return {'items': converter.converted_count, 'audio_seconds': converter.converted_seconds,
+            'seconds': time.perf_counter() - start}
+
+
+def bench_transcribe(args, input_dir, run_dir, ledger):
+    from stages import load_stage
+
+    transcriber = load_stage('transcribe').AudioTranscriber(
+        audio_folder=os.path.join(input_dir, 'audio'), output_folder=os.path.join(run_dir, 'transcripts'),
+        model_size=args.model_size, ledger=ledger, engine=args.engine, compute_type=args.compute_type,
+        vad=args.vad, shared_weights=args.shared_weights, stream=args.stream)
+    start = time.perf_counter()
+    transcriber.transcribe_files()
+    return {'items': transcriber.transcribed_count, 'audio_seconds': transcriber.transcribed_seconds,
+            'seconds': time.perf_counter() - start}
+
+
+def bench_summarize(args, input_dir, run_dir, ledger):
+    from fake_ollama import FakeOllamaServer
+    from ollama_session import create_client
+    from stages import load_stage
+
+    summarizer = load_stage('summarize')
+    summary_dir = os.path.join(run_dir, 'summaries')
+    os.makedirs(summary_dir)
+    server = FakeOllamaServer(latency=args.ollama_latency).start()
+    try:
+        # Uncached, like a first run: every chunk goes to the server
+        router = summarizer.create_router(create_client(server.url, pool_size=summarizer.PARALLEL_REQUESTS))
+        start = time.perf_counter()
+        results = [summarizer.summarize_transcript_file(router, path, ledger, summary_dir)
+                   for path in sorted(Path(input_dir, 'transcripts').glob('*.txt'))]
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    items = sum(1 for result in results if result)
+    return {'items': items, 'audio_seconds': items * args.duration, 'seconds': elapsed,
+            'requests': server.requests, 'max_in_flight': server.max_in_flight}
+
+
+def bench_tts(args, input_dir, run_dir, ledger):
+    from fake_edge_tts import FakeEdgeTTS
+    from stages import load_stage
+    from tts_cache import AudioCache
+
+    synthesizer = FakeEdgeTTS(latency=args.tts_latency)
+    # An empty audio cache: every sentence is synthesized, and the cache writes are timed too
+    cache = AudioCache(os.path.join(run_dir, 'tts_cache.db'))
+    start = time.perf_counter()
+    results = asyncio.run(load_stage('tts').process_summary_files(
+        os.path.join(input_dir, 'summaries'), os.path.join(run_dir, 'audio'), ledger, cache, synthesizer))
+    elapsed = time.perf_counter() - start
+    cache.close()
+    # The audio seconds here are the ones produced, not consumed
+    return {'items': sum(1 for result in results if result), 'audio_seconds': synthesizer.audio_seconds,
+            'seconds': elapsed, 'requests': synthesizer.requests, 'max_in_flight': synthesizer.max_in_flight}
+
+
+STAGE_RUNNERS = {
+    'convert': bench_convert,
+    'transcribe': bench_transcribe,
+    'summarize': bench_summarize,
+    'tts': bench_tts,
+}
+
+
+def run_stage(args):
+    """Child process: run one stage on the generated input and write its result to the run folder."""
+    from job_ledger import JobLedger
+
+    # A fresh ledger per run, so nothing is skipped as already done
+    ledger = JobLedger(os.path.join(args.run_dir, 'ledger.db'))
+    result = STAGE_RUNNERS[args.run_stage](args, args.input_dir, args.run_dir, ledger)
+    ledger.close()
+    with open(os.path.join(args.run_dir, 'result.json'), 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+def measure_stage(argv, stage, input_dir, run_dir):
+    """Run one stage in a fresh interpreter; returns its result with process time, peak RSS and exit code."""
+    os.makedirs(run_dir)
+    command = [sys.executable, os.path.abspath(__file__), *argv,
+               '--run-stage', stage, '--input-dir', input_dir, '--run-dir', run_dir]
+    with open(os.path.join(run_dir, 'output.log'), 'w') as log:
+        process_seconds, peak_rss_mb, returncode = run_measured(command, stdout=log, stderr=subprocess.STDOUT)
+
+    result = {}
+    try:
+        with open(os.path.join(run_dir, 'result.json'), encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        pass
+    result.update(process_seconds=process_seconds, returncode=returncode,
+                  log=os.path.join(run_dir, 'output.log'), peak_rss_mb=peak_rss_mb)
+    return result
+
+
+def summarize_runs(runs, expected):
+    """One stage's figures over its repeated runs: median time, highest peak RSS."""
+    failed = [run for run in runs if run['returncode'] != 0 or run.get('items', 0) < expected]
+    if failed:
+        return {'status': 'failed', 'items': failed[0].get('items', 0), 'expected': expected,
+                'log': failed[0]['log']}
+
+    seconds = statistics.median(run['seconds'] for run in runs)
+    peaks = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    audio_seconds = runs[0]['audio_seconds']
+    summary = {
+        'status': 'ok',
+        'items': runs[0]['items'],
+        'expected': expected,
+        'seconds': seconds,
+        # Interpreter start-up, imports and model loading
+        'setup_seconds': statistics.median(run['process_seconds'] - run['seconds'] for run in runs),
+        'items_per_second': runs[0]['items'] / seconds if seconds > 0 else float('inf'),
+        'audio_seconds': audio_seconds,
+        'real_time_factor': real_time_factor(seconds, audio_seconds),
+        'peak_rss_mb': max(peaks) if peaks else None,
+        'runs_seconds': [run['seconds'] for run in runs],
+    }
+    for key in ('requests', 'max_in_flight'):
+        if key in runs[0]:
+            summary[key] = runs[0][key]
+    return summary
+
+
+def benchmark_config(args):
+    # Everything that changes the work done; baselines are only comparable when these match
+    return {key: getattr(args, key) for key in (
+        'files', 'duration', 'kind', 'seed', 'workers', 'audio_format', 'transcode', 'engine', 'model_size',
+        'compute_type', 'vad', 'shared_weights', 'stream', 'ollama_latency', 'tts_latency')}
+
+
+def compare_to_baseline(report, baseline, time_threshold=TIME_THRESHOLD, rss_threshold=RSS_THRESHOLD):
+    """Regressions of a report against a stored one, as (stage, metric, baseline value, current value)."""
+    regressions = []
+    for stage, result in report['stages'].items():
+        base = baseline['stages'].get(stage)
+        if not base or base['status'] != 'ok' or result['status'] != 'ok':
+            continue
+        for metric, threshold in (('real_time_factor', time_threshold), ('peak_rss_mb', rss_threshold)):
+            # Peak RSS is missing where it could not be measured (main warns about those stages)
+            if result[metric] is None or base[metric] is None:
+                continue
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append((stage, metric, base[metric], result[metric]))
+    return regressions
+
+
+def print_report(report, baseline=None):
+    print(f"\n{'stage':<11} {'files':>6} {'stage s':>8} {'setup s':>8} {'files/s':>8} {'RTF':>7} "
+          f"{'peak RSS MB':>12} {'vs baseline':>20}")
+    for stage, result in report['stages'].items():
+        if result['status'] != 'ok':
+            print(f"{stage:<11} {result['items']:>2}/{result['expected']:<3} failed, see {result['log']}")
+            continue
+        change = ''
+        base = (baseline or {}).get('stages', {}).get(stage)
+        if base and base['status'] == 'ok':
+            change = f"RTF {result['real_time_factor'] / base['real_time_factor'] - 1:+.0%}"
+            if result['peak_rss_mb'] is not None and base['peak_rss_mb'] is not None:
+                change += f", RSS {result['peak_rss_mb'] / base['peak_rss_mb'] - 1:+.0%}"
+        peak = 'n/a' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.0f}"
+        print(f"{stage:<11} {result['items']:>6} {result['seconds']:>8.2f} {result['setup_seconds']:>8.2f} "
+              f"{result['items_per_second']:>8.2f} {result['real_time_factor']:>7.3f} "
+              f"{peak:>12} {change:>20}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every stage on synthetic media with local stand-ins")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--files', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds of audio per file")
+    parser.add_argument('--kind', choices=sorted(AUDIO_KINDS), default='speech',
+                        help="Generated audio: speech-like phrases and pauses, a steady tone, or white noise")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the median time is reported")
+    parser.add_argument('--workers', type=int, default=1, help="Conversion processes")
+    parser.add_argument('--audio-format', choices=['aac', 'whisper'], default='aac')
+    parser.add_argument('--transcode', action='store_true', help="Re-encode AAC audio instead of copying it")
+    parser.add_argument('--engine', choices=ENGINES, default='whisper')
+    parser.add_argument('--model-size', default='tiny')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--vad', action='store_true')
+    parser.add_argument('--shared-weights', action='store_true')
+    parser.add_argument('--stream', action='store_true', help="Transcribe in 30-second windows through ffmpeg")
+    parser.add_argument('--ollama-latency', type=float, default=0.05, help="Seconds per fake Ollama request")
+    parser.add_argument('--tts-latency', type=float, default=0.1, help="Seconds per fake edge-tts request")
+    parser.add_argument('--ffmpeg', default=default_ffmpeg(), help="ffmpeg used to mux the synthetic videos")
+    parser.add_argument('--work-dir', help="Keep the generated input, outputs and logs here")
+    parser.add_argument('--json', help="Also write the report to this file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--time-threshold', type=float, default=TIME_THRESHOLD,
+                        help="Allowed real-time factor increase before a stage counts as regressed")
+    parser.add_argument('--rss-threshold', type=float, default=RSS_THRESHOLD,
+                        help="Allowed peak RSS increase before a stage counts as regressed")
+    # Set by the parent when it runs a single stage in a child process
+    parser.add_argument('--run-stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--input-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--run-dir', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parse_args(argv)
+    if args.run_stage:
+        run_stage(args)
+        return None
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='t2s-benchmark-')
+    print(f"Generating {args.files} x {args.duration:.0f}s of {args.kind} audio in {work_dir}...")
+    input_dir = os.path.join(work_dir, 'input')
+    generate_inputs(args, input_dir)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'config': benchmark_config(args),
+        'stages': {},
+    }
+    for stage in args.stages:
+        runs = []
+        for index in range(args.repeat):
+            print(f"{stage}: run {index + 1} of {args.repeat}")
+            run_dir = os.path.join(work_dir, 'runs', f"{stage}-{index}")
+            shutil.rmtree(run_dir, ignore_errors=True)
+            runs.append(measure_stage(argv, stage, input_dir, run_dir))
+        report['stages'][stage] = summarize_runs(runs, args.files)
+
+    # A temporary work folder is kept only when a failed stage's log is worth reading
+    if not args.work_dir and all(result['status'] == 'ok' for result in report['stages'].values()):
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return report
+
+    if baseline:
+        if baseline['config'] != report['config']:
+            print(f"\nWarning: {args.baseline} was recorded with different settings; the comparison is not like for like")
+        regressions = compare_to_baseline(report, baseline, args.time_threshold, args.rss_threshold)
+        unmeasured = [stage for stage, result in report['stages'].items()
+                      if result['status'] == 'ok' and result['peak_rss_mb'] is None]
+        if unmeasured:
+            print(f"\nWarning: peak RSS could not be measured for {', '.join(unmeasured)}; "
+                  f"their RSS was not checked against the baseline")
+        for stage, metric, before, after in regressions:
+            print(f"REGRESSION {stage} {metric}: {before:.3f} -> {after:.3f} ({after / before - 1:+.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print("\nNo regressions against the baseline")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, is_whisper_audio, load_whisper_audio
+from transcription_backends import create_backend
+
+# Default clip: the checked-in spoken summary (about 2.5 minutes of edge-tts speech). Its reference
+# is the exact text that was voiced, so no transcription model's own mistakes are in the WER
+DEFAULT_CLIP = 'summaryaudio/summary_Transformers.mp3'
+DEFAULT_REFERENCE = 'summaries/summary_Transformers.txt'
+DEFAULT_ENGINES = ['whisper', 'faster-whisper:int8', 'faster-whisper:int8_float32']
+
+TIMESTAMP_PATTERN = re.compile(r'^\[\d+(?:\.\d+)?s -> \d+(?:\.\d+)?s\]\s*', re.MULTILINE)
+
+
+def normalize_words(text):
+    """Lower-case, drop timestamps and punctuation, and split into words for WER."""
+    text = TIMESTAMP_PATTERN.sub('', text).lower()
+    text = re.sub(r"[^\w\s']", ' ', text)
+    return text.split()
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words, via a row-vectorized Levenshtein."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Map words to ids so rows compare as integer arrays
+    vocab = {}
+    ref_ids = np.array([vocab.setdefault(w, len(vocab)) for w in ref])
+    hyp_ids = np.array([vocab.setdefault(w, len(vocab)) for w in hyp])
+
+    steps = np.arange(len(hyp_ids) + 1)
+    previous = steps.copy()
+    for i, word in enumerate(ref_ids, 1):
+        current = np.empty_like(previous)
+        current[0] = i
+        # Substitution/match and deletion, from the previous row
+        current[1:] = np.minimum(previous[:-1] + (hyp_ids != word), previous[1:] + 1)
+        # Insertions chain along the row: current[j] = min_k(current[k] + j - k)
+        current = np.minimum.accumulate(current - steps) + steps
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_clip(path):
+    if is_whisper_audio(path):
+        return np.asarray(load_whisper_audio(path))
+    import whisper
+    return whisper.load_audio(path)
+
+
+def compare(clip, reference_text, engines, model_size, repeats=1):
+    audio = load_clip(clip)
+    duration = len(audio) / SAMPLE_RATE
+    print(f"Clip: {clip} ({duration:.1f}s), model: {model_size}\n")
+
+    results = []
+    for spec in engines:
+        engine, _, compute_type = spec.partition(':')
+        start = time.time()
+        backend = create_backend(engine, model_size, compute_type=compute_type or 'int8')
+        load_time = time.time() - start
+
+        timings = []
+        for _ in range(repeats):
+            start = time.time()
+            result = backend.transcribe(audio)
+            timings.append(time.time() - start)
+        elapsed = min(timings)
+
+        results.append({
+            'engine': spec,
+            'load_seconds': load_time,
+            'transcribe_seconds': elapsed,
+            'real_time_factor': elapsed / duration,
+            'text': result['text'],
+        })
+        del backend
+
+    # Without a reference transcript, score against the first engine's output
+    if reference_text is None:
+        reference_text = results[0]['text']
+        print(f"No reference transcript; WER is relative to {results[0]['engine']}\n")
+
+    print(f"{'engine':<30}{'load s':>8}{'run s':>9}{'RTF':>8}{'WER':>8}")
+    for result in results:
+        result['wer'] = word_error_rate(reference_text, result['text'])
+        print(f"{result['engine']:<30}{result['load_seconds']:>8.1f}{result['transcribe_seconds']:>9.1f}"
+              f"{result['real_time_factor']:>8.3f}{result['wer']:>8.2%}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare transcription engines on speed and word error rate")
+    parser.add_argument('--clip', default=DEFAULT_CLIP, help="Audio clip (.aac/.mp3/.wav/.npy)")
+    parser.add_argument('--reference', default=DEFAULT_REFERENCE,
+                        help="Reference transcript (plain text or the [start -> end] transcript format)")
+    parser.add_argument('--engines', nargs='+', default=DEFAULT_ENGINES,
+                        help="engine or engine:compute_type, e.g. whisper faster-whisper:int8")
+    parser.add_argument('--model-size', default='small')
+    parser.add_argument('--repeats', type=int, default=1, help="Timed runs per engine (best is reported)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.clip):
+        print(f"Error: audio clip {args.clip} not found; pass --clip with an audio file to compare on")
+        raise SystemExit(1)
+
+    reference_text = None
+    if args.reference:
+        try:
+            with open(args.reference, 'r', encoding='utf-8') as f:
+                reference_text = f.read()
+        except OSError as e:
+            print(f"Could not read reference transcript: {str(e)}")
+
+    compare(args.clip, reference_text, args.engines, args.model_size, args.repeats)
+
+if __name__ == "__main__":
+    main()
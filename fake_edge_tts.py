@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import hashlib
+import html
+import re
+import threading
+
+# Stand-ins for the edge-tts service when timing or testing the TTS stage without network
+# access. FakeEdgeTTS replaces the synthesizer call in-process (see
+# convert_text_to_speech(synthesizer=...)); FakeEdgeTTSServer is a local endpoint that
+# speaks edge-tts's own websocket protocol, so the real client and synthesize() run
+# against it once edge_tts.communicate.WSS_URL points at its url. Both wait a fixed
+# latency per request and answer with silent MP3 in edge-tts's own format
+# (24 kHz mono, 48 kbps), as long as the text would take to read out
+
+# MPEG-2 layer III, 48 kbps, 24 kHz, mono, no CRC: 144-byte frames of 576 samples.
+# All-zero side information decodes as silence
+_FRAME_HEADER = b'\xff\xf3\x64\xc0'
+FRAME_BYTES = 144
+FRAME_SECONDS = 576 / 24000
+SILENT_FRAME = _FRAME_HEADER + bytes(FRAME_BYTES - len(_FRAME_HEADER))
+# Mono MPEG-2 side information; the bytes after it are ancillary data decoders skip
+_SIDE_INFO_BYTES = 9
+_TAG_OFFSET = len(_FRAME_HEADER) + _SIDE_INFO_BYTES
+_TAG_BYTES = 8
+
+
+def frame_count(text, chars_per_second):
+    """Frames of audio it takes to read text out at chars_per_second."""
+    return max(1, round(len(text) / chars_per_second / FRAME_SECONDS))
+
+
+class FakeEdgeTTS:
+    def __init__(self, latency=0.3, chars_per_second=15.0):
+        self.latency = latency
+        # Roughly how fast the neural voices read English
+        self.chars_per_second = chars_per_second
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.audio_seconds = 0.0
+
+    async def __call__(self, text, voice=None):
+        # Same signature as synthesize(text, voice): returns MP3 bytes
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        frames = frame_count(text, self.chars_per_second)
+        with self.lock:
+            self.audio_seconds += frames * FRAME_SECONDS
+        return SILENT_FRAME * frames
+
+
+def _text_tag(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=_TAG_BYTES).digest()
+
+
+def _message(path, request_id, body=''):
+    return f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\nPath:{path}\r\n\r\n{body}"
+
+
+def _audio_message(request_id, audio):
+    # Binary messages start with the header length, then headers, then the audio
+    headers = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode('utf-8')
+    return len(headers).to_bytes(2, 'big') + headers + audio
+
+
+def _headers(message):
+    head, _, body = message.partition('\r\n\r\n')
+    return dict(line.split(':', 1) for line in head.split('\r\n')), body
+
+
+class FakeEdgeTTSServer:
+    """edge-tts's websocket endpoint on a local port, answering with silent MP3.
+
+    Every frame of an answer carries a tag of the text it voices in its ancillary data,
+    so spoken_texts() can tell which request each stretch of a joined file came from.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.3, chars_per_second=15.0, seconds_per_char=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        # Extra synthesis time per character, so longer texts come back later
+        self.seconds_per_char = seconds_per_char
+        self.lock = threading.Lock()
+        # Texts in the order requests arrived, and in the order their audio was sent
+        self.received = []
+        self.completed = []
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.audio_seconds = 0.0
+        self._tags = {}
+        self._loop = None
+        self._runner = None
+
+    @property
+    def url(self):
+        # edge-tts appends its connection parameters with '&'
+        return f"ws://{self.host}:{self.port}/edge/v1?TrustedClientToken=local"
+
+    def audio(self, text):
+        frames = frame_count(text, self.chars_per_second)
+        tag = _text_tag(text)
+        with self.lock:
+            self._tags[tag] = text
+            self.audio_seconds += frames * FRAME_SECONDS
+        frame = SILENT_FRAME[:_TAG_OFFSET] + tag + SILENT_FRAME[_TAG_OFFSET + _TAG_BYTES:]
+        return frame * frames
+
+    def spoken_texts(self, mp3):
+        """Texts voiced in an MP3 made of this server's answers, in the order they play."""
+        texts = []
+        for position in range(0, len(mp3) - FRAME_BYTES + 1, FRAME_BYTES):
+            text = self._tags.get(mp3[position + _TAG_OFFSET:position + _TAG_OFFSET + _TAG_BYTES])
+            if not texts or texts[-1] != text:
+                texts.append(text)
+        return texts
+
+    async def _synthesize(self, ws, ssml_message):
+        headers, ssml = _headers(ssml_message)
+        request_id = headers.get('X-RequestId', '')
+        match = re.search(r'<prosody[^>]*>(.*?)</prosody>', ssml, re.S)
+        text = html.unescape(match.group(1)) if match else ''
+        with self.lock:
+            self.received.append(text)
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await ws.send_str(_message('turn.start', request_id, '{}'))
+            await asyncio.sleep(self.latency + len(text) * self.seconds_per_char)
+            audio = self.audio(text)
+            # The service streams audio in small messages
+            for start in range(0, len(audio), 4096):
+                await ws.send_bytes(_audio_message(request_id, audio[start:start + 4096]))
+            await ws.send_str(_message('turn.end', request_id, '{}'))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.completed.append(text)
+
+    async def _handle(self, request):
+        from aiohttp import WSMsgType, web
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                break
+            if _headers(message.data)[0].get('Path') == 'ssml':
+                await self._synthesize(ws, message.data)
+        return ws
+
+    async def _start_site(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/edge/v1', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def start(self):
+        """Serve from a background thread; returns the server so it can be used inline."""
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start_site(), self._loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake edge-tts endpoint with a fixed per-request latency")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds per synthesis request")
+    args = parser.parse_args()
+
+    server = FakeEdgeTTSServer(port=args.port, latency=args.latency).start()
+    print(f"Fake edge-tts listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transcript_chunks import estimate_tokens
+
+# Stand-in for an Ollama server when timing the summarizer without a model:
+# /api/generate sleeps for a fixed latency plus prompt evaluation time and answers
+# with a short canned summary. Like Ollama, a system prompt seen before is treated
+# as cached, so only the new prompt tokens count as evaluated
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path != '/api/generate':
+            self.send_error(404)
+            return
+
+        server = self.server
+        prompt = request.get('prompt', '')
+        system = request.get('system') or ''
+        words = prompt.split()
+        with server.lock:
+            server.received.append(request)
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            full_prompt = estimate_tokens(system + '\n' + prompt)
+            evaluated = full_prompt - estimate_tokens(system) if system in server.seen_systems else full_prompt
+            server.seen_systems.add(system)
+        prompt_seconds = evaluated * server.prompt_token_seconds
+        try:
+            time.sleep(server.latency + prompt_seconds)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        if not prompt:
+            # An empty prompt only loads the model
+            self._send_json({'model': request.get('model', ''), 'response': '', 'done': True})
+            return
+        eval_count = min(len(words), server.response_words)
+        self._send_json({
+            'model': request.get('model', ''),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'response': 'Summary: ' + ' '.join(words[-eval_count:]),
+            'done': True,
+            'done_reason': 'stop',
+            'prompt_eval_count': evaluated,
+            'prompt_eval_duration': int(prompt_seconds * 1e9),
+            'eval_count': eval_count,
+            'eval_duration': int(server.latency * 1e9),
+            'total_duration': int((server.latency + prompt_seconds) * 1e9),
+        })
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.5, response_words=40,
+                 prompt_token_seconds=0.001):
+        super().__init__(address, FakeOllamaHandler)
+        self.latency = latency
+        self.prompt_token_seconds = prompt_token_seconds
+        self.seen_systems = set()
+        self.response_words = response_words
+        self.lock = threading.Lock()
+        # Every /api/generate body, in arrival order, for tests to inspect
+        self.received = []
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def process_request(self, request, client_address):
+        # Called once per TCP connection, so this shows whether clients reuse connections
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        """Serve from a background thread; returns the server so it can be used inline."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server with a fixed per-request latency")
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per generate request")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(('127.0.0.1', args.port), latency=args.latency)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import atexit
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Timing spans around the hot paths of every stage: media load and audio write, model
+# transcribe, Ollama generate and edge-tts synthesis, with the bytes, audio seconds and
+# tokens each one processed and the process RSS when it ended.
+# Off unless T2S_TRACE names a JSONL file. Worker processes inherit the environment, so
+# spans from every process are appended to the same trace, one JSON object per line.
+# At exit the trace is aggregated into a Prometheus text-format file (T2S_METRICS, by
+# default the trace path with a .prom suffix) for node exporter's textfile collector:
+#   T2S_TRACE=traces/t2s.jsonl python 3-audio_transcriber.py
+#   python t2s.py --trace traces/t2s.jsonl pipeline
+TRACE_ENV = 'T2S_TRACE'
+METRICS_ENV = 'T2S_METRICS'
+METRIC_PREFIX = 't2s'
+# Numeric span attributes summed into t2s_<name>_total counters per span
+COUNTED_ATTRIBUTES = ('bytes', 'audio_seconds', 'prompt_tokens', 'output_tokens')
+# run_measured() names a file here; a Python command that imports this module writes its
+# own peak RSS (bytes, from getrusage) to it at exit. Its children do not inherit it
+PEAK_RSS_ENV = 'T2S_PEAK_RSS_FILE'
+# How often run_measured() samples the resident size of a command that reports no peak
+RSS_SAMPLE_SECONDS = 0.01
+
+_lock = threading.Lock()
+_trace_files = {}
+_export_registered = False
+
+
+class Span:
+    """Name and attributes of one timed block; attributes can be added while it runs."""
+
+    __slots__ = ('name', 'attributes')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+def tracing_enabled():
+    return bool(os.environ.get(TRACE_ENV))
+
+
+def enable(trace_path, metrics_path=None):
+    """Trace this process and every process it starts; the metrics file is written at exit."""
+    os.environ[TRACE_ENV] = os.path.abspath(trace_path)
+    if metrics_path:
+        os.environ[METRICS_ENV] = os.path.abspath(metrics_path)
+    _register_export()
+
+
+def _register_export():
+    # Pool workers leave through os._exit, so only the process that started them exports
+    global _export_registered
+    if not _export_registered:
+        _export_registered = True
+        atexit.register(export_metrics)
+
+
+def peak_memory_bytes():
+    """Highest resident set size of this process so far, or None if unreadable."""
+    try:
+        import resource
+    except ImportError:
+        # No resource module on Windows, which keeps its own peak working set
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kB elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def resident_memory_bytes():
+    """Current resident set size of this process (peak size where /proc is not available), or None if unreadable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_memory_bytes()
+
+
+def _report_peak_memory(path):
+    peak = peak_memory_bytes()
+    if peak is not None:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(str(peak))
+
+
+def _sample_peak_memory(process, peak):
+    # Fallback for commands that do not report their own peak; needs psutil
+    try:
+        import psutil
+    except ImportError:
+        return
+    try:
+        watched = psutil.Process(process.pid)
+        while process.poll() is None:
+            info = watched.memory_info()
+            peak[0] = max(peak[0] or 0, info.rss, getattr(info, 'peak_wset', 0))
+            time.sleep(RSS_SAMPLE_SECONDS)
+    except psutil.Error:
+        pass  # exited between two samples
+
+
+def run_measured(command, **popen_kwargs):
+    """Run a command to its end; returns (wall seconds, peak RSS in MB or None, exit code).
+
+    A Python command that imports this module reports its exact peak at exit. For any
+    other command the peak is sampled with psutil, if installed, while it runs.
+    """
+    with tempfile.TemporaryDirectory() as report_dir:
+        report_path = os.path.join(report_dir, 'peak_rss')
+        env = dict(popen_kwargs.pop('env', None) or os.environ, **{PEAK_RSS_ENV: report_path})
+        start = time.perf_counter()
+        process = subprocess.Popen(command, env=env, **popen_kwargs)
+        peak = [None]
+        sampler = threading.Thread(target=_sample_peak_memory, args=(process, peak), daemon=True)
+        sampler.start()
+        returncode = process.wait()
+        elapsed = time.perf_counter() - start
+        sampler.join()
+        try:
+            with open(report_path, encoding='utf-8') as f:
+                peak[0] = int(f.read())
+        except (OSError, ValueError):
+            pass
+    return elapsed, peak[0] / (1024 * 1024) if peak[0] else None, returncode
+
+
+def _trace_file(path):
+    # One append-only descriptor per process and path; os.write on O_APPEND adds each
+    # line whole, so threads and processes never interleave within a line
+    key = (os.getpid(), path)
+    fd = _trace_files.get(key)
+    if fd is None:
+        with _lock:
+            fd = _trace_files.get(key)
+            if fd is None:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                _trace_files[key] = fd
+    return fd
+
+
+def record_span(name, start, seconds, status, attributes):
+    """Append one finished span to the trace."""
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return
+    rss = resident_memory_bytes()
+    record = {
+        'name': name,
+        'start': start,
+        'seconds': seconds,
+        'status': status,
+        'pid': os.getpid(),
+        'thread': threading.current_thread().name,
+        'rss_mb': None if rss is None else rss / (1024 * 1024),
+        'attributes': attributes,
+    }
+    line = json.dumps(record, default=str) + '\n'
+    os.write(_trace_file(path), line.encode('utf-8'))
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the block as one span named '<stage>.<operation>'; yields a Span for attributes known only inside it."""
+    current = Span(name, attributes)
+    if not tracing_enabled():
+        yield current
+        return
+
+    start = time.time()
+    start_counter = time.perf_counter()
+    status = 'ok'
+    try:
+        yield current
+    except BaseException as e:
+        status = 'error'
+        current.attributes['error'] = str(e)
+        raise
+    finally:
+        record_span(name, start, time.perf_counter() - start_counter, status, current.attributes)
+
+
+def read_trace(path):
+    """Yield the span records of a trace file, skipping lines cut short by a crash."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _value(number):
+    # Full precision (timestamps need it); whole numbers without a decimal point
+    number = float(number)
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def prometheus_text(records):
+    """Aggregate span records into Prometheus text exposition format."""
+    spans = {}
+    models = {}
+    last_timestamp = 0.0
+    for record in records:
+        totals = spans.setdefault(record['name'], {
+            'count': 0, 'errors': 0, 'seconds': 0.0, 'max_rss': None,
+            **{attribute: 0.0 for attribute in COUNTED_ATTRIBUTES}})
+        attributes = record.get('attributes') or {}
+        totals['count'] += 1
+        totals['errors'] += record.get('status') == 'error'
+        totals['seconds'] += record['seconds']
+        # rss_mb is null where the process could not read its own memory
+        if record.get('rss_mb') is not None:
+            totals['max_rss'] = max(totals['max_rss'] or 0.0, record['rss_mb'] * 1024 * 1024)
+        for attribute in COUNTED_ATTRIBUTES:
+            value = attributes.get(attribute)
+            if isinstance(value, (int, float)):
+                totals[attribute] += value
+        # Decode speed per model, from Ollama's eval_count over eval_duration
+        if attributes.get('eval_seconds') and attributes.get('model'):
+            model = models.setdefault(attributes['model'], [0, 0.0])
+            model[0] += attributes.get('output_tokens') or 0
+            model[1] += attributes['eval_seconds']
+        last_timestamp = max(last_timestamp, record['start'] + record['seconds'])
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{METRIC_PREFIX}_{name}{suffix}{_labels(**labels)} {_value(value)}")
+
+    names = sorted(spans)
+    metric('span_seconds', 'summary', "Time spent in each instrumented hot path.",
+           [(suffix, {'span': name}, spans[name][key]) for name in names
+            for suffix, key in (('_sum', 'seconds'), ('_count', 'count'))])
+    metric('span_errors_total', 'counter', "Spans that ended with an exception.",
+           [('', {'span': name}, spans[name]['errors']) for name in names])
+    metric('span_max_resident_memory_bytes', 'gauge', "Highest process RSS seen at the end of a span.",
+           [('', {'span': name}, spans[name]['max_rss']) for name in names
+            if spans[name]['max_rss'] is not None])
+    for attribute in COUNTED_ATTRIBUTES:
+        metric(f'{attribute}_total', 'counter', f"Sum of the {attribute} processed by each hot path.",
+               [('', {'span': name}, spans[name][attribute]) for name in names
+                if spans[name][attribute]])
+    metric('ollama_tokens_per_second', 'gauge', "Ollama decode speed per model over the whole trace.",
+           [('', {'model': model}, tokens / seconds) for model, (tokens, seconds) in sorted(models.items())])
+    metric('trace_last_span_timestamp_seconds', 'gauge', "When the most recent span ended.",
+           [('', {}, last_timestamp)])
+    return '\n'.join(lines) + '\n'
+
+
+def export_metrics(trace_path=None, metrics_path=None):
+    """Write the Prometheus file for a whole trace; returns its path, or None when tracing is off."""
+    trace_path = trace_path or os.environ.get(TRACE_ENV)
+    if not trace_path or not os.path.exists(trace_path):
+        return None
+    metrics_path = metrics_path or os.environ.get(METRICS_ENV) or os.path.splitext(trace_path)[0] + '.prom'
+
+    text = prometheus_text(read_trace(trace_path))
+    os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+    # The textfile collector only reads *.prom, so it never sees the partial file
+    partial = f"{metrics_path}.{os.getpid()}.part"
+    with open(partial, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(partial, metrics_path)
+    return metrics_path
+
+
+if tracing_enabled():
+    _register_export()
+if os.environ.get(PEAK_RSS_ENV):
+    atexit.register(_report_peak_memory, os.environ.pop(PEAK_RSS_ENV))
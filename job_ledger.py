@@ -0,0 +1,201 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+# Single tracking database shared by every stage (replaces the per-stage JSON files)
+DEFAULT_LEDGER_PATH = 'pipeline_ledger.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    content_hash TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    params TEXT NOT NULL,
+    source_name TEXT,
+    output_path TEXT,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (content_hash, stage, params)
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+
+class JobLedger:
+    def __init__(self, db_path=DEFAULT_LEDGER_PATH):
+        self.db_path = os.path.abspath(db_path)
+        self.base_dir = os.path.dirname(self.db_path)
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # WAL lets stage scripts and pipeline workers read while one of them writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _relative(self, path):
+        # Stored paths are relative to the ledger so the tree can be moved between machines
+        if path is None:
+            return None
+        return os.path.relpath(os.path.abspath(path), self.base_dir).replace(os.sep, '/')
+
+    def resolve(self, stored_path):
+        return os.path.join(self.base_dir, stored_path) if stored_path else None
+
+    def file_hash(self, path):
+        """Return the SHA-256 of a file, re-hashing only when its size or mtime changed."""
+        stat = os.stat(path)
+        key = self._relative(path)
+        conn = self._connection()
+        row = conn.execute("SELECT size, mtime, content_hash FROM file_hashes WHERE path = ?",
+                           (key,)).fetchone()
+        if row and row['size'] == stat.st_size and row['mtime'] == stat.st_mtime:
+            return row['content_hash']
+
+        content_hash = hash_file(path)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO file_hashes (path, size, mtime, content_hash) "
+                         "VALUES (?, ?, ?, ?)", (key, stat.st_size, stat.st_mtime, content_hash))
+        return content_hash
+
+    def lookup(self, content_hash, stage, params):
+        """Return the completed job row for this content/stage/params, or None."""
+        row = self._connection().execute(
+            "SELECT * FROM jobs WHERE content_hash = ? AND stage = ? AND params = ?",
+            (content_hash, stage, _params_key(params))).fetchone()
+        return dict(row) if row else None
+
+    def record(self, content_hash, stage, params, source_name, output_path, completed_at=None):
+        completed_at = completed_at or datetime.now().isoformat(timespec='seconds')
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(content_hash, stage, params, source_name, output_path, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, stage, _params_key(params), source_name,
+                 self._relative(output_path), completed_at))
+
+    def stage_counts(self):
+        rows = self._connection().execute(
+            "SELECT stage, COUNT(*) AS jobs FROM jobs GROUP BY stage ORDER BY stage")
+        return {row['stage']: row['jobs'] for row in rows}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _params_key(params):
+    # Canonical JSON so {'a': 1, 'b': 2} and {'b': 2, 'a': 1} are the same job
+    return json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+
+
+def hash_file(path, chunk_size=1024*1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _basename(stored_path):
+    # The old status files hold absolute Windows paths such as Z:\\Projects\\...\\x.txt
+    return re.split(r'[\\/]', stored_path)[-1]
+
+
+def _load_json(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return None
+
+
+def import_json_tracking(ledger, base_dir='.', model_size='small', summary_model='smollm2'):
+    """One-shot import of the four legacy JSON tracking files into the ledger.
+
+    Entries whose source file is no longer on disk cannot be hashed and are skipped.
+    """
+    imported, skipped = 0, 0
+
+    def record(source_path, stage, params, output_path, completed_at):
+        nonlocal imported, skipped
+        if not os.path.exists(source_path) or (output_path and not os.path.exists(output_path)):
+            skipped += 1
+            return
+        ledger.record(ledger.file_hash(source_path), stage, params,
+                      os.path.basename(source_path), output_path, completed_at)
+        imported += 1
+
+    # media/processed_files.json: {media filename: date}
+    processed = _load_json(os.path.join(base_dir, 'media', 'processed_files.json')) or {}
+    for media_file, completed_at in processed.items():
+        audio_path = os.path.join(base_dir, 'aac', os.path.splitext(media_file)[0] + '.aac')
+        record(os.path.join(base_dir, 'media', media_file), 'convert', {'format': 'aac'},
+               audio_path if os.path.exists(audio_path) else None, completed_at)
+
+    # transcripts/transcribed_files.json: {audio filename: date}
+    transcribed = _load_json(os.path.join(base_dir, 'transcripts', 'transcribed_files.json')) or {}
+    for audio_file, completed_at in transcribed.items():
+        record(os.path.join(base_dir, 'aac', audio_file), 'transcribe', {'model': model_size},
+               os.path.join(base_dir, 'transcripts', os.path.splitext(audio_file)[0] + '.txt'),
+               completed_at)
+
+    # transcripts/transcript_status.json: {absolute transcript path: {mtime, summary_path, ...}}
+    status = _load_json(os.path.join(base_dir, 'transcripts', 'transcript_status.json')) or {}
+    for transcript_path, entry in status.get("completed_transcripts", {}).items():
+        summary_path = os.path.join(base_dir, 'summaries', _basename(entry["summary_path"]))
+        record(os.path.join(base_dir, 'transcripts', _basename(transcript_path)), 'summarize',
+               {'model': summary_model}, summary_path, entry.get("processed_date"))
+
+    # summaries/summary_audio_status.json: {relative summary path: {mtime, audio_path, voice_used, ...}}
+    status = _load_json(os.path.join(base_dir, 'summaries', 'summary_audio_status.json')) or {}
+    for summary_path, entry in status.get("completed_conversions", {}).items():
+        params = {'voice': entry["voice_used"], 'rate': entry["rate"], 'volume': entry["volume"]}
+        record(os.path.join(base_dir, 'summaries', _basename(summary_path)), 'tts', params,
+               os.path.join(base_dir, 'summaryaudio', _basename(entry["audio_path"])),
+               entry.get("processed_date"))
+
+    return imported, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline job ledger")
+    parser.add_argument('--db', default=DEFAULT_LEDGER_PATH)
+    parser.add_argument('--import-json', action='store_true',
+                        help="Import the legacy JSON tracking files from the current directory")
+    parser.add_argument('--model-size', default='small',
+                        help="Whisper model the legacy transcripts were made with")
+    parser.add_argument('--summary-model', default='smollm2',
+                        help="Ollama model the legacy summaries were made with")
+    args = parser.parse_args()
+
+    ledger = JobLedger(args.db)
+    if args.import_json:
+        imported, skipped = import_json_tracking(ledger, model_size=args.model_size,
+                                                 summary_model=args.summary_model)
+        print(f"Imported {imported} entries ({skipped} skipped, source or output missing)")
+
+    for stage, jobs in ledger.stage_counts().items():
+        print(f"{stage:<12} {jobs} completed")
+
+if __name__ == "__main__":
+    main()
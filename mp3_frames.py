@@ -0,0 +1,68 @@
+# MPEG audio frame header fields (layer III only; edge-tts produces 24 kHz mono MP3)
+_BITRATES_KBPS = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2 / 2.5
+}
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+
+def _frame_length(header):
+    """Byte length of the layer III frame starting with this 4-byte header, or None if it is not one."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None  # reserved values, or not layer III
+
+    bitrate = _BITRATES_KBPS[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    # MPEG-1 frames hold 1152 samples, MPEG-2/2.5 frames 576
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+
+def _skip_id3v2(data):
+    if data[:3] == b'ID3' and len(data) >= 10:
+        # Tag size is a 28-bit "syncsafe" integer (7 bits per byte)
+        size = 0
+        for byte in data[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        return 10 + size + (10 if data[5] & 0x10 else 0)  # footer flag
+    return 0
+
+
+def _is_info_frame(frame):
+    # Xing/Info/VBRI headers describe a whole file's length; stale once files are joined
+    return b'Xing' in frame[:64] or b'Info' in frame[:64] or b'VBRI' in frame[:64]
+
+
+def audio_frames(data):
+    """Return only the MPEG audio frames of an MP3 byte string (tags and length headers dropped)."""
+    position = _skip_id3v2(data)
+    end = len(data) - 128 if data[-128:-125] == b'TAG' else len(data)
+    frames = []
+    first = True
+    while position + 4 <= end:
+        length = _frame_length(data[position:position + 4])
+        if length is None:
+            position += 1  # resynchronise on the next frame header
+            continue
+        frame = data[position:min(position + length, end)]
+        if not (first and _is_info_frame(frame)):
+            frames.append(frame)
+        first = False
+        position += length
+    return b''.join(frames)
+
+
+def concat_mp3(parts):
+    """Join MP3 byte strings at frame boundaries into one playable stream."""
+    return b''.join(audio_frames(part) for part in parts)
+
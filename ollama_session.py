@@ -0,0 +1,31 @@
+from instrumentation import span
+
+# How long Ollama keeps the model in memory after the last request; long enough to
+# span the gap between files, so the model is not unloaded and reloaded mid-run
+KEEP_ALIVE = '30m'
+DEFAULT_HOST = 'http://localhost:11434'
+
+
+def create_client(host=DEFAULT_HOST, pool_size=4):
+    """One Ollama client, and so one HTTP connection pool, for every summarizer thread of a run.
+
+    The underlying httpx client is thread-safe, so chunk requests share pool_size
+    keep-alive connections instead of opening a connection per request.
+    """
+    # Imported here so modules that only need the constants stay quick to import
+    import httpx
+    from ollama import Client
+
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return Client(host=host, limits=limits, timeout=None)
+
+
+def keep_model_loaded(client, model, keep_alive=KEEP_ALIVE):
+    """Load the model now (an empty prompt only loads it) and keep it resident for keep_alive."""
+    try:
+        with span('summarize.load_model', model=model):
+            client.generate(model=model, prompt='', keep_alive=keep_alive)
+        return True
+    except Exception as e:
+        print(f"Could not preload {model}: {str(e)}")
+        return False
@@ -0,0 +1,76 @@
+import os
+from pathlib import Path
+
+from stages import load_stage
+
+# Lists the work each stage would do from the files on disk and the job ledger alone.
+# The stage modules import torch, whisper, moviepy, ollama and edge-tts lazily, so
+# planning loads none of them
+
+STAGES = ('convert', 'transcribe', 'summarize', 'tts')
+# Pending files listed per stage; the rest are counted
+MAX_LISTED = 10
+
+
+def pending(ledger, stage, params, paths):
+    """File names whose current content has no completed ledger entry for this stage and params."""
+    return [os.path.basename(path) for path in paths
+            if not ledger.lookup(ledger.file_hash(path), stage, params)]
+
+
+def plan_convert(ledger, media_dir='media', audio_dir='aac', audio_format='aac'):
+    if not os.path.isdir(media_dir):
+        return []
+    converter = load_stage('convert').MediaConverter(input_folder=media_dir, output_folder=audio_dir,
+                                                     output_format=audio_format, ledger=ledger)
+    return converter.pending_files()
+
+
+def plan_transcribe(ledger, audio_dir='aac', engine='whisper', model_size='small',
+                    compute_type='int8', vad=False, stream=False, word_timestamps=False):
+    if not os.path.isdir(audio_dir):
+        return []
+    transcribe = load_stage('transcribe')
+    params = transcribe.transcription_params(engine, model_size, compute_type, vad, stream, word_timestamps)
+    return pending(ledger, 'transcribe', params,
+                   [os.path.join(audio_dir, f) for f in transcribe.list_audio_files(audio_dir)])
+
+
+def plan_summarize(ledger, transcript_dir='transcripts', policy='1.7b', map_model=None,
+                   reduce_model=None, final_model=None):
+    summarizer = load_stage('summarize')
+    routing = summarizer.policy_routing(policy, map_model, reduce_model, final_model)
+    return pending(ledger, 'summarize', summarizer.routing_params(routing),
+                   sorted(Path(transcript_dir).glob('*.txt')))
+
+
+def plan_tts(ledger, summary_dir='summaries'):
+    return pending(ledger, 'tts', load_stage('tts').TTS_PARAMS, sorted(Path(summary_dir).glob('*.txt')))
+
+
+def plan_pipeline(args, ledger):
+    """Pending files per stage for 6-pipeline.py arguments."""
+    return {
+        'convert': plan_convert(ledger, args.media_dir, args.audio_dir, args.audio_format),
+        'transcribe': plan_transcribe(ledger, args.audio_dir, args.engine, args.model_size,
+                                      args.compute_type, args.vad, args.stream),
+        'summarize': plan_summarize(ledger, args.transcript_dir, args.summary_policy),
+        'tts': plan_tts(ledger, args.summary_dir),
+    }
+
+
+def print_plan(plan):
+    """Print the pending files of each stage; returns the total."""
+    for stage, files in plan.items():
+        print(f"{stage:<11} {len(files)} pending")
+        for name in files[:MAX_LISTED]:
+            print(f"    {name}")
+        if len(files) > MAX_LISTED:
+            print(f"    ... and {len(files) - MAX_LISTED} more")
+    total = sum(len(files) for files in plan.values())
+    if total == 0:
+        print("Nothing to do")
+    elif plan.get('convert') or plan.get('transcribe') or plan.get('summarize'):
+        # Each converted file adds a transcript, summary and audio file downstream
+        print("Files produced by earlier stages will also flow through the later ones")
+    return total
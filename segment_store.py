@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import struct
+from array import array
+
+import numpy as np
+
+# Binary segment store written next to each transcript (talk.txt -> talk.seg). It keeps
+# what the text lines lose: full-precision times, Whisper's per-segment scores and word
+# timings. Columns are fixed-width little-endian arrays, and the text of every segment
+# (and word) is one UTF-8 blob indexed by offsets, so the file is memory-mapped and any
+# time range is found with a binary search instead of parsing the whole transcript.
+#
+# Layout: a HEADER_SIZE header (magic, segment count, word count, text and word-text
+# blob sizes), then each section below in order, each starting on an 8-byte boundary.
+SEGMENT_STORE_EXTENSION = '.seg'
+HEADER_SIZE = 64
+_MAGIC = b'T2SSEG1\n'
+_HEADER = struct.Struct('<8sIIQQ')
+
+# Per-segment columns; scores Whisper does not report are stored as NaN
+SEGMENT_COLUMNS = (('start', '<f8'), ('end', '<f8'), ('avg_logprob', '<f4'),
+                   ('no_speech_prob', '<f4'), ('compression_ratio', '<f4'))
+WORD_COLUMNS = (('start', '<f8'), ('end', '<f8'), ('probability', '<f4'))
+# array typecodes the writer collects each column dtype in
+_TYPECODES = {'<f8': 'd', '<f4': 'f', '<u4': 'I', '<u8': 'Q'}
+
+EXPORT_FORMATS = ('txt', 'srt', 'vtt', 'json')
+
+
+def store_path(transcript_path):
+    """Segment store belonging to a transcript file."""
+    return os.path.splitext(str(transcript_path))[0] + SEGMENT_STORE_EXTENSION
+
+
+def _layout(segments, words, text_bytes, word_text_bytes):
+    """(section, dtype, count, byte offset) of every section, and the total file size."""
+    sections = [(f'segment_{name}', dtype, segments) for name, dtype in SEGMENT_COLUMNS]
+    sections += [('text_offsets', '<u8', segments + 1),
+                 ('word_offsets', '<u4', segments + 1)]  # first word of each segment
+    sections += [(f'word_{name}', dtype, words) for name, dtype in WORD_COLUMNS]
+    sections += [('word_text_offsets', '<u8', words + 1),
+                 ('text', 'u1', text_bytes), ('word_text', 'u1', word_text_bytes)]
+
+    layout = []
+    offset = HEADER_SIZE
+    for name, dtype, count in sections:
+        layout.append((name, dtype, count, offset))
+        offset += count * np.dtype(dtype).itemsize
+        offset = (offset + 7) // 8 * 8
+    return layout, offset
+
+
+def _score(value):
+    return float('nan') if value is None else value
+
+
+def _decode(blob, offsets):
+    """Strings between successive offsets of a UTF-8 blob."""
+    offsets = offsets.tolist()
+    if not offsets:
+        return []
+    base = offsets[0]
+    data = blob[base:offsets[-1]].tobytes()
+    return [data[a - base:b - base].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+
+def txt_line(start, end, text):
+    """One transcript line in the "[0.00s -> 5.22s] text" format."""
+    return f"[{start:.2f}s -> {end:.2f}s] {text}\n"
+
+
+class SegmentStoreWriter:
+    """Collects segments into compact column arrays; write() saves them as a store."""
+
+    def __init__(self):
+        self.columns = {f'segment_{name}': array(_TYPECODES[dtype]) for name, dtype in SEGMENT_COLUMNS}
+        self.columns.update({f'word_{name}': array(_TYPECODES[dtype]) for name, dtype in WORD_COLUMNS})
+        self.columns['text_offsets'] = array('Q', [0])
+        self.columns['word_offsets'] = array('I', [0])
+        self.columns['word_text_offsets'] = array('Q', [0])
+        self.text = bytearray()
+        self.word_text = bytearray()
+
+    def add(self, segments):
+        # Segments as the transcription backends return them; 'words' is optional
+        columns = self.columns
+        for segment in segments:
+            columns['segment_start'].append(segment['start'])
+            columns['segment_end'].append(segment['end'])
+            for name in ('avg_logprob', 'no_speech_prob', 'compression_ratio'):
+                columns[f'segment_{name}'].append(_score(segment.get(name)))
+            self.text += segment['text'].encode('utf-8')
+            columns['text_offsets'].append(len(self.text))
+
+            for word in segment.get('words') or ():
+                columns['word_start'].append(word['start'])
+                columns['word_end'].append(word['end'])
+                columns['word_probability'].append(_score(word.get('probability')))
+                self.word_text += word['word'].encode('utf-8')
+                columns['word_text_offsets'].append(len(self.word_text))
+            columns['word_offsets'].append(len(columns['word_start']))
+
+    def write(self, path):
+        """Save the store atomically; returns the number of segments."""
+        segments = len(self.columns['segment_start'])
+        words = len(self.columns['word_start'])
+        layout, size = _layout(segments, words, len(self.text), len(self.word_text))
+
+        partial = f"{path}.part"
+        try:
+            with open(partial, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, segments, words, len(self.text), len(self.word_text))
+                        .ljust(HEADER_SIZE, b'\0'))
+                for name, dtype, _, offset in layout:
+                    f.write(b'\0' * (offset - f.tell()))
+                    if name == 'text':
+                        f.write(self.text)
+                    elif name == 'word_text':
+                        f.write(self.word_text)
+                    else:
+                        f.write(np.asarray(self.columns[name], dtype=dtype).tobytes())
+                f.write(b'\0' * (size - f.tell()))
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return segments
+
+
+def write_segment_store(path, segments):
+    """Write segments to a store file in one go; returns the number of segments."""
+    writer = SegmentStoreWriter()
+    writer.add(segments)
+    return writer.write(path)
+
+
+class SegmentStore:
+    """Read-only, memory-mapped view of a segment store.
+
+    Columns are numpy arrays over the mapped file (store.start, store.end,
+    store.avg_logprob, ...); text is decoded only for the segments asked for.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        raw = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if len(raw) < HEADER_SIZE:
+            raise ValueError(f"{self.path} is not a segment store (truncated header)")
+        magic, segments, words, text_bytes, word_text_bytes = _HEADER.unpack(raw[:_HEADER.size].tobytes())
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a segment store")
+        layout, size = _layout(segments, words, text_bytes, word_text_bytes)
+        if len(raw) < size:
+            raise ValueError(f"{self.path} is truncated ({len(raw)} of {size} bytes)")
+
+        sections = {name: raw[offset:offset + count * np.dtype(dtype).itemsize].view(dtype)
+                    for name, dtype, count, offset in layout}
+        for name, _ in SEGMENT_COLUMNS:
+            setattr(self, name, sections[f'segment_{name}'])
+        self.text_offsets = sections['text_offsets']
+        self.word_offsets = sections['word_offsets']
+        self.word_start = sections['word_start']
+        self.word_end = sections['word_end']
+        self.word_probability = sections['word_probability']
+        self.word_text_offsets = sections['word_text_offsets']
+        self._text = sections['text']
+        self._word_text = sections['word_text']
+
+    def __len__(self):
+        return len(self.start)
+
+    def text(self, index):
+        return self._text[self.text_offsets[index]:self.text_offsets[index + 1]].tobytes().decode('utf-8')
+
+    def texts(self, first=0, last=None):
+        """Text of segments [first, last), decoded in one pass over the blob."""
+        last = len(self) if last is None else last
+        return _decode(self._text, self.text_offsets[first:last + 1])
+
+    def words(self, index):
+        """Word timings of one segment as dicts (empty unless word timestamps were recorded)."""
+        first, last = int(self.word_offsets[index]), int(self.word_offsets[index + 1])
+        texts = _decode(self._word_text, self.word_text_offsets[first:last + 1])
+        return [{'start': float(self.word_start[i]), 'end': float(self.word_end[i]), 'word': word,
+                 'probability': float(self.word_probability[i])}
+                for i, word in zip(range(first, last), texts)]
+
+    def segment(self, index):
+        segment = {'id': index, 'text': self.text(index)}
+        for name, _ in SEGMENT_COLUMNS:
+            segment[name] = float(getattr(self, name)[index])
+        segment['words'] = self.words(index)
+        return segment
+
+    def span(self, start_seconds, end_seconds):
+        """(first, last) indices of the segments overlapping [start, end); times are sorted."""
+        first = int(np.searchsorted(self.end, start_seconds, side='right'))
+        last = int(np.searchsorted(self.start, end_seconds, side='left'))
+        return first, max(first, last)
+
+    def at(self, seconds):
+        """Index of the segment being spoken at a time, or None in a gap."""
+        index = int(np.searchsorted(self.start, seconds, side='right')) - 1
+        return index if index >= 0 and self.end[index] >= seconds else None
+
+    def iter_segments(self, first=0, last=None):
+        """(start, end, text) of segments [first, last)."""
+        last = len(self) if last is None else last
+        return zip(self.start[first:last].tolist(), self.end[first:last].tolist(),
+                   self.texts(first, last))
+
+
+def _clock(seconds, separator):
+    milliseconds = int(round(seconds * 1000))
+    hours, rest = divmod(milliseconds, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    return f"{hours:02d}:{minutes:02d}:{rest // 1000:02d}{separator}{rest % 1000:03d}"
+
+
+def to_txt(store):
+    """The transcriber's own "[start -> end] text" lines."""
+    return ''.join(txt_line(start, end, text) for start, end, text in store.iter_segments())
+
+
+def to_srt(store):
+    return ''.join(f"{number}\n{_clock(start, ',')} --> {_clock(end, ',')}\n{text.strip()}\n\n"
+                   for number, (start, end, text) in enumerate(store.iter_segments(), 1))
+
+
+def to_vtt(store):
+    return 'WEBVTT\n\n' + ''.join(f"{_clock(start, '.')} --> {_clock(end, '.')}\n{text.strip()}\n\n"
+                                  for start, end, text in store.iter_segments())
+
+
+def _scores(column):
+    # float32 scores to their 7 significant digits, as Whisper reported them; NaN (not reported) as null
+    return [None if value != value else float(f"{value:.7g}") for value in column.tolist()]
+
+
+def to_json(store):
+    """Segments with their scores and word timings, built column by column."""
+    scores = {name: _scores(getattr(store, name)) for name in ('avg_logprob', 'no_speech_prob', 'compression_ratio')}
+    words = [{'start': start, 'end': end, 'word': word, 'probability': probability}
+             for start, end, word, probability in zip(store.word_start.tolist(), store.word_end.tolist(),
+                                                      _decode(store._word_text, store.word_text_offsets),
+                                                      _scores(store.word_probability))]
+    word_offsets = store.word_offsets.tolist()
+    segments = [{'id': index, 'start': start, 'end': end, 'text': text,
+                 **{name: column[index] for name, column in scores.items()},
+                 'words': words[word_offsets[index]:word_offsets[index + 1]]}
+                for index, (start, end, text) in enumerate(store.iter_segments())]
+    return json.dumps({'segments': segments}, ensure_ascii=False) + '\n'
+
+
+EXPORTERS = {'txt': to_txt, 'srt': to_srt, 'vtt': to_vtt, 'json': to_json}
+
+
+def export(store, export_format, output_path):
+    """Write a store in one of EXPORT_FORMATS."""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(EXPORTERS[export_format](store))
+    return output_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export transcript segment stores (.seg) as txt, SRT, VTT or JSON")
+    parser.add_argument('stores', nargs='+', help=".seg files written by the transcriber")
+    parser.add_argument('--format', dest='formats', nargs='+', choices=EXPORT_FORMATS, default=['srt'])
+    parser.add_argument('--output-dir', help="Default: next to each store")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for path in args.stores:
+        try:
+            store = SegmentStore(path)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {str(e)}")
+            continue
+        base = os.path.splitext(os.path.basename(path))[0]
+        output_dir = args.output_dir or os.path.dirname(path) or '.'
+        os.makedirs(output_dir, exist_ok=True)
+        for export_format in args.formats:
+            output_path = os.path.join(output_dir, f"{base}.{export_format}")
+            if export_format == 'txt' and os.path.abspath(store_path(output_path)) == os.path.abspath(path):
+                # That is the live transcript the summarizer and ledger read, maybe edited by hand
+                output_path = os.path.join(output_dir, f"{base}.export.{export_format}")
+            output_path = export(store, export_format, output_path)
+            print(f"{path}: {len(store)} segments -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, load_audio_range, stream_audio
+from shared_weights import prepare_shared_checkpoint, print_memory, process_memory
+from transcription_backends import create_backend
+from vad import FRAME_SIZE, detect_speech
+
+# Target shard length; cuts are moved to the quietest point within SEARCH_SECONDS of each target
+DEFAULT_SHARD_SECONDS = 600.0
+DEFAULT_OVERLAP_SECONDS = 5.0
+SEARCH_SECONDS = 30.0
+# Streaming: ffmpeg decodes the file a few seconds at a time and it is transcribed in
+# Whisper-sized windows, so memory stays flat however long the file is
+STREAM_WINDOW_SECONDS = 30.0
+STREAM_READ_SECONDS = 10.0
+# A window's last segment may be cut off mid-word: unless it starts this early in the
+# window, it is dropped and decoded again at the start of the next window
+MIN_ADVANCE_SECONDS = 5.0
+# Characters of transcript carried into the next window as the decoder's prompt
+PROMPT_CHARS = 400
+
+# Energy is smoothed over this many 20 ms frames so a cut lands in a pause, not between syllables
+SMOOTHING_FRAMES = 15
+STREAM_CHUNK_SAMPLES = 60 * SAMPLE_RATE
+
+# Longest run of words repeated across a shard boundary that is trimmed from the later shard
+MAX_REPEATED_WORDS = 30
+
+# Backend of the current pool process, loaded once by _init_worker
+_worker_backend = None
+
+
+def audio_energies(audio):
+    """Per-frame log energy (dB) of in-memory audio; a trailing partial frame is ignored."""
+    usable = len(audio) // FRAME_SIZE * FRAME_SIZE
+    frames = np.asarray(audio[:usable], dtype=np.float32).reshape(-1, FRAME_SIZE)
+    return 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def frame_energies(path, ffmpeg_binary='ffmpeg'):
+    """Per-frame log energy (dB) of a file, computed while streaming it; returns (energies, total samples)."""
+    parts = []
+    carry = np.zeros(0, dtype=np.float32)
+    total_samples = 0
+    for chunk in stream_audio(path, STREAM_CHUNK_SAMPLES, ffmpeg_binary):
+        total_samples += len(chunk)
+        chunk = np.concatenate((carry, chunk))
+        usable = len(chunk) // FRAME_SIZE * FRAME_SIZE
+        parts.append(audio_energies(chunk[:usable]))
+        carry = chunk[usable:]
+    energies = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    return energies, total_samples
+
+
+def plan_shards(energies, total_samples, shard_seconds=DEFAULT_SHARD_SECONDS,
+                overlap_seconds=DEFAULT_OVERLAP_SECONDS, search_seconds=SEARCH_SECONDS):
+    """Split a file at silences into shards of roughly shard_seconds.
+
+    Returns (load_start, load_end, keep_start, keep_end) tuples in seconds: each shard
+    is decoded over [load_start, load_end), which extends overlap_seconds past its cuts
+    so words at a cut are heard whole, and owns the segments in [keep_start, keep_end).
+    """
+    frame_seconds = FRAME_SIZE / SAMPLE_RATE
+    duration = total_samples / SAMPLE_RATE
+    if len(energies) > SMOOTHING_FRAMES:
+        energies = np.convolve(energies, np.ones(SMOOTHING_FRAMES) / SMOOTHING_FRAMES, mode='same')
+
+    # Cuts never move more than half a shard from their target
+    search_seconds = min(search_seconds, shard_seconds / 2)
+    cuts = [0.0]
+    # Stop once the remainder fits in one shard, so the last shard is never a short tail
+    while duration - cuts[-1] > 1.5 * shard_seconds:
+        target = cuts[-1] + shard_seconds
+        low = int((target - search_seconds) / frame_seconds)
+        high = min(int((target + search_seconds) / frame_seconds), len(energies))
+        quietest = low + int(np.argmin(energies[low:high]))
+        cuts.append((quietest + 0.5) * frame_seconds)
+    cuts.append(duration)
+
+    return [(max(start - overlap_seconds, 0.0), min(end + overlap_seconds, duration), start, end)
+            for start, end in zip(cuts[:-1], cuts[1:])]
+
+
+def _init_worker(engine, model_size, device, compute_type, threads, shared_weights, word_timestamps):
+    global _worker_backend
+    # Split the cores between the pool processes instead of every process using all of them
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    _worker_backend = create_backend(engine, model_size, device=device, compute_type=compute_type,
+                                     shared_weights=shared_weights, word_timestamps=word_timestamps)
+
+
+def transcribe_audio(backend, audio, offset=0.0, vad=False, prompt=None):
+    """Transcribe a piece of audio and return its segments with times shifted by offset seconds."""
+    timeline = None
+    if vad:
+        timeline = detect_speech(audio)
+        audio = timeline.compact(audio)
+
+    if len(audio) == 0:
+        return []
+    result = backend.transcribe(audio, language="en", prompt=prompt)
+    if timeline is not None:
+        timeline.remap_result(result)
+
+    for segment in result['segments']:
+        segment['start'] += offset
+        segment['end'] += offset
+        for word in segment.get('words') or ():
+            word['start'] += offset
+            word['end'] += offset
+    return result['segments']
+
+
+def _transcribe_shard(path, load_start, load_end, vad):
+    """Transcribe one shard in a pool process; returns its segments on the file's timeline and the process memory (None if unreadable)."""
+    audio = np.asarray(load_audio_range(path, load_start, load_end - load_start))
+    return transcribe_audio(_worker_backend, audio, load_start, vad), process_memory()
+
+
+def _words(text):
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def _trim_repeated_words(previous_text, text):
+    """Drop leading words of text that repeat the end of previous_text (the overlap heard twice)."""
+    raw = text.split()
+    current = [' '.join(_words(word)) for word in raw]
+    previous = _words(previous_text)
+    for count in range(min(len(previous), len(current), MAX_REPEATED_WORDS), 0, -1):
+        if previous[-count:] == current[:count]:
+            return ' ' + ' '.join(raw[count:]) if count < len(raw) else ''
+    return text
+
+
+class SegmentStitcher:
+    """Joins per-shard segments, fed in shard order, into one transcript.
+
+    Overlap copies are dropped, words repeated across a cut are trimmed and
+    timestamps are kept monotonic. add() returns the segments each shard contributed,
+    so callers can stream them.
+    """
+
+    def __init__(self):
+        self.segments = []
+
+    def add(self, shard, segments, is_last=False):
+        keep_end = shard[3]
+        added = []
+        for segment in segments:
+            # Segments starting past the cut are left to the next shard, which has their full context
+            if not is_last and segment['start'] >= keep_end:
+                continue
+            if self.segments:
+                previous = self.segments[-1]
+                # Already covered by the previous shard's copy of the overlap
+                if (segment['start'] + segment['end']) / 2 <= previous['end']:
+                    continue
+                segment['text'] = _trim_repeated_words(previous['text'], segment['text'])
+                if not segment['text'].strip():
+                    continue
+                segment['start'] = max(segment['start'], previous['end'])
+                segment['end'] = max(segment['end'], segment['start'])
+            segment['id'] = len(self.segments)
+            self.segments.append(segment)
+            added.append(segment)
+        return added
+
+    def result(self):
+        return {
+            'text': ''.join(segment['text'] for segment in self.segments),
+            'segments': self.segments,
+            'language': 'en',
+        }
+
+
+def stitch_segments(shards, shard_segments):
+    """Merge per-shard segments into one transcript with overlap removed and monotonic timestamps."""
+    stitcher = SegmentStitcher()
+    for index, (shard, segments) in enumerate(zip(shards, shard_segments)):
+        stitcher.add(shard, segments, is_last=index == len(shards) - 1)
+    return stitcher.result()
+
+
+def stream_transcription(backend, path, vad=False, window_seconds=STREAM_WINDOW_SECONDS,
+                         ffmpeg_binary='ffmpeg'):
+    """Transcribe a file window by window as it is decoded, yielding (segments added, seconds transcribed so far).
+
+    Only about one window of audio is held at a time. The audio after a window's last
+    complete segment is carried into the next window, and the end of the transcript so
+    far is passed to the decoder as context.
+    """
+    window_samples = int(window_seconds * SAMPLE_RATE)
+    chunks = stream_audio(path, int(STREAM_READ_SECONDS * SAMPLE_RATE), ffmpeg_binary)
+    stitcher = SegmentStitcher()
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0.0
+    context = ''
+    finished = False
+    try:
+        while True:
+            while not finished and len(buffer) < window_samples:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    finished = True
+                else:
+                    buffer = np.concatenate((buffer, chunk))
+            is_last = finished and len(buffer) <= window_samples
+            window = buffer[:window_samples]
+            if len(window) == 0:
+                return
+            window_end = offset + len(window) / SAMPLE_RATE
+
+            segments = transcribe_audio(backend, window, offset, vad, prompt=context or None)
+            cut = window_end
+            if not is_last and len(segments) > 1 and segments[-1]['start'] - offset >= MIN_ADVANCE_SECONDS:
+                cut = segments[-1]['start']
+            # Segments starting at or after the cut are left to the next window
+            added = stitcher.add((offset, window_end, offset, cut), segments, is_last)
+            context = (context + ''.join(segment['text'] for segment in added))[-PROMPT_CHARS:]
+
+            advance = min(len(buffer), int(round((cut - offset) * SAMPLE_RATE)))
+            buffer = buffer[advance:]
+            offset += advance / SAMPLE_RATE
+            yield added, window_end if is_last else offset
+            if is_last:
+                return
+    finally:
+        chunks.close()
+
+
+class ShardedTranscriber:
+    """Transcribe one long file as silence-aligned shards spread over a process pool.
+
+    Each pool process loads the model once and transcribes whole shards with the
+    normal (sequential) engine, so a multi-hour recording uses every core instead
+    of one serial transcribe call. With shared_weights the processes map one
+    float32 copy of the openai-whisper weights instead of holding one each.
+    """
+
+    def __init__(self, engine='whisper', model_size='small', device='cpu', compute_type='int8',
+                 workers=2, shard_seconds=DEFAULT_SHARD_SECONDS,
+                 overlap_seconds=DEFAULT_OVERLAP_SECONDS, vad=False, shared_weights=False,
+                 word_timestamps=False):
+        self.engine = engine
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.workers = workers
+        self.shard_seconds = shard_seconds
+        self.overlap_seconds = overlap_seconds
+        self.vad = vad
+        self.shared_weights = shared_weights
+        self.word_timestamps = word_timestamps
+        self.executor = None
+        # Latest process_memory() report of each pool process, by pid (none where memory cannot be read)
+        self.worker_memory = {}
+
+    def plan(self, path):
+        energies, total_samples = frame_energies(path)
+        return plan_shards(energies, total_samples, self.shard_seconds, self.overlap_seconds)
+
+    def _executor(self):
+        # Started on first use: the models are only loaded once a long file actually shows up
+        if self.executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            if self.shared_weights and self.engine == 'whisper' and self.device == 'cpu':
+                # Written here once, before the workers start, so they only ever map it
+                prepare_shared_checkpoint(self.model_size, os.path.join(os.getcwd(), "whisper_model"))
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.engine, self.model_size, self.device, self.compute_type, threads,
+                          self.shared_weights, self.word_timestamps))
+        return self.executor
+
+    def transcribe(self, path, shards):
+        executor = self._executor()
+        futures = [executor.submit(_transcribe_shard, path, load_start, load_end, self.vad)
+                   for load_start, load_end, _, _ in shards]
+        shard_segments = []
+        for future in futures:
+            segments, memory = future.result()
+            shard_segments.append(segments)
+            if memory:
+                self.worker_memory[memory['pid']] = memory
+        return stitch_segments(shards, shard_segments)
+
+    def print_memory(self):
+        print_memory(self.worker_memory.values())
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+from dataclasses import asdict
+
+# openai-whisper checkpoints are stored in float16 and upcast to float32 on load, so every
+# process ends up with a private float32 copy of the weights. Writing that float32 copy to
+# disk once and memory-mapping it in every worker keeps a single copy in the page cache,
+# shared read-only by all of them (CPU only; a GPU copy is private to its process anyway)
+SHARED_DIR = 'shared'
+
+
+def shared_checkpoint_path(model_size, download_root):
+    return os.path.join(download_root, SHARED_DIR, f"{model_size}-float32.pt")
+
+
+def prepare_shared_checkpoint(model_size, download_root):
+    """Write the float32 checkpoint the workers map, unless it exists; returns its path."""
+    path = shared_checkpoint_path(model_size, download_root)
+    if os.path.exists(path):
+        return path
+
+    import torch
+    import whisper
+
+    print(f"Writing shared {model_size} checkpoint to {path}...")
+    model = whisper.load_model(model_size, device='cpu', download_root=download_root)
+    state = model.state_dict()
+    # Non-persistent buffers (attention mask, alignment heads) are saved too, so loading
+    # never has to build the model with real tensors first
+    buffers = {name: buffer for name, buffer in model.named_buffers() if name not in state}
+    checkpoint = {
+        'dims': asdict(model.dims),
+        'model_state_dict': {name: tensor.contiguous() for name, tensor in state.items()},
+        'buffers': {name: buffer.to_dense() if buffer.is_sparse else buffer
+                    for name, buffer in buffers.items()},
+        'sparse_buffers': [name for name, buffer in buffers.items() if buffer.is_sparse],
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique temporary name: concurrent writers each finish their own file, the last rename wins
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    torch.save(checkpoint, partial)
+    os.replace(partial, path)
+    return path
+
+
+def load_shared_model(path):
+    """Whisper model on the CPU whose weights are memory-mapped from a shared checkpoint."""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    class WeightsOnMeta(torch.overrides.TorchFunctionMode):
+        # Weight tensors are created on the meta device, so building the model allocates
+        # nothing; bool tensors stay real because Whisper makes its alignment-head mask
+        # sparse, which meta tensors do not support
+        def __torch_function__(self, func, types, args=(), kwargs=None):
+            kwargs = dict(kwargs or {})
+            if (func in (torch.empty, torch.zeros, torch.ones, torch.full)
+                    and kwargs.get('device') is None and kwargs.get('dtype') is not torch.bool):
+                kwargs['device'] = 'meta'
+            return func(*args, **kwargs)
+
+    checkpoint = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    # Built without weights; the mapped tensors are then assigned in place
+    with WeightsOnMeta():
+        model = Whisper(ModelDimensions(**checkpoint['dims']))
+    model.load_state_dict(checkpoint['model_state_dict'], assign=True)
+    for name, buffer in checkpoint['buffers'].items():
+        if name in checkpoint['sparse_buffers']:
+            buffer = buffer.to_sparse()
+        module_name, _, buffer_name = name.rpartition('.')
+        model.get_submodule(module_name).register_buffer(buffer_name, buffer, persistent=False)
+    return model
+
+
+def process_memory():
+    """Memory of this process in MB: resident, proportional (shared pages split between their users), private and shared.
+
+    Returns None where the memory of a process cannot be read.
+    """
+    memory = {'pid': os.getpid()}
+    try:
+        fields = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[key] = int(value.split()[0]) / 1024
+        memory.update(rss_mb=fields['Rss'], pss_mb=fields['Pss'],
+                      private_mb=fields['Private_Clean'] + fields['Private_Dirty'],
+                      shared_mb=fields['Shared_Clean'] + fields['Shared_Dirty'])
+        return memory
+    except (OSError, KeyError):
+        pass
+    try:
+        # No smaps outside Linux: peak resident size only (bytes on macOS, kB elsewhere)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory['rss_mb'] = peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+        # No resource module on Windows: current resident size, if psutil is installed
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory['rss_mb'] = psutil.Process().memory_info().rss / (1024 * 1024)
+    return memory
+
+
+def print_memory(reports, label='worker'):
+    """Print one row per process from process_memory() reports, and the totals; None reports are skipped."""
+    reports = sorted((report for report in reports if report), key=lambda report: report['pid'])
+    if not reports:
+        return
+    print(f"\n{label:<10} {'pid':>7} {'RSS MB':>9} {'PSS MB':>9} {'private MB':>11} {'shared MB':>10}")
+    for index, report in enumerate(reports):
+        print(f"{index:<10} {report['pid']:>7} {report['rss_mb']:>9.0f} "
+              f"{report.get('pss_mb', float('nan')):>9.0f} {report.get('private_mb', float('nan')):>11.0f} "
+              f"{report.get('shared_mb', float('nan')):>10.0f}")
+    # PSS adds up to the memory the processes really use together; RSS counts shared pages once per process
+    print(f"{'total':<10} {'':>7} {sum(r['rss_mb'] for r in reports):>9.0f} "
+          f"{sum(r.get('pss_mb', float('nan')) for r in reports):>9.0f}")
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Size-bounded least-recently-used cache tables in SQLite, shared by the summary and TTS
+# caches. Each subclass names its table and schema; every table has a TEXT key, the
+# value's size in bytes and when it was last used
+# Eviction frees down to this fraction of the limit so it does not run on every insert
+EVICT_TO_FRACTION = 0.9
+
+
+class SQLiteLRUCache:
+    """On-disk key-value cache with size-bounded least-recently-used eviction.
+
+    Subclasses set TABLE, SCHEMA (key, size and last_used columns plus their own),
+    VALUE_COLUMN and NAME (for print_stats).
+    """
+
+    TABLE = None
+    SCHEMA = None
+    VALUE_COLUMN = None
+    NAME = 'Cache'
+
+    def __init__(self, db_path, max_bytes):
+        self.db_path = os.path.abspath(db_path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, as in JobLedger
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute(f"SELECT {self.VALUE_COLUMN} FROM {self.TABLE} WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        with conn:
+            conn.execute(f"UPDATE {self.TABLE} SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def _put(self, key, size, **columns):
+        # Stores one row (key, size, last_used and the subclass's columns), then evicts if over the limit
+        conn = self._connection()
+        names = ['key', *columns, 'size', 'last_used']
+        with conn:
+            conn.execute(f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(names)}) "
+                         f"VALUES ({', '.join('?' * len(names))})",
+                         (key, *columns.values(), size, time.time()))
+        self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * EVICT_TO_FRACTION)
+        stale, freed = [], 0
+        for key, size in conn.execute(f"SELECT key, size FROM {self.TABLE} ORDER BY last_used"):
+            stale.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        with conn:
+            conn.executemany(f"DELETE FROM {self.TABLE} WHERE key = ?", stale)
+        with self._lock:
+            self.evictions += len(stale)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def _stats_details(self):
+        # Extra text for print_stats, before the eviction count
+        return ''
+
+    def print_stats(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return
+        print(f"{self.NAME}: {self.hits} hits, {self.misses} misses ({self.hits / lookups:.0%} hit rate), "
+              f"{self._stats_details()}{self.evictions} evicted")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
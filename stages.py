@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import sys
+
+# The stage scripts have numbered file names that cannot be imported directly
+STAGE_SCRIPTS = {
+    'convert': '1-convert_aac.py',
+    'download': '2-model_downloader.py',
+    'transcribe': '3-audio_transcriber.py',
+    'summarize': '4-summarizer.py',
+    'tts': '5-edgettsforsummaries.py',
+    'pipeline': '6-pipeline.py',
+    'service': '7-service.py',
+}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_stage(stage):
+    """Import a numbered stage script as a module and return it (cached after the first call)."""
+    module_name = f"stage_{stage}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    script_path = os.path.join(BASE_DIR, STAGE_SCRIPTS[stage])
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    # Register before executing so pickling (process pools) can find the module
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[module_name]
+        raise
+    return module
@@ -0,0 +1,70 @@
+import hashlib
+import json
+
+from sqlite_cache import SQLiteLRUCache
+
+# Chunk, group and final summaries keyed by everything that determines the LLM output,
+# so editing one line of a transcript only sends the chunks that changed back to Ollama
+DEFAULT_CACHE_PATH = 'summary_cache.db'
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used);
+"""
+
+
+def cache_key(model, prompt, options, system=None):
+    """SHA-256 of the model, the system prompt, the full prompt (template plus text) and the options."""
+    payload = json.dumps([model, system, prompt, options or {}], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def summary_key(kind, routing, inputs, settings):
+    """SHA-256 of a result built from several requests: its kind, the model per phase, its inputs and the steps' prompts and options."""
+    payload = json.dumps([kind, routing, inputs, settings], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache(SQLiteLRUCache):
+    """On-disk LLM response cache with size-bounded least-recently-used eviction."""
+
+    TABLE = 'summaries'
+    SCHEMA = SCHEMA
+    VALUE_COLUMN = 'response'
+    NAME = 'Summary cache'
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(db_path, max_bytes)
+
+    def put(self, key, model, response):
+        self._put(key, len(response.encode('utf-8')), model=model, response=response)
+
+
+class CachedClient:
+    """Wraps an Ollama client so generate() answers repeated prompts from a SummaryCache."""
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    def generate(self, model, prompt, system=None, options=None, **kwargs):
+        if not prompt:
+            # Nothing to cache for a bare model load
+            return self.client.generate(model=model, prompt=prompt, system=system, options=options, **kwargs)
+        key = cache_key(model, prompt, options, system)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {'model': model, 'response': cached, 'cached': True}
+        response = self.client.generate(model=model, prompt=prompt, system=system, options=options, **kwargs)
+        self.cache.put(key, model, response['response'])
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import instrumentation
+import pipeline_plan
+from job_ledger import JobLedger
+from stages import load_stage
+
+# Single entry point for every stage, the pipeline and the service:
+#   python t2s.py plan                   list pending work without loading any ML library
+#   python t2s.py transcribe --vad       run a stage (its own options follow the name)
+#   python t2s.py pipeline               run all stages concurrently
+#   python t2s.py startup                time how long each command takes to find nothing to do
+#   python t2s.py bench                  benchmark every stage on synthetic media (see benchmark.py)
+#   python t2s.py --trace t.jsonl pipeline   record hot-path spans (JSONL) and Prometheus metrics
+#   python t2s.py export transcripts/*.seg --format srt vtt   subtitles/JSON from the segment stores
+# Stage commands plan first and exit straight away when there is nothing to do; the stage
+# (and torch, whisper, moviepy, ollama or edge-tts with it) is only run when work is found
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# What each stage script used to import at the top, for the startup comparison
+EAGER_IMPORTS = {
+    'convert': 'moviepy.editor',
+    'transcribe': 'torch, whisper',
+    'summarize': 'ollama',
+    'tts': 'edge_tts',
+}
+
+
+def _run_if_pending(stage, argv, files):
+    if not files:
+        print(f"Nothing to {stage}")
+        return
+    print(f"{len(files)} file(s) to {stage}")
+    load_stage(stage).main(argv)
+
+
+def run_convert(argv):
+    args = load_stage('convert').parse_args(argv)
+    _run_if_pending('convert', argv, pipeline_plan.plan_convert(JobLedger(), audio_format=args.format))
+
+
+def run_transcribe(argv):
+    args = load_stage('transcribe').parse_args(argv)
+    if args.compare:
+        load_stage('transcribe').main(argv)
+        return
+    _run_if_pending('transcribe', argv, pipeline_plan.plan_transcribe(
+        JobLedger(), engine=args.engine, model_size=args.model_size,
+        compute_type=args.compute_type, vad=args.vad, stream=args.stream,
+        word_timestamps=args.word_timestamps))
+
+
+def run_summarize(argv):
+    args = load_stage('summarize').parse_args(argv)
+    if args.compare_policies:
+        load_stage('summarize').main(argv)
+        return
+    _run_if_pending('summarize', argv, pipeline_plan.plan_summarize(
+        JobLedger(), policy=args.policy, map_model=args.map_model,
+        reduce_model=args.reduce_model, final_model=args.final_model))
+
+
+def run_tts(argv):
+    if argv:
+        raise SystemExit("tts takes no options")
+    files = pipeline_plan.plan_tts(JobLedger())
+    if not files:
+        print("Nothing to tts")
+        return
+    print(f"{len(files)} file(s) to tts")
+    load_stage('tts').main()
+
+
+def run_pipeline(argv):
+    pipeline = load_stage('pipeline')
+    args = pipeline.parse_args(argv)
+    plan = pipeline_plan.plan_pipeline(args, JobLedger(args.ledger))
+    if pipeline_plan.print_plan(plan):
+        pipeline.main(argv)
+
+
+def run_plan(argv):
+    # Takes the pipeline's options, so directories, models and the ledger match a pipeline run
+    args = load_stage('pipeline').parse_args(argv)
+    pipeline_plan.print_plan(pipeline_plan.plan_pipeline(args, JobLedger(args.ledger)))
+
+
+def run_download(argv):
+    load_stage('download').main(argv)
+
+
+def run_service(argv):
+    load_stage('service').main(argv)
+
+
+def run_export(argv):
+    # Imported on use for the same reason as benchmark
+    import segment_store
+    segment_store.main(argv)
+
+
+def run_bench(argv):
+    # numpy is only needed here, so the other commands do not import it
+    import benchmark
+    benchmark.main(argv)
+
+
+def run_startup(argv):
+    parser = argparse.ArgumentParser(prog='t2s startup',
+                                     description="Time each command on an empty work tree against importing what the stage scripts used to load up front")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    script = os.path.join(BASE_DIR, 't2s.py')
+    commands = [('plan', [sys.executable, script, 'plan'])]
+    for stage, modules in EAGER_IMPORTS.items():
+        commands.append((stage, [sys.executable, script, stage]))
+        # instrumentation (which t2s.py imports too) reports the command's peak RSS at exit
+        commands.append((f"{stage} (eager imports)",
+                         [sys.executable, '-c',
+                          f"import sys; sys.path.insert(0, {BASE_DIR!r}); import {modules}; import instrumentation"]))
+
+    results = []
+    # An empty directory, so every stage finds nothing to do
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"{'command':<28} {'median s':>9} {'min s':>7} {'peak RSS MB':>12}")
+        for name, command in commands:
+            runs = [instrumentation.run_measured(command, cwd=work_dir, stdout=subprocess.DEVNULL,
+                                                 stderr=subprocess.DEVNULL)
+                    for _ in range(args.repeat)]
+            if any(returncode != 0 for _, _, returncode in runs):
+                print(f"{name:<28} {'failed (not installed?)':>30}")
+                continue
+            times = [elapsed for elapsed, _, _ in runs]
+            # Peak RSS is None only where neither getrusage nor psutil can read it
+            peaks = [rss for _, rss, _ in runs if rss is not None]
+            result = {'command': name, 'median_seconds': statistics.median(times),
+                      'min_seconds': min(times), 'peak_rss_mb': max(peaks) if peaks else None}
+            results.append(result)
+            peak = f"{result['peak_rss_mb']:.0f}" if peaks else 'n/a'
+            print(f"{name:<28} {result['median_seconds']:>9.3f} {result['min_seconds']:>7.3f} {peak:>12}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+COMMANDS = {
+    'plan': run_plan,
+    'convert': run_convert,
+    'download': run_download,
+    'transcribe': run_transcribe,
+    'summarize': run_summarize,
+    'tts': run_tts,
+    'pipeline': run_pipeline,
+    'service': run_service,
+    'startup': run_startup,
+    'bench': run_bench,
+    'export': run_export,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='t2s', description="Media to transcript, summary and audio",
+                                     epilog="Options after the command are passed to that stage; "
+                                            "use 't2s <command> --help' to list them")
+    parser.add_argument('--trace', help="Append hot-path timing spans of every process to this JSONL file")
+    parser.add_argument('--metrics', help="Prometheus text file aggregated from the trace at exit "
+                                          "(default: the trace path with a .prom suffix)")
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    if args.trace:
+        instrumentation.enable(args.trace, args.metrics)
+    try:
+        COMMANDS[args.command](args.args)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+
+if __name__ == "__main__":
+    main()
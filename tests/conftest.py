@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to the numbered stage scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TRANSCRIPT_WORDS = ('the', 'model', 'data', 'we', 'training', 'layer', 'attention', 'results',
+                    'show', 'that', 'a', 'large', 'network', 'is', 'trained', 'on', 'text')
+
+
+def write_transcript(path, seconds, segment_seconds=5.0, words_per_segment=12):
+    """Write a transcript in the transcriber's "[start -> end] text" format and return its path."""
+    lines = []
+    for index in range(int(seconds / segment_seconds)):
+        words = [TRANSCRIPT_WORDS[(index * 7 + i) % len(TRANSCRIPT_WORDS)] for i in range(words_per_segment)]
+        start = index * segment_seconds
+        lines.append(f"[{start:.2f}s -> {start + segment_seconds:.2f}s]  "
+                     f"{' '.join(words).capitalize()} {index}.\n")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    return path
+
+
+@pytest.fixture
+def ollama_server():
+    from fake_ollama import FakeOllamaServer
+    server = FakeOllamaServer(latency=0.05).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def tts_server(monkeypatch):
+    from fake_edge_tts import FakeEdgeTTSServer
+    server = FakeEdgeTTSServer(latency=0.2).start()
+    # edge-tts reads its endpoint from this module global on every connection
+    monkeypatch.setattr('edge_tts.communicate.WSS_URL', server.url)
+    yield server
+    server.stop()
@@ -0,0 +1,95 @@
+import os
+import stat
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+from audio_io import (
+    load_whisper_audio,
+    save_whisper_audio,
+    stream_audio,
+    write_whisper_audio,
+)
+from sharded_transcription import frame_energies, stream_transcription
+
+ffmpeg = pytest.importorskip('imageio_ffmpeg').get_ffmpeg_exe()
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(np.asarray(samples, dtype='<i2').tobytes())
+    return str(path)
+
+
+def test_stream_audio_reads_a_good_file(tmp_path):
+    path = write_wav(tmp_path / 'tone.wav', 1000 * np.sin(np.arange(48000) / 10))
+
+    chunks = list(stream_audio(path, 16000, ffmpeg))
+
+    assert sum(len(chunk) for chunk in chunks) == 48000
+
+
+def test_corrupt_file_raises_instead_of_ending_cleanly(tmp_path):
+    path = tmp_path / 'corrupt.m4a'
+    path.write_bytes(b'\0\0\0\x20ftypM4A ' + bytes(range(256)) * 40)
+
+    with pytest.raises(RuntimeError, match='ffmpeg failed: .+'):
+        list(stream_audio(str(path), 16000, ffmpeg))
+    with pytest.raises(RuntimeError, match='ffmpeg failed'):
+        frame_energies(str(path), ffmpeg)
+
+
+def empty_wav(tmp_path):
+    return write_wav(tmp_path / 'empty.wav', [])
+
+
+def empty_npy(tmp_path):
+    path = str(tmp_path / 'empty.npy')
+    save_whisper_audio([], path)
+    return path
+
+
+@pytest.mark.parametrize('make_empty', [empty_wav, empty_npy])
+def test_file_without_samples_is_an_error(tmp_path, make_empty):
+    path = make_empty(tmp_path)
+
+    with pytest.raises(RuntimeError, match='No audio decoded'):
+        frame_energies(path, ffmpeg)
+    # The streaming transcriber fails before the backend is ever called, so nothing is recorded
+    with pytest.raises(RuntimeError, match='No audio decoded'):
+        list(stream_transcription(None, path, ffmpeg_binary=ffmpeg))
+
+
+def noisy_ffmpeg(tmp_path, exit_code=0):
+    # Writes far more than a pipe buffer of errors before any audio, like ffmpeg on a badly damaged file
+    script = tmp_path / 'noisy-ffmpeg'
+    script.write_text(f"""#!{sys.executable}
+import sys
+sys.stderr.write('[mp3 @ 0x0] invalid frame header\\n' * 30000)
+sys.stderr.flush()
+sys.stdout.buffer.write(bytes(4 * 16000))
+sys.exit({exit_code})
+""")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def test_a_flood_of_ffmpeg_errors_does_not_stall_decoding(tmp_path):
+    output_path = str(tmp_path / 'talk.npy')
+
+    assert write_whisper_audio('talk.mp3', output_path, noisy_ffmpeg(tmp_path)) == 16000
+    assert len(load_whisper_audio(output_path)) == 16000
+    assert sum(len(chunk) for chunk in stream_audio('talk.mp3', 4000, noisy_ffmpeg(tmp_path))) == 16000
+
+
+def test_failed_conversion_reports_ffmpeg_errors_and_leaves_no_file(tmp_path):
+    output_path = str(tmp_path / 'talk.npy')
+
+    with pytest.raises(RuntimeError, match='ffmpeg failed: .*invalid frame header'):
+        write_whisper_audio('talk.mp3', output_path, noisy_ffmpeg(tmp_path, exit_code=1))
+    assert not os.path.exists(output_path)
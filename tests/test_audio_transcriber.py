@@ -0,0 +1,49 @@
+import pytest
+
+from stages import load_stage
+
+transcribe = load_stage('transcribe')
+
+
+class StubSharder:
+    def __init__(self):
+        self.closed = False
+
+    def print_memory(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def transcriber_without_model(tmp_path):
+    # Skips loading a model: only the file loop and the cleanup are exercised
+    (tmp_path / 'talk.npy').write_bytes(b'')
+    transcriber = object.__new__(transcribe.AudioTranscriber)
+    transcriber.audio_folder = str(tmp_path)
+    transcriber.engine = 'whisper'
+    transcriber.word_timestamps = False
+    transcriber.transcribed_count, transcriber.transcribed_seconds = 0, 0.0
+    transcriber.sharder = StubSharder()
+    return transcriber
+
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_batched_transcription_stops_the_shard_workers(tmp_path, monkeypatch, fail):
+    transcriber = transcriber_without_model(tmp_path)
+    batches = []
+
+    def transcribe_batched(audio_files, batch_size):
+        batches.append((audio_files, batch_size))
+        if fail:
+            raise RuntimeError('out of memory')
+    monkeypatch.setattr(transcriber, '_transcribe_batched', transcribe_batched)
+
+    if fail:
+        with pytest.raises(RuntimeError):
+            transcriber.transcribe_files(batch_size=8)
+    else:
+        transcriber.transcribe_files(batch_size=8)
+
+    assert batches == [(['talk.npy'], 8)]
+    assert transcriber.sharder.closed
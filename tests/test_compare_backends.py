@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import compare_backends
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_default_clip_and_reference_are_checked_in():
+    assert os.path.isfile(os.path.join(REPO, compare_backends.DEFAULT_CLIP))
+    with open(os.path.join(REPO, compare_backends.DEFAULT_REFERENCE), encoding='utf-8') as f:
+        # The reference is the text that was voiced, not a transcript with timestamps
+        reference = f.read()
+    assert not compare_backends.TIMESTAMP_PATTERN.search(reference)
+    assert len(compare_backends.normalize_words(reference)) > 300
+
+
+def test_missing_clip_is_a_clear_error(tmp_path, capsys):
+    clip = tmp_path / 'missing.aac'
+
+    with pytest.raises(SystemExit) as exit_info:
+        compare_backends.main(['--clip', str(clip)])
+
+    assert exit_info.value.code == 1
+    assert capsys.readouterr().out == (f"Error: audio clip {clip} not found; "
+                                       f"pass --clip with an audio file to compare on\n")
+
+
+def test_word_error_rate_counts_edits_against_the_reference():
+    reference = 'The cat sat on the mat.'
+    assert compare_backends.word_error_rate(reference, '[0.00s -> 2.00s]  the cat sat on the mat') == 0.0
+    # One substitution, one deletion and one insertion over six reference words
+    assert compare_backends.word_error_rate(reference, 'the dog sat the mat today') == pytest.approx(3 / 6)
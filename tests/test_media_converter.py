@@ -0,0 +1,35 @@
+import os
+
+from job_ledger import JobLedger
+from stages import load_stage
+
+convert = load_stage('convert')
+
+
+def converter_with_one_done_file(tmp_path):
+    media, output = tmp_path / 'media', tmp_path / 'audio'
+    media.mkdir()
+    output.mkdir()
+    for name in ('done.wav', 'new.wav'):
+        (media / name).write_bytes(os.urandom(1000))
+    converter = convert.MediaConverter(str(media), str(output), output_format='whisper',
+                                       ledger=JobLedger(str(tmp_path / 'ledger.db')))
+    audio_path = converter._audio_path('done.wav')
+    open(audio_path, 'wb').close()
+    content_hash = converter.ledger.file_hash(str(media / 'done.wav'))
+    converter.ledger.record(content_hash, 'convert', converter._ledger_params(), 'done.wav', audio_path)
+    return converter, audio_path
+
+
+def test_converted_file_is_skipped_before_ffmpeg_is_resolved(tmp_path, monkeypatch, capsys):
+    converter, audio_path = converter_with_one_done_file(tmp_path)
+
+    def resolve_ffmpeg(media_file):
+        raise RuntimeError(f"ffmpeg resolved for {media_file}")
+    monkeypatch.setattr(converter, '_conversion_job', resolve_ffmpeg)
+
+    assert converter.convert_file('done.wav') == audio_path
+    assert 'Skipping done.wav - already processed' in capsys.readouterr().out
+    # Setting up a conversion that fails is reported like any other conversion error
+    assert converter.convert_file('new.wav') is None
+    assert 'Error processing new.wav: ffmpeg resolved for new.wav' in capsys.readouterr().out
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import whisper
+
+from stages import load_stage
+
+downloader = load_stage('download')
+
+CHECKPOINT = os.urandom(3 * downloader.CHUNK_SIZE + 12345)
+SHA256 = hashlib.sha256(CHECKPOINT).hexdigest()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('Range')))
+            cut_after = server.cut_after
+            server.cut_after = None
+
+        start = 0
+        match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range') or '')
+        if match:
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        if cut_after is None:
+            self.wfile.write(data[start:])
+            return
+        # Drop the connection part-way, as a flaky network would
+        self.wfile.write(data[start:start + cut_after])
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class RangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RangeHandler)
+        self.lock = threading.Lock()
+        self.files = {}
+        self.requests = []
+        # Bytes the next response sends before the connection drops
+        self.cut_after = None
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+@pytest.fixture
+def mirror(monkeypatch):
+    server = RangeServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # A checkpoint published under its SHA-256, like whisper's own, plus an alias of it
+    url = f"{downloader.DEFAULT_BASE_URL}/{SHA256}/test-model.pt"
+    monkeypatch.setitem(whisper._MODELS, 'test-model', url)
+    monkeypatch.setitem(whisper._MODELS, 'test-alias', url)
+    server.files[f'/{SHA256}/test-model.pt'] = CHECKPOINT
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_interrupted_download_resumes_where_it_stopped(mirror, tmp_path):
+    mirror.cut_after = downloader.CHUNK_SIZE + 100
+
+    path = downloader.ModelDownloader(str(tmp_path), 'test-model', mirror.url).download_model()
+
+    assert read(path) == CHECKPOINT
+    assert [range_header for _, range_header in mirror.requests] == [None, f'bytes={downloader.CHUNK_SIZE + 100}-']
+    assert not os.path.exists(f"{path}.part")
+
+
+def test_complete_partial_file_is_finished_on_416(mirror, tmp_path):
+    # A run that was stopped after the last byte arrived, before the file was renamed
+    with open(tmp_path / 'test-model.pt.part', 'wb') as f:
+        f.write(CHECKPOINT)
+
+    path = downloader.ModelDownloader(str(tmp_path), 'test-model', mirror.url).download_model()
+
+    assert read(path) == CHECKPOINT
+    assert [range_header for _, range_header in mirror.requests] == [f'bytes={len(CHECKPOINT)}-']
+    # The verified checksum is remembered, so the next run does not download or hash again
+    assert downloader.ModelDownloader(str(tmp_path), 'test-model', mirror.url).verify()
+    assert len(mirror.requests) == 1
+
+
+def test_digest_mismatch_discards_the_download(mirror, tmp_path):
+    mirror.files[f'/{SHA256}/test-model.pt'] = CHECKPOINT[:-1] + b'\0'
+
+    with pytest.raises(Exception, match='SHA-256 mismatch'):
+        downloader.ModelDownloader(str(tmp_path), 'test-model', mirror.url).download_model()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_aliases_of_one_file_are_downloaded_once(mirror, tmp_path):
+    results = downloader.download_models(['test-model', 'test-alias', 'no-such-model'], str(tmp_path),
+                                         parallel=3, base_url=mirror.url)
+
+    path = os.path.join(str(tmp_path), 'test-model.pt')
+    assert results == {'test-model': path, 'test-alias': path, 'no-such-model': None}
+    assert len(mirror.requests) == 1
+    assert read(path) == CHECKPOINT
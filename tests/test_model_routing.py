@@ -0,0 +1,90 @@
+from conftest import write_transcript
+
+from ollama_session import create_client
+from stages import load_stage
+
+summarizer = load_stage('summarize')
+
+PHASE_OF_SYSTEM_PROMPT = {
+    summarizer.CHUNK_SYSTEM_PROMPT: 'map',
+    summarizer.COMBINE_SYSTEM_PROMPT: 'reduce',
+    summarizer.FINAL_SYSTEM_PROMPT: 'final',
+}
+
+
+def models_by_phase(server):
+    phases = {}
+    for request in server.received:
+        if request['prompt']:
+            phases.setdefault(PHASE_OF_SYSTEM_PROMPT[request['system']], set()).add(request['model'])
+    return phases
+
+
+def long_transcript(server, tmp_path):
+    # Long answers make the chunk summaries overflow the final prompt, so the reduce step runs
+    server.response_words = 300
+    server.prompt_token_seconds = 0.0
+    return write_transcript(tmp_path / 'talk.txt', 3000)
+
+
+def test_each_phase_goes_to_its_routed_model(ollama_server, tmp_path):
+    path = long_transcript(ollama_server, tmp_path)
+    router = summarizer.create_router(create_client(ollama_server.url), 'cascade', reduce_model='reducer')
+
+    assert summarizer.process_transcript(router, path)
+
+    assert router.name == 'cascade+overrides'
+    assert models_by_phase(ollama_server) == {'map': {'smollm2:360m'}, 'reduce': {'reducer'},
+                                              'final': {'smollm2'}}
+    assert all(router.stats[phase]['calls'] > 0 for phase in summarizer.PHASES)
+
+
+def test_model_aliases_and_ledger_params():
+    routing = summarizer.policy_routing('1.7b', map_model='360m')
+    assert routing == {'map': 'smollm2:360m', 'reduce': 'smollm2', 'final': 'smollm2'}
+    assert summarizer.routing_params(routing) == routing
+    # A single-model routing keeps the ledger key of the days before routing
+    assert summarizer.routing_params(summarizer.policy_routing('360m')) == {'model': 'smollm2:360m'}
+
+
+def test_compare_policies_reports_every_policy(ollama_server, tmp_path, capsys):
+    path = long_transcript(ollama_server, tmp_path)
+    output_dir = tmp_path / 'summaries'
+    output_dir.mkdir()
+    policies = ['1.7b', 'cascade']
+
+    results = summarizer.compare_policies(create_client(ollama_server.url), str(path), policies,
+                                          parallel=2, output_dir=output_dir)
+
+    assert [policy for policy, _, _ in results] == policies
+    generate_requests = [r for r in ollama_server.received if r['prompt']]
+    assert sum(totals['calls'] for _, _, totals in results) == len(generate_requests)
+    # Every model of each policy is preloaded before its run
+    preloads = [r['model'] for r in ollama_server.received if not r['prompt']]
+    assert preloads == ['smollm2', 'smollm2', 'smollm2:360m']
+    for policy in policies:
+        with open(output_dir / f'compare_{policy}_talk.txt', encoding='utf-8') as f:
+            assert f.read().startswith('Summary: ')
+
+    table = capsys.readouterr().out.split(f"\n{'policy':<12}")[-1].splitlines()
+    assert [line.split()[0] for line in table[1:]] == policies
+    for line, (_, _, totals) in zip(table[1:], results):
+        assert int(line.split()[2]) == totals['calls']
+
+
+def test_report_totals_latency_and_tokens_per_phase(ollama_server, tmp_path, capsys):
+    path = long_transcript(ollama_server, tmp_path)
+    router = summarizer.create_router(create_client(ollama_server.url), 'cascade')
+    summarizer.process_transcript(router, path)
+    capsys.readouterr()
+
+    totals = router.report()
+
+    assert totals['calls'] == len([r for r in ollama_server.received if r['prompt']])
+    for key in ('prompt_tokens', 'output_tokens'):
+        assert totals[key] == sum(router.stats[phase][key] for phase in summarizer.PHASES) > 0
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[1] == "Routing policy 'cascade': map=smollm2:360m, reduce=smollm2:360m, final=smollm2"
+    assert [row.split()[:2] for row in rows[3:6]] == [['map', 'smollm2:360m'], ['reduce', 'smollm2:360m'],
+                                                      ['final', 'smollm2']]
+    assert rows[6].split()[:2] == ['total', str(totals['calls'])]
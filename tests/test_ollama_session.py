@@ -0,0 +1,64 @@
+import re
+
+from conftest import write_transcript
+
+from ollama_session import KEEP_ALIVE, create_client
+from stages import load_stage
+from transcript_chunks import create_chunks, estimate_tokens
+
+summarizer = load_stage('summarize')
+
+
+def chunks_of(tmp_path, seconds=600):
+    with open(write_transcript(tmp_path / 'talk.txt', seconds), encoding='utf-8') as f:
+        return create_chunks(f.read(), max_tokens=200)
+
+
+def test_every_request_carries_keep_alive_and_the_system_prompt(ollama_server, tmp_path):
+    chunks = chunks_of(tmp_path)
+    router = summarizer.create_router(create_client(ollama_server.url, pool_size=2))
+
+    summarizer.summarize_chunks(router, chunks, parallel=2)
+
+    assert len(ollama_server.received) == len(chunks) > 1
+    for request in ollama_server.received:
+        assert request['keep_alive'] == KEEP_ALIVE
+        assert request['system'] == summarizer.CHUNK_SYSTEM_PROMPT
+        # The instructions are not repeated in the prompt, so its start stays cacheable
+        assert summarizer.CHUNK_SYSTEM_PROMPT not in request['prompt']
+
+
+def test_model_preload_keeps_the_model_resident(ollama_server):
+    client = create_client(ollama_server.url)
+
+    assert summarizer.keep_model_loaded(client, 'smollm2')
+    [request] = ollama_server.received
+    assert (request['model'], request['prompt'], request['keep_alive']) == ('smollm2', '', KEEP_ALIVE)
+
+
+def test_client_session_is_reused_across_requests(ollama_server, tmp_path):
+    chunks = chunks_of(tmp_path)
+    pool_size = 2
+    router = summarizer.create_router(create_client(ollama_server.url, pool_size=pool_size))
+
+    summarizer.summarize_chunks(router, chunks, parallel=4)
+    summarizer.summarize_chunks(router, chunks, parallel=4)
+
+    # Keep-alive connections from one pool serve every request of both passes
+    assert ollama_server.requests == 2 * len(chunks)
+    assert ollama_server.connections <= pool_size
+
+
+def test_reused_system_prompt_is_reported_as_saved_prompt_evaluation(ollama_server, tmp_path, capsys):
+    chunks = chunks_of(tmp_path)
+    router = summarizer.create_router(create_client(ollama_server.url))
+
+    summarizer.summarize_chunks(router, chunks, parallel=1)
+
+    # The fake, like Ollama, only evaluates a system prompt the first time it sees it
+    reports = re.findall(r'~(\d+) reused, ~([\d.]+)s saved', capsys.readouterr().out)
+    assert len(reports) == len(chunks)
+    assert int(reports[0][0]) == 0
+    system_tokens = estimate_tokens(summarizer.CHUNK_SYSTEM_PROMPT)
+    for reused, saved in reports[1:]:
+        assert int(reused) >= system_tokens - 1 and float(saved) > 0
@@ -0,0 +1,72 @@
+import builtins
+import os
+import sys
+
+import instrumentation
+import shared_weights
+
+
+def without_memory_sources(monkeypatch):
+    # As on Windows without psutil: no /proc and no resource module
+    real_open = builtins.open
+
+    def no_proc(path, *args, **kwargs):
+        if str(path).startswith('/proc/'):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', no_proc)
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+
+
+def test_process_memory_is_none_where_it_cannot_be_read(monkeypatch):
+    without_memory_sources(monkeypatch)
+    assert shared_weights.process_memory() is None
+
+
+def test_print_memory_skips_unreadable_reports(monkeypatch, capsys):
+    report = shared_weights.process_memory()
+    assert report['rss_mb'] > 0
+
+    without_memory_sources(monkeypatch)
+    shared_weights.print_memory([shared_weights.process_memory()], label='pipeline')
+    assert capsys.readouterr().out == ''
+    shared_weights.print_memory([None, report])
+    assert f"{report['pid']:>7}" in capsys.readouterr().out
+
+
+def test_python_commands_report_their_own_peak_rss(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+    # About 200 MB held at once, well above the interpreter's own footprint
+    command = [sys.executable, '-c', 'import instrumentation; data = bytearray(200 * 1024 * 1024)']
+
+    _, peak_rss_mb, returncode = instrumentation.run_measured(command, cwd=os.path.dirname(instrumentation.__file__))
+
+    assert returncode == 0 and peak_rss_mb > 200
+
+
+def test_run_measured_leaves_rss_out_without_psutil(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+
+    elapsed, peak_rss_mb, returncode = instrumentation.run_measured([sys.executable, '-c', 'raise SystemExit(3)'])
+
+    assert elapsed > 0 and peak_rss_mb is None and returncode == 3
+
+
+def test_trace_records_null_rss_where_it_cannot_be_read(monkeypatch, tmp_path):
+    trace_path = tmp_path / 'trace.jsonl'
+    monkeypatch.setenv(instrumentation.TRACE_ENV, str(trace_path))
+    with instrumentation.span('measured'):
+        pass
+    without_memory_sources(monkeypatch)
+    with instrumentation.span('unmeasured'):
+        pass
+    monkeypatch.undo()
+
+    records = list(instrumentation.read_trace(str(trace_path)))
+    assert records[0]['rss_mb'] > 0 and records[1]['rss_mb'] is None
+    text = instrumentation.prometheus_text(records)
+    assert 't2s_span_max_resident_memory_bytes{span="measured"}' in text
+    assert 't2s_span_max_resident_memory_bytes{span="unmeasured"}' not in text
+    assert 't2s_span_seconds_count{span="unmeasured"} 1' in text
@@ -0,0 +1,27 @@
+import segment_store
+
+SEGMENTS = [{'start': 0.0, 'end': 2.5, 'text': ' Hello there.'},
+            {'start': 2.5, 'end': 5.0, 'text': ' General Kenobi.'}]
+
+
+def test_txt_export_next_to_the_store_keeps_the_transcript(tmp_path):
+    transcript = tmp_path / 'talk.txt'
+    transcript.write_text('[0.00s -> 2.50s]  Hello there, edited by hand.\n', encoding='utf-8')
+    store = segment_store.store_path(transcript)
+    segment_store.write_segment_store(store, SEGMENTS)
+
+    segment_store.main([store, '--format', 'txt', 'srt'])
+
+    assert transcript.read_text(encoding='utf-8') == '[0.00s -> 2.50s]  Hello there, edited by hand.\n'
+    assert (tmp_path / 'talk.export.txt').read_text(encoding='utf-8') == segment_store.to_txt(
+        segment_store.SegmentStore(store))
+    assert (tmp_path / 'talk.srt').exists()
+
+
+def test_txt_export_to_another_folder_keeps_its_name(tmp_path):
+    store = str(tmp_path / 'talk.seg')
+    segment_store.write_segment_store(store, SEGMENTS)
+
+    segment_store.main([store, '--format', 'txt', '--output-dir', str(tmp_path / 'out')])
+
+    assert (tmp_path / 'out' / 'talk.txt').read_text(encoding='utf-8').startswith('[0.00s -> 2.50s] ')
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from stages import load_stage
+
+service = load_stage('service')
+
+
+class StubTranscriber:
+    # Stands in for the Whisper model: writes a one-line transcript for any upload
+    def __init__(self, output_folder, **kwargs):
+        self.output_folder = output_folder
+
+    def transcribe_streaming(self, audio_path, on_segments):
+        segment = {'start': 0.0, 'end': 2.0, 'text': ' Hello there.'}
+        on_segments([segment])
+        os.makedirs(self.output_folder, exist_ok=True)
+        path = os.path.join(self.output_folder, os.path.splitext(os.path.basename(audio_path))[0] + '.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[0.00s -> 2.00s]  Hello there.\n')
+        return path
+
+
+def service_args(tmp_path, ollama_server):
+    return service.parse_args([
+        '--upload-dir', str(tmp_path / 'uploads'), '--transcript-dir', str(tmp_path / 'transcripts'),
+        '--summary-dir', str(tmp_path / 'summaries'), '--summary-audio-dir', str(tmp_path / 'audio'),
+        '--ollama-host', ollama_server.url, '--summary-cache', str(tmp_path / 'summary_cache.db'),
+        '--tts-cache', str(tmp_path / 'tts_cache.db'), '--ledger', str(tmp_path / 'ledger.db')])
+
+
+async def upload_and_follow(app):
+    # Uploads a file and reads its event stream to the end; returns the (event, data) lines
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post('/jobs?filename=talk.m4a', data=b'not really audio')
+        job = await response.json()
+        events = await client.get(f"/jobs/{job['job']}/events")
+        body = await asyncio.wait_for(events.text(), 10)
+        status = await (await client.get(f"/jobs/{job['job']}")).json()
+    return [block.splitlines() for block in body.strip().split('\n\n')], status
+
+
+def test_job_fails_with_a_last_event_when_the_summarizer_raises(tmp_path, ollama_server, monkeypatch):
+    def broken_summarizer(*args):
+        raise OSError("summary disk is full")
+
+    monkeypatch.setattr(service.transcribe, 'AudioTranscriber', StubTranscriber)
+    monkeypatch.setattr(service.summarizer, 'summarize_transcript_file', broken_summarizer)
+
+    events, status = asyncio.run(upload_and_follow(service.create_app(service_args(tmp_path, ollama_server))))
+
+    assert [lines[0] for lines in events][-1] == 'event: error'
+    assert 'Failed while summarizing: summary disk is full' in events[-1][1]
+    assert status['status'] == 'failed' and status['finished']
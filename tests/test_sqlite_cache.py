@@ -0,0 +1,25 @@
+from summary_cache import SummaryCache
+from tts_cache import AudioCache
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = AudioCache(str(tmp_path / 'tts_cache.db'), max_bytes=1000)
+    for number in range(3):
+        cache.put(f'shard{number}', bytes(300))
+    assert cache.get('shard0') == bytes(300)  # now the most recently used
+
+    cache.put('shard3', bytes(300))
+
+    assert cache.get('shard1') is None
+    assert all(cache.get(f'shard{number}') is not None for number in (0, 2, 3))
+    assert cache.stats() == {'hits': 4, 'misses': 1, 'evictions': 1, 'bytes_saved': 1200}
+
+
+def test_summary_cache_keeps_text_and_counts_lookups(tmp_path, capsys):
+    cache = SummaryCache(str(tmp_path / 'summary_cache.db'))
+    cache.put('key', 'smollm2', 'Summary: ünïcode text')
+
+    assert cache.get('key') == 'Summary: ünïcode text'
+    assert cache.get('other') is None
+    cache.print_stats()
+    assert capsys.readouterr().out == "Summary cache: 1 hits, 1 misses (50% hit rate), 0 evicted\n"
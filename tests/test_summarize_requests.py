@@ -0,0 +1,37 @@
+from conftest import write_transcript
+
+from ollama_session import create_client
+from stages import load_stage
+from transcript_chunks import create_chunks
+
+summarizer = load_stage('summarize')
+
+
+def chunks_of(tmp_path, seconds=600):
+    with open(write_transcript(tmp_path / 'talk.txt', seconds), encoding='utf-8') as f:
+        return create_chunks(f.read(), max_tokens=200)
+
+
+def test_map_phase_runs_concurrently_and_keeps_chunk_order(ollama_server, tmp_path):
+    ollama_server.latency = 0.2
+    chunks = chunks_of(tmp_path)
+    router = summarizer.create_router(create_client(ollama_server.url, pool_size=4))
+
+    summaries = summarizer.summarize_chunks(router, chunks, parallel=4)
+
+    assert ollama_server.max_in_flight == 4
+    # The fake answers with the last words of each prompt, so each summary names its chunk
+    assert [summary.split()[-1] for summary in summaries] == [chunk.text.split()[-1] for chunk in chunks]
+
+
+def test_decode_speed_is_taken_from_eval_count(ollama_server, tmp_path):
+    chunks = chunks_of(tmp_path)
+    router = summarizer.create_router(create_client(ollama_server.url))
+
+    summaries = summarizer.summarize_chunks(router, chunks, parallel=2)
+
+    stats = router.stats['map']
+    assert stats['calls'] == len(chunks)
+    # eval_count is the number of words the fake answered with, after "Summary:"
+    assert stats['output_tokens'] == sum(len(summary.split()) - 1 for summary in summaries)
+    assert stats['prompt_tokens'] > 0
@@ -0,0 +1,78 @@
+from conftest import write_transcript
+
+from ollama_session import create_client
+from stages import load_stage
+from summary_cache import CachedClient, SummaryCache, cache_key
+from transcript_chunks import create_chunks
+
+summarizer = load_stage('summarize')
+
+
+def lengthen_line(path, line_number, extra_words=150):
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    lines[line_number] = lines[line_number].rstrip('\n') + ' and' * extra_words + ' more.\n'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+
+def cached_router(server, tmp_path):
+    cache = SummaryCache(str(tmp_path / 'summary_cache.db'))
+    return summarizer.create_router(CachedClient(create_client(server.url), cache)), cache
+
+
+def map_requests(server):
+    return [r for r in server.received if r.get('system') == summarizer.CHUNK_SYSTEM_PROMPT]
+
+
+def test_length_changing_edit_only_moves_nearby_chunk_boundaries(tmp_path):
+    path = write_transcript(tmp_path / 'talk.txt', 3000)
+    with open(path, encoding='utf-8') as f:
+        before = create_chunks(f.read())
+    lengthen_line(path, 300)
+    with open(path, encoding='utf-8') as f:
+        after = create_chunks(f.read())
+
+    unchanged = {chunk.text for chunk in before} & {chunk.text for chunk in after}
+    assert len(before) > 5
+    assert len(after) - len(unchanged) <= 2
+
+
+def test_edit_sends_only_changed_chunks_back_to_ollama(ollama_server, tmp_path):
+    path = write_transcript(tmp_path / 'talk.txt', 3000)
+    router, cache = cached_router(ollama_server, tmp_path)
+    summarizer.process_transcript(router, path)
+    first_run = len(map_requests(ollama_server))
+
+    lengthen_line(path, 300)
+    ollama_server.received.clear()
+    assert summarizer.process_transcript(router, path)
+
+    assert first_run > 5
+    assert 1 <= len(map_requests(ollama_server)) <= 2
+    assert cache.hits >= first_run - 2
+
+
+def test_unchanged_transcript_skips_map_reduce_and_final(ollama_server, tmp_path):
+    path = write_transcript(tmp_path / 'talk.txt', 3000)
+    router, _ = cached_router(ollama_server, tmp_path)
+    first = summarizer.process_transcript(router, path)
+
+    ollama_server.received.clear()
+    assert summarizer.process_transcript(router, path) == first
+    assert ollama_server.received == []
+
+
+def test_final_summary_key_is_its_own():
+    summaries = ['[00:00 - 05:00] First part.', '[05:00 - 10:00] Second part.']
+    single = summarizer.create_router(None, '1.7b')
+    cascade = summarizer.create_router(None, 'cascade')
+
+    key = summarizer.final_summary_key(single, summaries)
+    assert key == summarizer.final_summary_key(single, list(summaries))
+    assert key != summarizer.final_summary_key(cascade, summaries)
+    assert key != summarizer.final_summary_key(single, summaries[::-1])
+    # Not the key of any single request made with the same text
+    assert key != cache_key(single.routing, '\n'.join(summaries), 'final summary')
+    assert key != cache_key(single.routing['final'], summarizer.FINAL_PROMPT.format(summaries=' '.join(summaries)),
+                            summarizer.FINAL_OPTIONS, summarizer.FINAL_SYSTEM_PROMPT)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from job_ledger import JobLedger
+from stages import load_stage
+from tts_cache import AudioCache
+
+tts = load_stage('tts')
+
+
+def sentences(count, first=0):
+    # Each sentence is long enough to be a shard of its own
+    return [f"Sentence number {index} of the summary talks about attention layers and training data at length."
+            for index in range(first, first + count)]
+
+
+def convert(text, output_file, **kwargs):
+    return asyncio.run(tts.convert_text_to_speech(text, str(output_file), **kwargs))
+
+
+def test_shards_are_synthesized_concurrently(tts_server, tmp_path):
+    text = ' '.join(sentences(6))
+    shards = tts.split_into_shards(text)
+
+    start = time.time()
+    assert convert(text, tmp_path / 'talk.mp3') == len(shards) == 6
+    elapsed = time.time() - start
+
+    assert sorted(tts_server.received) == sorted(shards)
+    assert tts_server.max_in_flight == len(shards)
+    # All shards together take about as long as one request, not one after another
+    assert elapsed < len(shards) * tts_server.latency / 2
+
+
+def test_shard_audio_is_joined_in_text_order(tts_server, tmp_path):
+    # Longer shards come back later, so the first shard finishes last
+    tts_server.seconds_per_char = 0.002
+    text = ' '.join(f"{sentence} {'And then some more. ' * (5 - index)}"
+                    for index, sentence in enumerate(sentences(5)))
+    shards = tts.split_into_shards(text)
+    output_file = tmp_path / 'talk.mp3'
+
+    convert(text, output_file)
+
+    assert tts_server.completed != shards
+    with open(output_file, 'rb') as f:
+        mp3 = f.read()
+    assert tts_server.spoken_texts(mp3) == shards
+    # Frames are joined whole: the file is exactly the frames of every answer
+    assert len(mp3) == sum(len(tts_server.audio(shard)) for shard in shards)
+
+
+def test_requests_in_flight_are_bounded(tts_server, tmp_path):
+    text = ' '.join(sentences(20))
+
+    assert convert(text, tmp_path / 'talk.mp3', semaphore=asyncio.Semaphore(3)) == 20
+    assert tts_server.requests == 20
+    assert tts_server.max_in_flight == 3
+
+
+def test_all_files_share_the_request_limit(tts_server, tmp_path):
+    summary_dir = tmp_path / 'summaries'
+    summary_dir.mkdir()
+    for number in range(tts.MAX_FILES + 2):
+        with open(summary_dir / f'talk{number}.txt', 'w', encoding='utf-8') as f:
+            f.write(' '.join(sentences(5, first=number * 5)))
+
+    results = asyncio.run(tts.process_summary_files(summary_dir, tmp_path / 'audio',
+                                                    JobLedger(str(tmp_path / 'ledger.db')),
+                                                    AudioCache(str(tmp_path / 'tts_cache.db'))))
+
+    assert all(results) and len(results) == tts.MAX_FILES + 2
+    assert tts_server.requests == 5 * len(results)
+    assert tts_server.max_in_flight == tts.MAX_REQUESTS
+
+
+def short_sentences(count):
+    return [f"Point {index} is short." for index in range(count)]
+
+
+def test_editing_a_sentence_only_changes_its_shard():
+    text = ' '.join(short_sentences(60))
+    edited = text.replace('Point 20 is short.', 'Point 20 is a good deal longer than it was before the edit.')
+
+    before, after = tts.split_into_shards(text), tts.split_into_shards(edited)
+
+    assert 10 < len(before) < 60
+    assert len(set(after) - set(before)) <= 2
+
+
+def test_edited_summary_only_resynthesizes_changed_shards(tts_server, tmp_path):
+    cache = AudioCache(str(tmp_path / 'tts_cache.db'))
+    text = ' '.join(short_sentences(60))
+    convert(text, tmp_path / 'talk.mp3', cache=cache)
+    first_run = tts_server.requests
+
+    tts_server.received.clear()
+    convert(text.replace('Point 20 is short.', 'Point 20 is a good deal longer.'), tmp_path / 'talk.mp3', cache=cache)
+
+    assert first_run > 10
+    assert 1 <= len(tts_server.received) <= 2
+
+
+def test_empty_text_leaves_no_audio_file(tts_server, tmp_path):
+    output_file = tmp_path / 'talk.mp3'
+
+    assert convert(' \n\t', output_file) == 0
+
+    assert not output_file.exists() and not (tmp_path / 'talk.mp3.part').exists()
+    assert tts_server.requests == 0
@@ -0,0 +1,146 @@
+import hashlib
+import re
+from collections import namedtuple
+
+# Chunk budget in model tokens; leaves room for the prompt template and the reply
+# inside smollm2's default 2048-token Ollama context
+MAX_CHUNK_TOKENS = 1000
+# Content-defined boundaries: once a chunk holds MIN_CHUNK_FRACTION of the budget, a
+# sentence end closes it when a hash of that sentence falls below (tokens since the
+# previous sentence end) / (BOUNDARY_FRACTION * budget). Whether a sentence ends a chunk
+# depends only on the text around it, so an edit that changes a line's length moves the
+# boundaries next to it but not every later one, and the other chunks stay cached
+MIN_CHUNK_FRACTION = 0.5
+BOUNDARY_FRACTION = 0.2
+
+# "[0.00s -> 5.22s]  text" lines written by AudioTranscriber
+TIMESTAMP_LINE = re.compile(r'^\[(\d+(?:\.\d+)?)s -> (\d+(?:\.\d+)?)s\]\s*(.*)$')
+# Approximate BPE pieces: short words are one token, longer ones one per ~4 characters,
+# and every punctuation mark is its own token
+TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = re.compile(r"""[.!?]["')\]]*$""")
+# Whitespace after a sentence end, optionally followed by a closing quote or bracket
+SENTENCE_SPLIT = re.compile(r"""(?:(?<=[.!?])|(?<=[.!?]["')\]]))\s+""")
+
+# A run of transcript text with its time range (None for plain-text transcripts)
+Piece = namedtuple('Piece', 'text start end tokens')
+Chunk = namedtuple('Chunk', 'text start end tokens')
+
+
+def estimate_tokens(text):
+    """Approximate model token count of text, without loading a tokenizer."""
+    return sum((len(piece) + 3) // 4 for piece in TOKEN_PIECE.findall(text))
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours}:{minutes:02d}:{seconds % 60:02d}" if hours else f"{minutes:02d}:{seconds % 60:02d}"
+
+
+def label_time_range(text, start, end):
+    """Prefix text with its [mm:ss - mm:ss] range in the recording, when known."""
+    if start is None:
+        return text
+    return f"[{format_time(start)} - {format_time(end)}] {text}"
+
+
+def split_sentences(text):
+    """Split plain text into sentences, keeping their punctuation and closing quotes."""
+    return [sentence for sentence in SENTENCE_SPLIT.split(text.strip()) if sentence]
+
+
+def _pieces(text):
+    """Yield transcript pieces, with timestamps stripped from the text but kept as the range."""
+    for line in text.splitlines():
+        match = TIMESTAMP_LINE.match(line.strip())
+        if match:
+            content = match.group(3).strip()
+            if content:
+                yield Piece(content, float(match.group(1)), float(match.group(2)),
+                            estimate_tokens(content))
+            continue
+        # Plain text (older or hand-written transcripts): one piece per sentence
+        for sentence in split_sentences(line):
+            yield Piece(sentence, None, None, estimate_tokens(sentence))
+
+
+def segment_pieces(segments):
+    """Yield pieces for (start, end, text) segments, e.g. read from a segment store."""
+    for start, end, text in segments:
+        content = text.strip()
+        if content:
+            yield Piece(content, start, end, estimate_tokens(content))
+
+
+def boundary_hash(text):
+    """Value in [0, 1) that depends only on the text."""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+def _split_oversized(piece, max_tokens):
+    """Break a single piece larger than the budget at word boundaries."""
+    words = piece.text.split()
+    current, current_tokens = [], 0
+    for word in words:
+        tokens = estimate_tokens(word)
+        if current and current_tokens + tokens > max_tokens:
+            yield Piece(' '.join(current), piece.start, piece.end, current_tokens)
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        yield Piece(' '.join(current), piece.start, piece.end, current_tokens)
+
+
+def _chunk(pieces):
+    starts = [piece.start for piece in pieces if piece.start is not None]
+    ends = [piece.end for piece in pieces if piece.end is not None]
+    return Chunk(' '.join(piece.text for piece in pieces),
+                 starts[0] if starts else None, ends[-1] if ends else None,
+                 sum(piece.tokens for piece in pieces))
+
+
+def chunk_pieces(pieces, max_tokens=MAX_CHUNK_TOKENS):
+    """Group pieces into chunks of at most max_tokens in a single pass.
+
+    Chunks end at content-defined sentence ends (see MIN_CHUNK_FRACTION), about
+    0.7 of the budget on average. A chunk that reaches the budget first is cut at
+    its last sentence end if that falls in its second half, otherwise at the last
+    piece that fits. Each chunk keeps the time range of its pieces as its start/end time.
+    """
+    min_tokens = max_tokens * MIN_CHUNK_FRACTION
+    boundary_tokens = max(1.0, max_tokens * BOUNDARY_FRACTION)
+    chunks = []
+    current, current_tokens = [], 0
+    sentence_end = 0  # pieces in current up to and including the last sentence end
+    since_sentence_end = 0  # tokens since the previous sentence end, across chunks
+
+    for piece in pieces:
+        for part in (_split_oversized(piece, max_tokens) if piece.tokens > max_tokens else (piece,)):
+            while current and current_tokens + part.tokens > max_tokens:
+                cut = sentence_end if sentence_end and sentence_end * 2 >= len(current) else len(current)
+                chunks.append(_chunk(current[:cut]))
+                current = current[cut:]
+                current_tokens = sum(p.tokens for p in current)
+                sentence_end = 0  # nothing after the cut ended a sentence
+            current.append(part)
+            current_tokens += part.tokens
+            since_sentence_end += part.tokens
+            if SENTENCE_END.search(part.text):
+                sentence_end = len(current)
+                if (current_tokens >= min_tokens and
+                        boundary_hash(part.text) * boundary_tokens < since_sentence_end):
+                    chunks.append(_chunk(current))
+                    current, current_tokens, sentence_end = [], 0, 0
+                since_sentence_end = 0
+
+    if current:
+        chunks.append(_chunk(current))
+    return chunks
+
+
+def create_chunks(text, max_tokens=MAX_CHUNK_TOKENS):
+    """Split transcript text into chunks; timestamps are removed from the text and kept as the chunk's range."""
+    return chunk_pieces(_pieces(text), max_tokens)
@@ -0,0 +1,128 @@
+import os
+
+from audio_io import SAMPLE_RATE
+from instrumentation import span
+
+# Keys every backend returns for each segment, so transcripts and downstream
+# stages do not depend on which engine produced them
+SEGMENT_KEYS = ('id', 'seek', 'start', 'end', 'text', 'tokens', 'temperature',
+                'avg_logprob', 'compression_ratio', 'no_speech_prob')
+
+ENGINES = ('whisper', 'faster-whisper')
+FASTER_WHISPER_COMPUTE_TYPES = ('int8', 'int8_float32', 'float32', 'int8_float16', 'float16')
+
+
+# Keys of each entry in a segment's 'words' (only with word timestamps)
+WORD_KEYS = ('start', 'end', 'word', 'probability')
+
+
+def _segment_dict(source, get):
+    segment = {key: get(source, key) for key in SEGMENT_KEYS}
+    words = get(source, 'words')
+    if words:
+        segment['words'] = [{key: get(word, key) for key in WORD_KEYS} for word in words]
+    return segment
+
+
+def _attribute(source, key):
+    # faster-whisper segments and words are objects; a segment's words are None unless requested
+    return getattr(source, key, None)
+
+
+def _audio_seconds(audio):
+    # Paths are decoded by the engine itself; their length is not known up front
+    return None if isinstance(audio, str) else len(audio) / SAMPLE_RATE
+
+
+class WhisperBackend:
+    """openai-whisper (PyTorch) engine."""
+
+    engine = 'whisper'
+
+    def __init__(self, model_size='small', device=None, download_root=None, shared_weights=False,
+                 word_timestamps=False):
+        import torch
+        import whisper
+
+        self.word_timestamps = word_timestamps
+        self.device = device or ("cuda:0" if torch.cuda.is_available() else "cpu")
+        if shared_weights and self.device == 'cpu':
+            # Every backend (thread or process) maps the same float32 weights read-only
+            from shared_weights import load_shared_model, prepare_shared_checkpoint
+            self.model = load_shared_model(prepare_shared_checkpoint(model_size, download_root))
+            return
+        # Add Whisper model classes to safe globals so the checkpoint loads with weights_only=True
+        torch.serialization.add_safe_globals([whisper.model.Whisper])
+        self.model = whisper.load_model(model_size, device=self.device, download_root=download_root)
+
+    def transcribe(self, audio, language="en", prompt=None):
+        # prompt: text that came before this audio, given to the decoder as context
+        with span('transcribe.model', engine=self.engine, audio_seconds=_audio_seconds(audio)):
+            result = self.model.transcribe(
+                audio,
+                language=language,
+                initial_prompt=prompt,
+                word_timestamps=self.word_timestamps,
+                fp16=False  # Use False if you don't have GPU
+            )
+        result['segments'] = [_segment_dict(segment, lambda s, key: s.get(key))
+                              for segment in result['segments']]
+        return result
+
+
+class FasterWhisperBackend:
+    """CTranslate2 engine via faster-whisper; int8 weights are the fast option on CPU-only nodes."""
+
+    engine = 'faster-whisper'
+
+    def __init__(self, model_size='small', device=None, download_root=None,
+                 compute_type='int8', cpu_threads=0, word_timestamps=False):
+        from faster_whisper import WhisperModel
+
+        if compute_type not in FASTER_WHISPER_COMPUTE_TYPES:
+            raise ValueError(f"Unknown compute type {compute_type}. "
+                             f"Available: {', '.join(FASTER_WHISPER_COMPUTE_TYPES)}")
+        # CTranslate2 takes the device type only ("cuda:0" -> "cuda")
+        self.device = (device or "auto").split(':')[0]
+        self.compute_type = compute_type
+        self.word_timestamps = word_timestamps
+        self.model = WhisperModel(model_size, device=self.device, compute_type=compute_type,
+                                  cpu_threads=cpu_threads, download_root=download_root)
+
+    def transcribe(self, audio, language="en", prompt=None):
+        # Greedy decoding to match openai-whisper's defaults (faster-whisper defaults to beam 5)
+        with span('transcribe.model', engine=self.engine, audio_seconds=_audio_seconds(audio)):
+            segments, info = self.model.transcribe(audio, language=language, beam_size=1, best_of=1,
+                                                   initial_prompt=prompt, word_timestamps=self.word_timestamps)
+            # Segments are decoded lazily, as the generator is consumed
+            segments = [_segment_dict(segment, _attribute) for segment in segments]
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language,
+        }
+
+
+def create_backend(engine='whisper', model_size='small', device=None,
+                   download_root=None, compute_type='int8', shared_weights=False, word_timestamps=False):
+    """Instantiate a transcription engine by name."""
+    if download_root is None:
+        download_root = os.path.join(os.getcwd(), "whisper_model")
+
+    if engine == 'whisper':
+        return WhisperBackend(model_size, device=device, download_root=download_root,
+                              shared_weights=shared_weights, word_timestamps=word_timestamps)
+    if engine == 'faster-whisper':
+        # CTranslate2 loads its own weights; shared_weights applies to openai-whisper only
+        return FasterWhisperBackend(model_size, device=device, compute_type=compute_type,
+                                    download_root=os.path.join(download_root, 'faster-whisper'),
+                                    word_timestamps=word_timestamps)
+    raise ValueError(f"Unknown engine {engine}. Available engines: {', '.join(ENGINES)}")
+
+
+def backend_params(engine, model_size, compute_type):
+    """Stage parameters identifying a transcript in the job ledger."""
+    # openai-whisper keeps the original {'model': ...} key so existing ledger entries stay valid
+    if engine == 'whisper':
+        return {'model': model_size}
+    return {'model': model_size, 'engine': engine, 'compute_type': compute_type}
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import sqlite3
+
+from sqlite_cache import SQLiteLRUCache
+
+# Synthesized audio per shard (a sentence, or a few short ones), so re-voicing an edited
+# summary only sends the shards whose sentences changed to edge-tts
+DEFAULT_CACHE_PATH = 'tts_cache.db'
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio (
+    key TEXT PRIMARY KEY,
+    audio BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audio_last_used ON audio (last_used);
+"""
+
+
+def normalize_sentence(text):
+    # Whitespace differences do not change the speech
+    return ' '.join(text.split())
+
+
+def audio_key(text, voice, rate, volume):
+    """SHA-256 of the normalized sentence and the voice settings."""
+    payload = json.dumps([normalize_sentence(text), voice, rate, volume], separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AudioCache(SQLiteLRUCache):
+    """On-disk MP3 cache per shard with size-bounded least-recently-used eviction."""
+
+    TABLE = 'audio'
+    SCHEMA = SCHEMA
+    VALUE_COLUMN = 'audio'
+    NAME = 'TTS cache'
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.bytes_saved = 0
+        super().__init__(db_path, max_bytes)
+
+    def get(self, key):
+        audio = super().get(key)
+        if audio is None:
+            return None
+        with self._lock:
+            self.bytes_saved += len(audio)
+        return bytes(audio)
+
+    def put(self, key, audio):
+        self._put(key, len(audio), audio=sqlite3.Binary(audio))
+
+    def stats(self):
+        return {**super().stats(), 'bytes_saved': self.bytes_saved}
+
+    def _stats_details(self):
+        return f"{self.bytes_saved / 1024:.0f} KB of audio reused, "
@@ -0,0 +1,144 @@
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+
+FRAME_SIZE = 320            # 20 ms frames at 16 kHz
+BLOCK_FRAMES = 3000         # frames analysed per vectorized block (60 s), bounds FFT memory
+
+# Speech band used for the spectral check
+SPEECH_BAND_HZ = (300, 3400)
+
+# Frames this loud always pass the energy check, so recordings with no real pauses
+# (and therefore a high noise-floor estimate) are not dropped wholesale
+ABSOLUTE_SPEECH_DB = -35.0
+
+
+class SpeechTimeline:
+    """Speech regions of a file and the mapping between the original and speech-only timelines."""
+
+    def __init__(self, regions, total_samples, sample_rate=SAMPLE_RATE):
+        # regions: (n, 2) int array of [start, end) sample indices in the original audio
+        self.regions = np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+
+        lengths = self.regions[:, 1] - self.regions[:, 0]
+        # Start of each region once the silence between regions is removed
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        self.speech_samples = int(lengths.sum())
+
+    @property
+    def skipped_fraction(self):
+        if self.total_samples == 0:
+            return 0.0
+        return 1.0 - self.speech_samples / self.total_samples
+
+    def compact(self, audio):
+        """Concatenate the speech regions into one (shorter) array for the model."""
+        if len(self.regions) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([audio[start:end] for start, end in self.regions]).astype(np.float32, copy=False)
+
+    def to_original(self, seconds, is_end=False):
+        """Map a time on the speech-only timeline back to the original timeline."""
+        if len(self.regions) == 0:
+            return seconds
+        sample = seconds * self.sample_rate
+        # An end time sitting exactly on a region boundary belongs to the earlier region
+        side = 'left' if is_end else 'right'
+        index = max(int(np.searchsorted(self.compact_starts, sample, side=side)) - 1, 0)
+        original = sample - self.compact_starts[index] + self.regions[index, 0]
+        return float(min(original, self.regions[index, 1])) / self.sample_rate
+
+    def remap_result(self, result):
+        """Rewrite segment (and word) timestamps of a transcription result in place."""
+        for segment in result.get('segments', []):
+            segment['start'] = self.to_original(segment['start'])
+            segment['end'] = max(segment['start'], self.to_original(segment['end'], is_end=True))
+            for word in segment.get('words') or []:
+                word['start'] = self.to_original(word['start'])
+                word['end'] = max(word['start'], self.to_original(word['end'], is_end=True))
+        return result
+
+
+def _frame_features(audio):
+    """Per-frame log energy (dB), speech-band energy ratio and spectral flatness, block by block."""
+    n_frames = len(audio) // FRAME_SIZE
+    energy = np.empty(n_frames, dtype=np.float32)
+    band_ratio = np.empty(n_frames, dtype=np.float32)
+    flatness = np.empty(n_frames, dtype=np.float32)
+
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+
+    for start in range(0, n_frames, BLOCK_FRAMES):
+        stop = min(start + BLOCK_FRAMES, n_frames)
+        frames = np.asarray(audio[start * FRAME_SIZE:stop * FRAME_SIZE], dtype=np.float32)
+        frames = frames.reshape(-1, FRAME_SIZE)
+
+        energy[start:stop] = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-12
+        total = power.sum(axis=1)
+        band_ratio[start:stop] = power[:, band].sum(axis=1) / total
+        # Geometric / arithmetic mean: close to 1 for noise, low for voiced speech and tones
+        flatness[start:stop] = np.exp(np.mean(np.log(power), axis=1)) / (total / power.shape[1])
+
+    return energy, band_ratio, flatness
+
+
+def _runs(mask):
+    """[start, end) index pairs of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.stack((np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)), axis=1)
+
+
+def _merge_close(regions, max_gap):
+    """Merge regions separated by at most max_gap."""
+    if len(regions) < 2:
+        return regions
+    gaps = regions[1:, 0] - regions[:-1, 1]
+    # A new group starts wherever the gap to the previous region is too large
+    starts = np.concatenate(([True], gaps > max_gap))
+    group = np.cumsum(starts) - 1
+    merged = np.empty((group[-1] + 1, 2), dtype=regions.dtype)
+    merged[:, 0] = regions[starts, 0]
+    merged[:, 1] = np.maximum.reduceat(regions[:, 1], np.flatnonzero(starts))
+    return merged
+
+
+def detect_speech(audio, energy_threshold_db=12.0, min_band_ratio=0.35, max_flatness=0.5,
+                  min_speech_ms=250, min_silence_ms=500, speech_pad_ms=200):
+    """Find speech regions in 16 kHz mono audio and return a SpeechTimeline.
+
+    A frame counts as speech when it is energy_threshold_db above the estimated noise
+    floor, most of its energy sits in the speech band, and it is not noise-like (flat).
+    Speech runs closer than min_silence_ms are merged, runs shorter than min_speech_ms
+    dropped, and the survivors padded by speech_pad_ms on both sides.
+    """
+    total_samples = len(audio)
+    if total_samples < FRAME_SIZE:
+        return SpeechTimeline(np.zeros((0, 2)), total_samples)
+
+    energy, band_ratio, flatness = _frame_features(audio)
+
+    # Noise floor from the quietest tenth of frames; dead air is far below it plus the margin
+    noise_floor = np.percentile(energy, 10)
+    speech = ((energy > min(noise_floor + energy_threshold_db, ABSOLUTE_SPEECH_DB)) &
+              (band_ratio > min_band_ratio) &
+              (flatness < max_flatness))
+
+    frame_ms = 1000 * FRAME_SIZE / SAMPLE_RATE
+    regions = _runs(speech)
+    regions = _merge_close(regions, int(min_silence_ms / frame_ms))
+    regions = regions[(regions[:, 1] - regions[:, 0]) >= int(min_speech_ms / frame_ms)]
+
+    # Frames -> samples, with padding, then merge anything the padding made overlap
+    pad = int(speech_pad_ms * SAMPLE_RATE / 1000)
+    regions = regions * FRAME_SIZE
+    regions[:, 0] = np.maximum(regions[:, 0] - pad, 0)
+    regions[:, 1] = np.minimum(regions[:, 1] + pad, total_samples)
+    regions = _merge_close(regions, 0)
+
+    return SpeechTimeline(regions, total_samples)